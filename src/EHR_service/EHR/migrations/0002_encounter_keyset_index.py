@@ -0,0 +1,38 @@
+# Generated by Django 5.0.2 on 2026-10-16 22:49
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EHR', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='diagnosis',
+            name='diagnosis_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='Diagnosis ID'),
+        ),
+        migrations.AlterField(
+            model_name='encounter',
+            name='encounter_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique ID for encounter', unique=True, verbose_name='Encounter ID'),
+        ),
+        migrations.AlterField(
+            model_name='treatmentplan',
+            name='treatment_plan_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='Treatment Plan ID'),
+        ),
+        migrations.AlterField(
+            model_name='vitalsign',
+            name='vital_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='Vital ID'),
+        ),
+        migrations.AddIndex(
+            model_name='encounter',
+            index=models.Index(fields=['medical_record', 'encounter_date', 'id'], name='EHR_encount_medical_dcb382_idx'),
+        ),
+    ]
@@ -116,6 +116,8 @@ class Encounter(models.Model):
             models.Index(fields=['medical_record']),
             models.Index(fields=['doctor_id']),
             models.Index(fields=['encounter_date']),
+            # Keyset pagination of a record's encounters
+            models.Index(fields=['medical_record', 'encounter_date', 'id']),
         ]
 
     def __str__(self):
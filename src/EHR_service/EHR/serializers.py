@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from .models import (
@@ -90,4 +91,46 @@ class PrescriptionReferenceSerializer(serializers.ModelSerializer):
             'issue_date', 'prescription_details_url',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at'] 
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at'] 
+
+class PatientChartQuerySerializer(serializers.Serializer):
+    """Serializer for the query parameters of the patient chart."""
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.PATIENT_CHART_MAX_ENCOUNTERS,
+        default=settings.PATIENT_CHART_DEFAULT_ENCOUNTERS
+    )
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        start_date = attrs.get('start_date')
+        end_date = attrs.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError(
+                {'end_date': 'End date must not be before start date.'}
+            )
+        return attrs
+
+
+class ChartEncounterSerializer(EncounterSerializer):
+    """Serializer for an encounter with all of its clinical data, as shown on the chart."""
+    diagnoses = DiagnosisSerializer(many=True, read_only=True)
+    treatment_plans = TreatmentPlanSerializer(many=True, read_only=True)
+    vital_signs = VitalSignSerializer(many=True, read_only=True)
+    lab_results = LabResultReferenceSerializer(
+        source='lab_result_references',
+        many=True,
+        read_only=True
+    )
+    prescriptions = PrescriptionReferenceSerializer(
+        source='prescription_references',
+        many=True,
+        read_only=True
+    )
+
+    class Meta(EncounterSerializer.Meta):
+        fields = EncounterSerializer.Meta.fields + [
+            'diagnoses', 'treatment_plans', 'vital_signs',
+            'lab_results', 'prescriptions'
+        ]
@@ -229,3 +229,153 @@ class PrescriptionReferenceTests(APITestCase):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['prescription_id'], 'PRES001')
+
+
+class PatientChartTests(APITestCase):
+    """Test cases for the patient chart endpoint."""
+
+    def setUp(self):
+        """Set up a record with encounters on consecutive days."""
+        self.medical_record = MedicalRecord.objects.create(
+            patient_id=1,
+            patient_name='Test Patient'
+        )
+        for day in range(1, 6):
+            encounter = Encounter.objects.create(
+                medical_record=self.medical_record,
+                doctor_id=1,
+                doctor_name='Dr. Test',
+                encounter_date=f'2024-02-0{day}T10:00:00Z',
+                chief_complaint=f'Visit {day}'
+            )
+            Diagnosis.objects.create(encounter=encounter, icd_code='R51', description='Headache')
+            TreatmentPlan.objects.create(encounter=encounter, description='Rest')
+            VitalSign.objects.create(
+                encounter=encounter,
+                nurse_id=2,
+                timestamp=f'2024-02-0{day}T10:05:00Z',
+                heart_rate=70 + day
+            )
+            LabResultReference.objects.create(
+                encounter=encounter,
+                lab_order_item_id=f'LAB{day}',
+                test_name='Blood Test',
+                result_summary_url='http://example.com/results'
+            )
+            PrescriptionReference.objects.create(
+                encounter=encounter,
+                prescription_id=f'PRES{day}',
+                issue_date=f'2024-02-0{day}T11:00:00Z',
+                prescription_details_url='http://example.com/prescription'
+            )
+        self.url = reverse('patient-chart', kwargs={'patient_id': 1})
+
+    def test_get_chart(self):
+        """Test that the chart nests every child relation, most recent encounter first."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['medical_record']['patient_name'], 'Test Patient')
+        self.assertEqual(len(response.data['encounters']), 5)
+        self.assertFalse(response.data['has_more'])
+
+        latest = response.data['encounters'][0]
+        self.assertEqual(latest['chief_complaint'], 'Visit 5')
+        self.assertEqual(latest['vital_signs'][0]['heart_rate'], 75)
+        for relation in ['diagnoses', 'treatment_plans', 'lab_results', 'prescriptions']:
+            self.assertEqual(len(latest[relation]), 1)
+
+    def test_chart_query_count_does_not_grow_with_encounters(self):
+        """Test that the chart loads in a fixed number of queries."""
+        # Record, encounters and one query per child relation
+        with self.assertNumQueries(7):
+            self.client.get(self.url)
+
+    def test_chart_limit(self):
+        """Test limiting the number of encounters."""
+        response = self.client.get(self.url, {'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [encounter['chief_complaint'] for encounter in response.data['encounters']],
+            ['Visit 5', 'Visit 4']
+        )
+        self.assertTrue(response.data['has_more'])
+
+    def test_chart_date_window(self):
+        """Test restricting encounters to a date window."""
+        response = self.client.get(self.url, {'start_date': '2024-02-02', 'end_date': '2024-02-03'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [encounter['chief_complaint'] for encounter in response.data['encounters']],
+            ['Visit 3', 'Visit 2']
+        )
+
+    def test_chart_invalid_date_window(self):
+        """Test that an inverted date window is rejected."""
+        response = self.client.get(self.url, {'start_date': '2024-02-03', 'end_date': '2024-02-02'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_chart_not_found(self):
+        """Test the chart of a patient without a medical record."""
+        response = self.client.get(reverse('patient-chart', kwargs={'patient_id': 99}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class EncounterPaginationTests(APITestCase):
+    """Test cases for keyset pagination of encounters."""
+
+    def setUp(self):
+        """Set up encounters, some sharing the same date."""
+        self.medical_record = MedicalRecord.objects.create(
+            patient_id=1,
+            patient_name='Test Patient'
+        )
+        for index in range(25):
+            Encounter.objects.create(
+                medical_record=self.medical_record,
+                doctor_id=1,
+                doctor_name='Dr. Test',
+                encounter_date=f'2024-02-{index // 2 + 1:02d}T10:00:00Z',
+                chief_complaint=f'Visit {index}'
+            )
+        self.url = reverse('encounter-list', kwargs={'patient_id': 1})
+
+    def test_walk_pages_forward_and_back(self):
+        """Test that following cursors visits every encounter exactly once, in order."""
+        expected = list(
+            Encounter.objects.order_by('-encounter_date', '-id').values_list('id', flat=True)
+        )
+
+        pages = []
+        url = self.url
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            url = response.data['next']
+        self.assertEqual(
+            [encounter['id'] for page in pages for encounter in page['results']],
+            expected
+        )
+
+        visited = []
+        url = pages[-1]['previous']
+        while url:
+            response = self.client.get(url)
+            visited = [encounter['id'] for encounter in response.data['results']] + visited
+            url = response.data['previous']
+        self.assertEqual(visited, expected[:len(visited)])
+        self.assertEqual(len(visited), len(expected) - len(pages[-1]['results']))
+
+    def test_count_on_request(self):
+        """Test that the count is only computed when asked for."""
+        response = self.client.get(self.url)
+        self.assertNotIn('count', response.data)
+
+        response = self.client.get(self.url, {'count': 'true'})
+        self.assertEqual(response.data['count'], 25)
+        self.assertFalse(response.data['count_is_estimate'])
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected."""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -6,6 +6,7 @@ from .views import (
     EncounterViewSet,
     LabResultReferenceViewSet,
     MedicalRecordViewSet,
+    PatientChartView,
     PrescriptionReferenceViewSet,
     TreatmentPlanViewSet,
     VitalSignViewSet,
@@ -22,4 +23,5 @@ router.register(r'patients/(?P<patient_id>\d+)/encounters/(?P<encounter_id>[^/.]
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('patients/<int:patient_id>/chart/', PatientChartView.as_view(), name='patient-chart'),
 ] 
\ No newline at end of file
@@ -1,7 +1,12 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Prefetch, prefetch_related_objects
 from django.shortcuts import render
+from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from .models import (
     Diagnosis,
@@ -13,10 +18,12 @@ from .models import (
     VitalSign,
 )
 from .serializers import (
+    ChartEncounterSerializer,
     DiagnosisSerializer,
     EncounterSerializer,
     LabResultReferenceSerializer,
     MedicalRecordSerializer,
+    PatientChartQuerySerializer,
     PrescriptionReferenceSerializer,
     TreatmentPlanSerializer,
     VitalSignSerializer,
@@ -44,6 +51,7 @@ class EncounterViewSet(viewsets.ModelViewSet):
     queryset = Encounter.objects.all()
     serializer_class = EncounterSerializer
     permission_classes = [permissions.AllowAny]  # Allow all requests
+    ordering = ('-encounter_date', '-id')
 
     def get_queryset(self):
         """Filter encounters based on user role and ID."""
@@ -118,6 +126,7 @@ class VitalSignViewSet(viewsets.ModelViewSet):
     queryset = VitalSign.objects.all()
     serializer_class = VitalSignSerializer
     permission_classes = [permissions.AllowAny]  # Allow all requests
+    ordering = ('-timestamp', '-id')
 
     def get_queryset(self):
         """Filter vital signs based on user role and ID."""
@@ -181,3 +190,72 @@ class PrescriptionReferenceViewSet(viewsets.ModelViewSet):
             id=self.kwargs.get('encounter_id')
         )
         serializer.save(encounter=encounter)
+
+
+class PatientChartView(APIView):
+    """
+    Patient chart: the medical record with its encounters and all their clinical data.
+
+    Loads in a fixed number of queries regardless of the number of encounters:
+    one for the record, one for the encounters and one per child relation.
+    """
+    permission_classes = [permissions.AllowAny]  # Allow all requests
+
+    CHART_PREFETCHES = (
+        Prefetch('diagnoses', queryset=Diagnosis.objects.order_by('-is_primary', 'id')),
+        Prefetch('treatment_plans', queryset=TreatmentPlan.objects.order_by('id')),
+        Prefetch('vital_signs', queryset=VitalSign.objects.order_by('timestamp', 'id')),
+        Prefetch('lab_result_references', queryset=LabResultReference.objects.order_by('id')),
+        Prefetch('prescription_references', queryset=PrescriptionReference.objects.order_by('issue_date', 'id')),
+    )
+
+    def get(self, request, patient_id):
+        """
+        Return the patient's chart, most recent encounters first.
+
+        Query parameters:
+            limit: Maximum number of encounters to include
+            start_date: Only include encounters on or after this date
+            end_date: Only include encounters on or before this date
+        """
+        query = PatientChartQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        limit = query.validated_data['limit']
+        start_date = query.validated_data.get('start_date')
+        end_date = query.validated_data.get('end_date')
+
+        medical_record = MedicalRecord.objects.filter(
+            patient_id=patient_id
+        ).order_by('created_at').first()
+        if medical_record is None:
+            return Response(
+                {'error': 'Medical record not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        encounters = Encounter.objects.filter(
+            medical_record__patient_id=patient_id
+        ).order_by('-encounter_date', '-id')
+        # Compare against datetime bounds so the encounter_date index stays usable
+        if start_date:
+            encounters = encounters.filter(
+                encounter_date__gte=timezone.make_aware(datetime.combine(start_date, time.min))
+            )
+        if end_date:
+            encounters = encounters.filter(
+                encounter_date__lt=timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+            )
+
+        # Fetch one extra row to know whether the limit cut the chart short
+        encounters = list(encounters[:limit + 1])
+        has_more = len(encounters) > limit
+        encounters = encounters[:limit]
+        prefetch_related_objects(encounters, *self.CHART_PREFETCHES)
+
+        return Response({
+            'patient_id': patient_id,
+            'medical_record': MedicalRecordSerializer(medical_record).data,
+            'encounters': ChartEncounterSerializer(encounters, many=True).data,
+            'has_more': has_more,
+        })
@@ -137,7 +137,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Allow all requests
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'EHR.pagination.KeysetPagination',
     'PAGE_SIZE': 10
 }
 
@@ -160,3 +160,7 @@ SIMPLE_JWT = {
 # User Service Settings
 USER_SERVICE_URL = os.getenv('USER_SERVICE_URL', 'http://localhost:8000')
 USER_SERVICE_VERIFY_TOKEN_URL = f'{USER_SERVICE_URL}/api/v1/users/token/verify/'
+
+# Number of encounters returned by the patient chart endpoint
+PATIENT_CHART_DEFAULT_ENCOUNTERS = int(os.getenv('PATIENT_CHART_DEFAULT_ENCOUNTERS', 50))
+PATIENT_CHART_MAX_ENCOUNTERS = int(os.getenv('PATIENT_CHART_MAX_ENCOUNTERS', 200))
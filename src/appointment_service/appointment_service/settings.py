@@ -144,7 +144,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ),
 
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'appointments.pagination.KeysetPagination',
     'PAGE_SIZE': 20
 }
 
@@ -161,6 +161,19 @@ SIMPLE_JWT = {
 CELERY_ENABLED = False
 
 NOTIFICATION_SERVICE_ENABLED = False
+
+# Batch time slot generation
+SLOT_GENERATION_WORKERS = int(os.environ.get('SLOT_GENERATION_WORKERS', 1))
+SLOT_GENERATION_CHUNK_SIZE = int(os.environ.get('SLOT_GENERATION_CHUNK_SIZE', 25))
+SLOT_GENERATION_BATCH_SIZE = int(os.environ.get('SLOT_GENERATION_BATCH_SIZE', 1000))
+
+# Largest slot generation run accepted over the API, bigger ones use the command
+SLOT_GENERATION_MAX_DOCTORS = int(os.environ.get('SLOT_GENERATION_MAX_DOCTORS', 50))
+SLOT_GENERATION_MAX_DAYS = int(os.environ.get('SLOT_GENERATION_MAX_DAYS', 90))
+
+# Number of appointments handled per batch when sending reminders
+REMINDER_CHUNK_SIZE = int(os.environ.get('REMINDER_CHUNK_SIZE', 500))
+
 # Celery settings
 # CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 # CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
@@ -177,3 +190,42 @@ USER_SERVICE_URL = os.environ.get('USER_SERVICE_URL', 'http://localhost:8000/api
 EHR_SERVICE_URL = os.environ.get('EHR_SERVICE_URL', 'http://localhost:8001/api/v1')
 BILLING_SERVICE_URL = os.environ.get('BILLING_SERVICE_URL', 'http://localhost:8003/api/v1')
 NOTIFICATION_SERVICE_URL = os.environ.get('NOTIFICATION_SERVICE_URL', 'http://localhost:8007/api/v1')
+
+# Inter-service HTTP client: timeouts in seconds, retries apply to idempotent calls only
+SERVICE_HTTP_CONNECT_TIMEOUT = float(os.environ.get('SERVICE_HTTP_CONNECT_TIMEOUT', 1.0))
+SERVICE_HTTP_READ_TIMEOUT = float(os.environ.get('SERVICE_HTTP_READ_TIMEOUT', 5.0))
+SERVICE_HTTP_MAX_RETRIES = int(os.environ.get('SERVICE_HTTP_MAX_RETRIES', 2))
+SERVICE_HTTP_BACKOFF = float(os.environ.get('SERVICE_HTTP_BACKOFF', 0.1))
+SERVICE_HTTP_POOL_SIZE = int(os.environ.get('SERVICE_HTTP_POOL_SIZE', 20))
+SERVICE_HTTP_CIRCUIT_THRESHOLD = int(os.environ.get('SERVICE_HTTP_CIRCUIT_THRESHOLD', 5))
+SERVICE_HTTP_CIRCUIT_RESET = int(os.environ.get('SERVICE_HTTP_CIRCUIT_RESET', 30))
+
+# Cache shared by the services: Redis when REDIS_URL is set, e.g. redis://redis:6379/0
+# for the redis service of docker-compose.yml. Without it every process has its
+# own LocMemCache and never sees the User Service's invalidations, so cached user
+# details are only kept for a few seconds.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# User details cache: in-process LRU in front of the shared cache, TTLs in seconds
+USER_CACHE_MAXSIZE = int(os.environ.get('USER_CACHE_MAXSIZE', 2048))
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60 if REDIS_URL else 5))
+USER_CACHE_SHARED_TTL = int(os.environ.get('USER_CACHE_SHARED_TTL', 600 if REDIS_URL else 5))
+USER_CACHE_SYNC_INTERVAL = int(os.environ.get('USER_CACHE_SYNC_INTERVAL', 5))
+
+# Seconds before a doctor's in-process availability index is rebuilt from the database.
+# Changes are also published through the shared cache, so this only bounds staleness
+# when it is unreachable or, without REDIS_URL, local to each process.
+AVAILABILITY_INDEX_TTL = int(os.environ.get('AVAILABILITY_INDEX_TTL', 300 if REDIS_URL else 5))
@@ -0,0 +1,214 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+# Counter of each doctor's slot changes, bumped in the cache shared by every process
+VERSION_KEY = 'availability-index:version:{}'
+
+
+def day_start(value):
+    """Return the aware datetime at midnight of the given date."""
+    return timezone.make_aware(datetime.combine(value, datetime.min.time()))
+
+
+class DoctorSlotIndex:
+    """
+    Sorted array of one doctor's free time slots.
+
+    Slots are kept as (start_time, end_time, id) tuples ordered by start time,
+    so a range query is a binary search followed by a scan of the k matches.
+    """
+
+    def __init__(self, slots, horizon, version=None):
+        self.slots = sorted(slots)
+        self.starts = [slot[0] for slot in self.slots]
+        self.horizon = horizon
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def covers(self, range_start):
+        """Check whether the index holds every free slot from range_start onwards."""
+        return range_start >= self.horizon
+
+    def query(self, range_start, range_end):
+        """Return free slots starting at or after range_start and ending before range_end."""
+        matches = []
+        index = bisect_left(self.starts, range_start)
+        while index < len(self.slots) and self.starts[index] < range_end:
+            slot = self.slots[index]
+            if slot[1] < range_end:
+                matches.append(slot)
+            index += 1
+        return matches
+
+    def add(self, slot):
+        """Insert a slot unless it is already present."""
+        index = bisect_left(self.slots, slot)
+        if index < len(self.slots) and self.slots[index] == slot:
+            return
+        self.slots.insert(index, slot)
+        self.starts.insert(index, slot[0])
+
+    def remove(self, slot):
+        """Remove a slot if it is present."""
+        start_time, _, slot_id = slot
+        index = bisect_left(self.starts, start_time)
+        stop = bisect_right(self.starts, start_time)
+        for position in range(index, stop):
+            if self.slots[position][2] == slot_id:
+                del self.slots[position]
+                del self.starts[position]
+                return
+
+
+class AvailabilityIndex:
+    """
+    In-process index of free time slots, built lazily per doctor.
+
+    Each doctor's index is loaded from TimeSlot with one query on first use and
+    then kept up to date in place when this process books or frees slots. Every
+    change also bumps the doctor's version in the shared cache, which reads
+    check, so an index changed by another process is rebuilt on its next read.
+    Entries expire after AVAILABILITY_INDEX_TTL seconds as well, which bounds
+    staleness when the shared cache is unreachable or local to the process.
+    """
+
+    def __init__(self, ttl=None):
+        self._ttl = ttl
+        self._doctors = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'AVAILABILITY_INDEX_TTL', 300)
+
+    def free_slots(self, doctor_id, start_date, end_date):
+        """
+        Return free slots that start on or after start_date and end on or before end_date.
+
+        Returns:
+            List of (start_time, end_time, id) tuples ordered by start time
+        """
+        range_start = day_start(start_date)
+        range_end = day_start(end_date + timedelta(days=1))
+
+        index = self._get(doctor_id)
+        if index.covers(range_start):
+            with self._lock:
+                return index.query(range_start, range_end)
+
+        # Past dates are not indexed, answer them straight from the database
+        return list(
+            self._free_slot_queryset(doctor_id)
+            .filter(start_time__gte=range_start, end_time__lt=range_end)
+            .values_list('start_time', 'end_time', 'id')
+        )
+
+    def mark_booked(self, doctor_id, slots):
+        """Drop booked slots from a doctor's index."""
+        def remove(index):
+            for slot in slots:
+                index.remove((slot.start_time, slot.end_time, slot.id))
+
+        self._apply(doctor_id, remove)
+
+    def mark_free(self, doctor_id, slots):
+        """Add freed slots back to a doctor's index."""
+        def add(index):
+            for slot in slots:
+                if slot.end_time > index.horizon:
+                    index.add((slot.start_time, slot.end_time, slot.id))
+
+        self._apply(doctor_id, add)
+
+    def invalidate(self, doctor_id=None):
+        """
+        Forget one doctor's index in every process, or every local index when no doctor is given.
+        """
+        if doctor_id is not None:
+            _bump_version(doctor_id)
+        with self._lock:
+            if doctor_id is None:
+                self._doctors.clear()
+            else:
+                self._doctors.pop(doctor_id, None)
+
+    def _apply(self, doctor_id, change):
+        version = _bump_version(doctor_id)
+        with self._lock:
+            index = self._doctors.get(doctor_id)
+            if index is None:
+                return
+            if version is not None and index.version != version - 1:
+                # Another change happened since the index was built, rebuild it
+                del self._doctors[doctor_id]
+                return
+            change(index)
+            if version is not None:
+                index.version = version
+
+    def _get(self, doctor_id):
+        version = _shared_version(doctor_id)
+        with self._lock:
+            index = self._doctors.get(doctor_id)
+        if (
+            index is not None
+            and (version is None or index.version == version)
+            and time.monotonic() - index.built_at <= self.ttl
+        ):
+            return index
+
+        # Built without holding the lock, so a cold doctor never blocks reads of the others.
+        # Changes committed while it loads bump the version past the one read above.
+        index = self._build(doctor_id, version)
+        with self._lock:
+            self._doctors[doctor_id] = index
+        return index
+
+    def _build(self, doctor_id, version=None):
+        horizon = day_start(timezone.now().date())
+        slots = (
+            self._free_slot_queryset(doctor_id)
+            .filter(end_time__gt=horizon)
+            .values_list('start_time', 'end_time', 'id')
+        )
+        return DoctorSlotIndex(slots, horizon, version)
+
+    @staticmethod
+    def _free_slot_queryset(doctor_id):
+        from .models import TimeSlot
+
+        return TimeSlot.objects.filter(doctor_id=doctor_id, is_booked=False)
+
+
+def _shared_version(doctor_id):
+    """Return a doctor's version from the shared cache, None when it is unreachable."""
+    try:
+        return cache.get(VERSION_KEY.format(doctor_id), 0)
+    except Exception:
+        return None
+
+
+def _bump_version(doctor_id):
+    """Bump a doctor's version in the shared cache and return it, None when it is unreachable."""
+    key = VERSION_KEY.format(doctor_id)
+    try:
+        # incr is atomic on Redis; the key may have been evicted, so seed it first
+        cache.add(key, 0, timeout=None)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+            return 1
+    except Exception:
+        return None
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,138 @@
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+
+from .models import DoctorSchedule, TimeSlot
+
+# MySQL error codes of a deadlock and of a lock wait timeout
+LOCK_CONFLICT_ERRORS = {1205, 1213}
+
+
+class SlotUnavailableError(Exception):
+    """Raised when the requested interval cannot be booked for the doctor."""
+
+
+def book_time_slots(doctor_id, start_time, end_time):
+    """
+    Claim every time slot covering [start_time, end_time) for a doctor.
+
+    Bookings of a doctor are serialised by first locking the doctor's schedule
+    rows with SELECT ... FOR UPDATE. The overlapping slot rows are then locked
+    and claimed together with a single conditional UPDATE, so two concurrent
+    bookings can never both succeed for the same slot. An interval no published
+    slot overlaps gets an ad-hoc slot, which is only allowed for doctors with a
+    schedule to serialise on. Must be called inside a transaction.
+
+    Args:
+        doctor_id: ID of the doctor
+        start_time: Start of the requested interval
+        end_time: End of the requested interval
+
+    Returns:
+        List of the booked TimeSlot instances
+
+    Raises:
+        SlotUnavailableError: If any part of the interval is booked or not
+            covered, or the booking lost a lock conflict with another one
+    """
+    try:
+        return _book_time_slots(doctor_id, start_time, end_time)
+    except OperationalError as exc:
+        if not _is_lock_conflict(exc):
+            raise
+        raise SlotUnavailableError('The requested time slot is being booked, please try again.')
+
+
+def _book_time_slots(doctor_id, start_time, end_time):
+    schedules = list(
+        DoctorSchedule.objects.select_for_update()
+        .filter(doctor_id=doctor_id)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+    overlapping = list(
+        TimeSlot.objects.select_for_update()
+        .filter(
+            doctor_id=doctor_id,
+            start_time__lt=end_time,
+            end_time__gt=start_time
+        )
+        .order_by('start_time')
+    )
+
+    if not overlapping:
+        if not schedules:
+            raise SlotUnavailableError('The requested time is not covered by the doctor\'s schedule.')
+
+        # No published slots cover this interval, book an ad-hoc slot for flexibility
+        try:
+            with transaction.atomic():
+                slot = TimeSlot.objects.create(
+                    doctor_id=doctor_id,
+                    start_time=start_time,
+                    end_time=end_time,
+                    is_booked=True
+                )
+        except IntegrityError:
+            raise SlotUnavailableError('The requested time slot has just been booked.')
+        return [slot]
+
+    if any(slot.is_booked for slot in overlapping):
+        raise SlotUnavailableError('The requested time overlaps an existing booking.')
+
+    if not _covers_interval(overlapping, start_time, end_time):
+        raise SlotUnavailableError('The requested time is not covered by contiguous available slots.')
+
+    claimed = TimeSlot.objects.filter(
+        pk__in=[slot.pk for slot in overlapping],
+        is_booked=False
+    ).update(is_booked=True, updated_at=timezone.now())
+
+    if claimed != len(overlapping):
+        raise SlotUnavailableError('The requested time slot has just been booked.')
+
+    for slot in overlapping:
+        slot.is_booked = True
+    return overlapping
+
+
+def release_time_slots(doctor_id, start_time, end_time):
+    """
+    Free the booked time slots overlapping [start_time, end_time) for a doctor.
+
+    Returns:
+        List of the released TimeSlot instances
+    """
+    with transaction.atomic():
+        booked = list(
+            TimeSlot.objects.select_for_update()
+            .filter(
+                doctor_id=doctor_id,
+                start_time__lt=end_time,
+                end_time__gt=start_time,
+                is_booked=True
+            )
+        )
+        if booked:
+            TimeSlot.objects.filter(
+                pk__in=[slot.pk for slot in booked]
+            ).update(is_booked=False, updated_at=timezone.now())
+
+    for slot in booked:
+        slot.is_booked = False
+    return booked
+
+
+def _covers_interval(slots, start_time, end_time):
+    """Check that slots ordered by start time cover the interval without gaps."""
+    if slots[0].start_time > start_time or slots[-1].end_time < end_time:
+        return False
+    return all(
+        current.start_time == previous.end_time
+        for previous, current in zip(slots, slots[1:])
+    )
+
+
+def _is_lock_conflict(exc):
+    """Check whether a database error is a deadlock or a lock wait timeout."""
+    return bool(exc.args) and exc.args[0] in LOCK_CONFLICT_ERRORS
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.tasks import generate_timeslots_for_doctors
+
+
+class Command(BaseCommand):
+    """Generate time slots for many doctors using a pool of worker processes."""
+    help = 'Generate time slots for the given doctors (or all doctors) from their schedules.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'doctor_ids',
+            nargs='*',
+            type=int,
+            help='IDs of the doctors to generate slots for'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Generate slots for every doctor with an available schedule'
+        )
+        parser.add_argument(
+            '--start-date',
+            help='First day to generate slots for (YYYY-MM-DD, defaults to today)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Number of days to generate slots for'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.SLOT_GENERATION_WORKERS,
+            help='Number of worker processes'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.SLOT_GENERATION_CHUNK_SIZE,
+            help='Number of doctors per chunk'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.SLOT_GENERATION_BATCH_SIZE,
+            help='Number of rows per INSERT statement'
+        )
+
+    def handle(self, *args, **options):
+        if options['all'] == bool(options['doctor_ids']):
+            raise CommandError('Pass either doctor IDs or --all.')
+
+        try:
+            report = generate_timeslots_for_doctors(
+                doctor_ids='all' if options['all'] else options['doctor_ids'],
+                start_date=options['start_date'],
+                days=options['days'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size']
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        for chunk in report['chunks']:
+            self.stdout.write(
+                f"Chunk {chunk['chunk']}: {chunk['doctors']} doctors, "
+                f"{chunk['slots']} slots in {chunk['seconds']:.2f}s"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {report['total_slots']} time slots for {report['total_doctors']} doctors "
+            f"from {report['start_date']} over {report['days']} days in {report['seconds']:.2f}s"
+        ))
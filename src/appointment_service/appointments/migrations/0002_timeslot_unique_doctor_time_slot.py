@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-16 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='timeslot',
+            constraint=models.UniqueConstraint(fields=('doctor_id', 'start_time', 'end_time'), name='unique_doctor_time_slot'),
+        ),
+    ]
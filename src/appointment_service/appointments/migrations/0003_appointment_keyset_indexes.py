@@ -0,0 +1,21 @@
+# Generated by Django 5.0.2 on 2026-10-16 22:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_timeslot_unique_doctor_time_slot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient_id', 'appointment_time', 'id'], name='appointment_patient_394b4e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor_id', 'appointment_time', 'id'], name='appointment_doctor__be00b2_idx'),
+        ),
+    ]
@@ -66,6 +66,9 @@ class Appointment(models.Model):
             models.Index(fields=['doctor_id']),
             models.Index(fields=['appointment_time']),
             models.Index(fields=['status']),
+            # Keyset pagination of a patient's or doctor's appointments
+            models.Index(fields=['patient_id', 'appointment_time', 'id']),
+            models.Index(fields=['doctor_id', 'appointment_time', 'id']),
         ]
 
     def __str__(self):
@@ -173,6 +176,12 @@ class TimeSlot(models.Model):
             models.Index(fields=['start_time', 'end_time']),
             models.Index(fields=['is_booked']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['doctor_id', 'start_time', 'end_time'],
+                name='unique_doctor_time_slot'
+            ),
+        ]
 
     def __str__(self):
         return f"Time Slot {self.start_time} - {self.end_time}" 
\ No newline at end of file
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from .models import Appointment, DoctorSchedule, TimeSlot
@@ -66,4 +67,45 @@ class AvailabilityRequestSerializer(serializers.Serializer):
         default=7,
         min_value=1,
         max_value=30
-    ) 
\ No newline at end of file
+    ) 
+
+
+class SlotGenerationSerializer(serializers.Serializer):
+    """
+    Serializer for generating time slots from a request.
+
+    Requests cover at most SLOT_GENERATION_MAX_DOCTORS doctors and
+    SLOT_GENERATION_MAX_DAYS days, larger runs go through the
+    generate_timeslots management command.
+    """
+    doctor_id = serializers.IntegerField(required=False, min_value=1)
+    doctor_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+        max_length=settings.SLOT_GENERATION_MAX_DOCTORS
+    )
+    days = serializers.IntegerField(
+        required=False,
+        default=30,
+        min_value=1,
+        max_value=settings.SLOT_GENERATION_MAX_DAYS
+    )
+    start_date = serializers.DateField(required=False, input_formats=['%Y-%m-%d'])
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict) and data.get('doctor_ids') == 'all':
+            raise serializers.ValidationError({
+                'doctor_ids': ['Generating slots for all doctors is done with the generate_timeslots --all command.']
+            })
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        doctor_ids = attrs.pop('doctor_ids', None)
+        doctor_id = attrs.pop('doctor_id', None)
+        if doctor_ids is None:
+            if doctor_id is None:
+                raise serializers.ValidationError({'doctor_id': ['Doctor ID is required.']})
+            doctor_ids = [doctor_id]
+        attrs['doctor_ids'] = list(dict.fromkeys(doctor_ids))
+        return attrs
@@ -1,10 +1,23 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from itertools import islice
 from celery import shared_task
 from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
 from django.utils import timezone
 
+from .availability import availability_index
 from .models import Appointment, DoctorSchedule, TimeSlot
-from .utils import notify_notification_service, notify_ehr_service, notify_billing_service, get_user_details
+from .utils import (
+    notify_notification_service,
+    notify_notification_service_bulk,
+    notify_ehr_service,
+    notify_billing_service,
+    get_user_details,
+    get_users_details
+)
 
 
 @shared_task
@@ -28,21 +41,8 @@ def send_appointment_notification(appointment_id, notification_type):
     if not patient or not doctor:
         return "Failed to get user details"
     
-    patient_name = f"{patient.get('first_name', '')} {patient.get('last_name', '')}"
-    doctor_name = f"Dr. {doctor.get('first_name', '')} {doctor.get('last_name', '')}"
-    
-    # Format appointment time
-    appointment_time = appointment.appointment_time.strftime("%Y-%m-%d %H:%M")
-    
     # Notification data based on type
-    data = {
-        "appointment_id": appointment.id,
-        "appointment_time": appointment_time,
-        "patient_name": patient_name,
-        "doctor_name": doctor_name,
-        "reason_for_visit": appointment.reason_for_visit,
-        "status": appointment.status
-    }
+    data = _build_notification_data(appointment, patient, doctor)
     
     # Send notification based on type
     if notification_type == 'APPOINTMENT_REQUESTED_PATIENT':
@@ -97,25 +97,62 @@ def send_appointment_reminders():
     Send reminders for upcoming appointments.
     Schedule this task to run daily.
     """
-    # Get appointments in the next 24 hours
+    # Stream appointments in the next 24 hours instead of loading them all
+    chunk_size = settings.REMINDER_CHUNK_SIZE
     reminder_time = timezone.now() + timedelta(hours=24)
     appointments = Appointment.objects.filter(
         appointment_time__lte=reminder_time,
         appointment_time__gte=timezone.now(),
         status=Appointment.CONFIRMED
-    )
+    ).only(
+        'id', 'patient_id', 'doctor_id', 'appointment_time',
+        'reason_for_visit', 'status'
+    ).order_by('appointment_time', 'id').iterator(chunk_size=chunk_size)
     
-    for appointment in appointments:
-        send_appointment_notification(
-            appointment.id,
-            'APPOINTMENT_REMINDER_PATIENT'
-        )
-        send_appointment_notification(
-            appointment.id,
-            'APPOINTMENT_REMINDER_DOCTOR'
-        )
+    total_sent = 0
+    while True:
+        chunk = list(islice(appointments, chunk_size))
+        if not chunk:
+            break
+
+        # Resolve every patient and doctor of the chunk in one lookup
+        user_ids = {appointment.patient_id for appointment in chunk}
+        user_ids.update(appointment.doctor_id for appointment in chunk)
+        users = get_users_details(user_ids)
+
+        patient_reminders = []
+        doctor_reminders = []
+        for appointment in chunk:
+            patient = users.get(appointment.patient_id)
+            doctor = users.get(appointment.doctor_id)
+            if not patient or not doctor:
+                continue
+
+            data = _build_notification_data(appointment, patient, doctor)
+            patient_reminders.append({'recipient_id': appointment.patient_id, 'data': data})
+            doctor_reminders.append({'recipient_id': appointment.doctor_id, 'data': data})
+
+        if patient_reminders:
+            notify_notification_service_bulk('APPOINTMENT_REMINDER_PATIENT', patient_reminders)
+            notify_notification_service_bulk('APPOINTMENT_REMINDER_DOCTOR', doctor_reminders)
+        total_sent += len(patient_reminders)
     
-    return f"Sent reminders for {appointments.count()} appointments"
+    return f"Sent reminders for {total_sent} appointments"
+
+
+def _build_notification_data(appointment, patient, doctor):
+    """Build the notification payload for an appointment."""
+    patient_name = f"{patient.get('first_name', '')} {patient.get('last_name', '')}"
+    doctor_name = f"Dr. {doctor.get('first_name', '')} {doctor.get('last_name', '')}"
+
+    return {
+        "appointment_id": appointment.id,
+        "appointment_time": appointment.appointment_time.strftime("%Y-%m-%d %H:%M"),
+        "patient_name": patient_name,
+        "doctor_name": doctor_name,
+        "reason_for_visit": appointment.reason_for_visit,
+        "status": appointment.status
+    }
 
 
 @shared_task
@@ -172,44 +209,139 @@ def generate_timeslots_for_doctor(doctor_id, start_date=None, days=30):
         start_date: Start date for generating slots (defaults to today)
         days: Number of days to generate slots for
     """
-    from .utils import generate_time_slots
+    start_date = _parse_start_date(start_date)
+    total_slots = _generate_slots_for_doctor(doctor_id, start_date, days)
+
+    return f"Generated {total_slots} time slots for doctor {doctor_id}"
+
+
+@shared_task
+def generate_timeslots_for_doctors(doctor_ids, start_date=None, days=30,
+                                   workers=1, chunk_size=25, batch_size=1000):
+    """
+    Generate time slots for many doctors at once.
+
+    Doctors are split into chunks and each chunk is generated in its own
+    worker process with its own database connection, committing once per doctor.
     
-    if start_date is None:
-        start_date = timezone.now().date()
+    Args:
+        doctor_ids: List of doctor IDs, or "all" for every doctor with an available schedule
+        start_date: Start date for generating slots (defaults to today)
+        days: Number of days to generate slots for
+        workers: Number of worker processes (1 runs inline)
+        chunk_size: Number of doctors handled per chunk
+        batch_size: Number of rows per INSERT statement
+
+    Returns:
+        Report with per-chunk timings and totals
+    """
+    start_date = _parse_start_date(start_date)
+
+    if doctor_ids == 'all':
+        doctor_ids = list(
+            DoctorSchedule.objects.filter(is_available=True)
+            .order_by('doctor_id')
+            .values_list('doctor_id', flat=True)
+            .distinct()
+        )
+
+    chunk_size = max(1, chunk_size)
+    chunks = [
+        doctor_ids[i:i + chunk_size]
+        for i in range(0, len(doctor_ids), chunk_size)
+    ]
+
+    started = time.perf_counter()
+    if workers > 1 and len(chunks) > 1:
+        # Forked workers must open their own connections instead of sharing ours
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)),
+            initializer=_init_slot_worker
+        ) as executor:
+            futures = [
+                executor.submit(_generate_slots_chunk, chunk, start_date, days, batch_size)
+                for chunk in chunks
+            ]
+            results = [future.result() for future in futures]
     else:
-        if isinstance(start_date, str):
-            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-    
-    # Get doctor's schedule
+        results = [
+            _generate_slots_chunk(chunk, start_date, days, batch_size)
+            for chunk in chunks
+        ]
+    elapsed = time.perf_counter() - started
+
+    for index, result in enumerate(results, start=1):
+        result['chunk'] = index
+
+    return {
+        'start_date': start_date.isoformat(),
+        'days': days,
+        'chunks': results,
+        'total_doctors': sum(result['doctors'] for result in results),
+        'total_slots': sum(result['slots'] for result in results),
+        'seconds': round(elapsed, 3)
+    }
+
+
+def _parse_start_date(start_date):
+    """Default the start date to today and accept YYYY-MM-DD strings."""
+    if start_date is None:
+        return timezone.now().date()
+    if isinstance(start_date, str):
+        return datetime.strptime(start_date, "%Y-%m-%d").date()
+    return start_date
+
+
+def _generate_slots_for_doctor(doctor_id, start_date, days, batch_size=None):
+    """
+    Insert the missing time slots for one doctor and return how many were created.
+    """
+    from .utils import generate_time_slots
+
+    # Get doctor's schedules that overlap the requested range in one query
     schedules = DoctorSchedule.objects.filter(
+        Q(valid_to__isnull=True) | Q(valid_to__gte=start_date),
         doctor_id=doctor_id,
         is_available=True,
-        valid_from__lte=start_date + timedelta(days=days),
-        valid_to__isnull=True
+        valid_from__lte=start_date + timedelta(days=days)
     ).order_by('day_of_week')
-    
-    # Add schedules with specific end dates that are still valid
-    schedules = schedules | DoctorSchedule.objects.filter(
+
+    # Diff all candidate slots against existing ones and insert only the missing rows
+    slots = generate_time_slots(
         doctor_id=doctor_id,
-        is_available=True,
-        valid_from__lte=start_date + timedelta(days=days),
-        valid_to__gte=start_date
-    ).order_by('day_of_week')
-    
+        schedules=schedules,
+        start_date=start_date,
+        days=days
+    )
+    if slots:
+        with transaction.atomic():
+            TimeSlot.objects.bulk_create(
+                slots,
+                batch_size=batch_size,
+                ignore_conflicts=True
+            )
+        availability_index.invalidate(doctor_id)
+
+    return len(slots)
+
+
+def _init_slot_worker():
+    """Make Django usable in a freshly started worker process."""
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def _generate_slots_chunk(doctor_ids, start_date, days, batch_size):
+    """Generate slots for a chunk of doctors and time the run."""
+    started = time.perf_counter()
     total_slots = 0
-    
-    # Generate slots for each schedule
-    for schedule in schedules:
-        slots = generate_time_slots(
-            doctor_id=doctor_id,
-            schedule=schedule,
-            start_date=start_date,
-            days=days
-        )
-        
-        # Save slots to database
-        if slots:
-            TimeSlot.objects.bulk_create(slots)
-            total_slots += len(slots)
-    
-    return f"Generated {total_slots} time slots for doctor {doctor_id}" 
\ No newline at end of file
+    for doctor_id in doctor_ids:
+        total_slots += _generate_slots_for_doctor(doctor_id, start_date, days, batch_size)
+
+    return {
+        'doctors': len(doctor_ids),
+        'slots': total_slots,
+        'seconds': round(time.perf_counter() - started, 3)
+    }
@@ -0,0 +1,691 @@
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+
+import requests
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from appointments import http_client
+from appointments.availability import AvailabilityIndex, day_start
+from appointments.booking import SlotUnavailableError, book_time_slots, release_time_slots
+from appointments.models import Appointment, DoctorSchedule, TimeSlot
+from appointments.user_cache import GENERATION_KEY, PROFILE_KEY, SUMMARY_KEY, UserProfileCache
+from appointments.tasks import generate_timeslots_for_doctors, send_appointment_reminders
+from appointments.utils import build_candidate_slots, generate_time_slots
+
+
+class GenerateSlotsTests(APITestCase):
+    """Tests for generating time slots over the API."""
+
+    def setUp(self):
+        self.url = reverse('doctorschedule-generate-slots')
+        # 2025-01-06 is a Monday
+        DoctorSchedule.objects.create(
+            doctor_id=7,
+            day_of_week=DoctorSchedule.MONDAY,
+            start_time=time(9, 0),
+            end_time=time(10, 0),
+            valid_from=date(2025, 1, 1)
+        )
+
+    def test_generates_slots_for_a_doctor(self):
+        response = self.client.post(
+            self.url, {'doctor_id': 7, 'days': 1, 'start_date': '2025-01-06'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['report']['total_doctors'], 1)
+        self.assertEqual(response.data['report']['total_slots'], TimeSlot.objects.filter(doctor_id=7).count())
+        self.assertGreater(response.data['report']['total_slots'], 0)
+
+    def test_invalid_requests_are_rejected(self):
+        payloads = [
+            {},
+            {'doctor_id': 7, 'days': 'abc'},
+            {'doctor_id': 7, 'days': 0},
+            {'doctor_id': 7, 'days': -5},
+            {'doctor_id': 7, 'days': 100000},
+            {'doctor_id': 7, 'start_date': '06/01/2025'},
+            {'doctor_ids': 7},
+            {'doctor_ids': []},
+            {'doctor_ids': ['abc']},
+            {'doctor_ids': 'all'},
+        ]
+        for payload in payloads:
+            with self.subTest(payload=payload):
+                response = self.client.post(self.url, payload, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(TimeSlot.objects.exists())
+
+    def test_list_body_is_rejected(self):
+        response = self.client.post(self.url, [7], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(SLOT_GENERATION_WORKERS=8)
+    def test_runs_inline_with_a_capped_doctor_count(self):
+        with mock.patch('appointments.views.generate_timeslots_for_doctors') as generate:
+            generate.return_value = {'total_slots': 0, 'total_doctors': 2}
+            response = self.client.post(self.url, {'doctor_ids': [7, 8, 7], 'days': 1}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(generate.call_args.kwargs['doctor_ids'], [7, 8])
+        self.assertEqual(generate.call_args.kwargs['workers'], 1)
+
+        too_many = list(range(1, settings.SLOT_GENERATION_MAX_DOCTORS + 2))
+        response = self.client.post(self.url, {'doctor_ids': too_many}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BookTimeSlotsTests(TestCase):
+    """Tests for claiming and releasing time slots."""
+
+    def setUp(self):
+        self.start = timezone.make_aware(datetime(2025, 1, 6, 9, 0))
+        DoctorSchedule.objects.create(
+            doctor_id=7,
+            day_of_week=DoctorSchedule.MONDAY,
+            start_time=time(9, 0),
+            end_time=time(12, 0),
+            valid_from=date(2025, 1, 1)
+        )
+
+    def at(self, minutes):
+        return self.start + timedelta(minutes=minutes)
+
+    def create_slots(self, *offsets, doctor_id=7):
+        return [
+            TimeSlot.objects.create(doctor_id=doctor_id, start_time=self.at(offset), end_time=self.at(offset + 30))
+            for offset in offsets
+        ]
+
+    def test_claims_contiguous_slots(self):
+        self.create_slots(0, 30, 60)
+
+        booked = book_time_slots(7, self.at(0), self.at(60))
+
+        self.assertEqual([slot.start_time for slot in booked], [self.at(0), self.at(30)])
+        self.assertEqual(
+            list(TimeSlot.objects.order_by('start_time').values_list('is_booked', flat=True)),
+            [True, True, False]
+        )
+
+    def test_overlapping_booking_is_rejected(self):
+        self.create_slots(0, 30, 60)
+        book_time_slots(7, self.at(0), self.at(60))
+
+        with self.assertRaises(SlotUnavailableError):
+            book_time_slots(7, self.at(30), self.at(90))
+        with self.assertRaises(SlotUnavailableError):
+            book_time_slots(7, self.at(45), self.at(50))
+        self.assertFalse(TimeSlot.objects.get(start_time=self.at(60)).is_booked)
+
+    def test_gap_between_slots_is_rejected(self):
+        self.create_slots(0, 60)
+
+        with self.assertRaises(SlotUnavailableError):
+            book_time_slots(7, self.at(0), self.at(90))
+        with self.assertRaises(SlotUnavailableError):
+            book_time_slots(7, self.at(-15), self.at(30))
+        self.assertFalse(TimeSlot.objects.filter(is_booked=True).exists())
+
+    def test_release_frees_the_slots(self):
+        self.create_slots(0, 30, 60)
+        book_time_slots(7, self.at(0), self.at(90))
+
+        released = release_time_slots(7, self.at(0), self.at(60))
+
+        self.assertEqual(len(released), 2)
+        self.assertEqual(
+            list(TimeSlot.objects.order_by('start_time').values_list('is_booked', flat=True)),
+            [False, False, True]
+        )
+        self.assertEqual(len(book_time_slots(7, self.at(0), self.at(60))), 2)
+
+    def test_ad_hoc_slot_is_booked_once(self):
+        booked = book_time_slots(7, self.at(0), self.at(45))
+
+        self.assertEqual(len(booked), 1)
+        self.assertTrue(booked[0].is_booked)
+        with self.assertRaises(SlotUnavailableError):
+            book_time_slots(7, self.at(30), self.at(60))
+
+    def test_ad_hoc_slot_needs_a_schedule(self):
+        with self.assertRaises(SlotUnavailableError):
+            book_time_slots(8, self.at(0), self.at(30))
+        self.assertFalse(TimeSlot.objects.exists())
+
+        # Published slots of a doctor without a schedule can still be booked
+        self.create_slots(0, doctor_id=8)
+        self.assertEqual(len(book_time_slots(8, self.at(0), self.at(30))), 1)
+
+    def test_bookings_lock_the_doctor_schedule(self):
+        with mock.patch.object(
+            DoctorSchedule.objects, 'select_for_update', wraps=DoctorSchedule.objects.select_for_update
+        ) as select_for_update:
+            book_time_slots(7, self.at(0), self.at(30))
+
+        select_for_update.assert_called_once_with()
+
+    def test_deadlock_is_reported_as_unavailable(self):
+        deadlock = OperationalError(1213, 'Deadlock found when trying to get lock')
+        with mock.patch('appointments.booking._book_time_slots', side_effect=deadlock):
+            with self.assertRaises(SlotUnavailableError):
+                book_time_slots(7, self.at(0), self.at(30))
+
+        with mock.patch('appointments.booking._book_time_slots', side_effect=OperationalError(2006, 'Gone away')):
+            with self.assertRaises(OperationalError):
+                book_time_slots(7, self.at(0), self.at(30))
+
+
+class AvailabilityIndexTests(TestCase):
+    """Tests for the in-process index of free time slots."""
+
+    def setUp(self):
+        cache.clear()
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        self.index = AvailabilityIndex(ttl=300)
+        self.slots = [
+            TimeSlot.objects.create(doctor_id=7, start_time=self.at(day, 9), end_time=self.at(day, 9, 30))
+            for day in range(3)
+        ]
+
+    def at(self, day, hour, minute=0):
+        return day_start(self.tomorrow + timedelta(days=day)) + timedelta(hours=hour, minutes=minute)
+
+    def free_ids(self, index=None, days=2):
+        index = index or self.index
+        return [slot_id for _, _, slot_id in index.free_slots(7, self.tomorrow, self.tomorrow + timedelta(days=days))]
+
+    def test_range_query(self):
+        TimeSlot.objects.create(doctor_id=7, start_time=self.at(0, 10), end_time=self.at(0, 10, 30), is_booked=True)
+        TimeSlot.objects.create(doctor_id=8, start_time=self.at(0, 11), end_time=self.at(0, 11, 30))
+
+        self.assertEqual(self.free_ids(days=2), [slot.pk for slot in self.slots])
+        self.assertEqual(self.free_ids(days=1), [slot.pk for slot in self.slots[:2]])
+        self.assertEqual(
+            self.index.free_slots(7, self.tomorrow + timedelta(days=1), self.tomorrow + timedelta(days=1)),
+            [(self.slots[1].start_time, self.slots[1].end_time, self.slots[1].pk)]
+        )
+
+    def test_reads_are_served_from_memory(self):
+        self.free_ids()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.free_ids()), 3)
+
+    def test_mark_booked_and_free(self):
+        self.free_ids()
+
+        with self.assertNumQueries(0):
+            self.index.mark_booked(7, self.slots[:2])
+            self.assertEqual(self.free_ids(), [self.slots[2].pk])
+
+            self.index.mark_free(7, self.slots[:1])
+            self.assertEqual(self.free_ids(), [self.slots[0].pk, self.slots[2].pk])
+
+    def test_entries_expire_after_the_ttl(self):
+        self.free_ids()
+        new_slot = TimeSlot.objects.create(doctor_id=7, start_time=self.at(0, 10), end_time=self.at(0, 10, 30))
+        self.assertNotIn(new_slot.pk, self.free_ids())
+
+        with mock.patch('appointments.availability.time.monotonic', return_value=10 ** 9):
+            self.assertIn(new_slot.pk, self.free_ids())
+
+    def test_past_dates_are_read_from_the_database(self):
+        yesterday = timezone.now().date() - timedelta(days=1)
+        past = TimeSlot.objects.create(
+            doctor_id=7,
+            start_time=day_start(yesterday) + timedelta(hours=9),
+            end_time=day_start(yesterday) + timedelta(hours=9, minutes=30)
+        )
+        self.free_ids()
+
+        with self.assertNumQueries(1):
+            slots = self.index.free_slots(7, yesterday, yesterday)
+
+        self.assertEqual([slot_id for _, _, slot_id in slots], [past.pk])
+
+    def test_changes_reach_other_processes(self):
+        other_process = AvailabilityIndex(ttl=300)
+        self.assertEqual(len(self.free_ids(other_process)), 3)
+
+        # Booked through this process
+        self.free_ids()
+        TimeSlot.objects.filter(pk=self.slots[0].pk).update(is_booked=True)
+        self.index.mark_booked(7, self.slots[:1])
+        self.assertEqual(self.free_ids(other_process), [slot.pk for slot in self.slots[1:]])
+
+        # Generated by a worker of the generate_timeslots command
+        new_slot = TimeSlot.objects.create(doctor_id=7, start_time=self.at(0, 10), end_time=self.at(0, 10, 30))
+        AvailabilityIndex().invalidate(7)
+        self.assertIn(new_slot.pk, self.free_ids(other_process))
+        self.assertIn(new_slot.pk, self.free_ids())
+
+    def test_local_changes_keep_the_index(self):
+        self.free_ids()
+        self.index.mark_booked(7, self.slots[:1])
+
+        with self.assertNumQueries(0):
+            self.free_ids()
+
+    def test_shared_cache_errors_fall_back_to_the_ttl(self):
+        self.free_ids()
+
+        with mock.patch('appointments.availability.cache.get', side_effect=ConnectionError), \
+                mock.patch('appointments.availability.cache.add', side_effect=ConnectionError):
+            self.index.mark_booked(7, self.slots[:1])
+            with self.assertNumQueries(0):
+                self.assertEqual(self.free_ids(), [slot.pk for slot in self.slots[1:]])
+
+    def test_index_is_built_without_holding_the_lock(self):
+        queryset = AvailabilityIndex._free_slot_queryset
+
+        def free_slot_queryset(doctor_id):
+            self.assertFalse(self.index._lock.locked())
+            return queryset(doctor_id)
+
+        with mock.patch.object(AvailabilityIndex, '_free_slot_queryset', side_effect=free_slot_queryset):
+            self.assertEqual(len(self.free_ids()), 3)
+
+
+class CircuitBreakerTests(TestCase):
+    """Tests for the per-host circuit breaker of the service HTTP client."""
+
+    def setUp(self):
+        self.breaker = http_client.CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_half_opens_for_a_single_trial(self):
+        with mock.patch('appointments.http_client.time.monotonic', return_value=100.0):
+            self.breaker.record_failure()
+            self.breaker.record_failure()
+        with mock.patch('appointments.http_client.time.monotonic', return_value=131.0):
+            self.assertTrue(self.breaker.allow_request())
+            self.assertFalse(self.breaker.allow_request())
+
+            # A failed trial opens the circuit again, a successful one closes it
+            self.breaker.record_failure()
+            self.assertFalse(self.breaker.allow_request())
+        with mock.patch('appointments.http_client.time.monotonic', return_value=162.0):
+            self.assertTrue(self.breaker.allow_request())
+            self.breaker.record_success()
+            self.assertTrue(self.breaker.allow_request())
+            self.assertTrue(self.breaker.allow_request())
+
+
+@mock.patch('appointments.http_client.time.sleep')
+class ServiceClientTests(TestCase):
+    """Tests for retries, timeouts and short-circuiting of the service HTTP client."""
+
+    URL = 'http://user-service/api/v1/users/1/'
+
+    def setUp(self):
+        self.client = http_client.ServiceClient(
+            connect_timeout=0.5, read_timeout=2.0, max_retries=2, failure_threshold=3, reset_timeout=30
+        )
+        self.client.session = mock.Mock(spec=requests.Session)
+
+    def respond(self, *outcomes):
+        self.client.session.request.side_effect = [
+            mock.Mock(status_code=outcome) if isinstance(outcome, int) else outcome
+            for outcome in outcomes
+        ]
+
+    def test_timeouts_are_passed_to_every_call(self, sleep):
+        self.respond(200, 200)
+
+        self.client.get(self.URL)
+        self.client.post(self.URL, json={}, timeout=9)
+
+        self.assertEqual(self.client.session.request.call_args_list, [
+            mock.call('GET', self.URL, timeout=(0.5, 2.0)),
+            mock.call('POST', self.URL, json={}, timeout=9),
+        ])
+
+    def test_idempotent_calls_are_retried(self, sleep):
+        self.respond(requests.ConnectionError(), 503, 200)
+
+        response = self.client.get(self.URL)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.session.request.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_retries_are_bounded(self, sleep):
+        self.respond(requests.Timeout(), requests.Timeout(), requests.Timeout())
+        with self.assertRaises(requests.Timeout):
+            self.client.get(self.URL)
+
+        # The circuit of the first host is open now, so use another one
+        self.respond(503, 503, 503)
+        self.assertEqual(self.client.get('http://ehr-service/api/v1/').status_code, 503)
+        self.assertEqual(self.client.session.request.call_count, 6)
+
+    def test_non_idempotent_calls_are_not_retried(self, sleep):
+        self.respond(requests.ConnectionError())
+        with self.assertRaises(requests.ConnectionError):
+            self.client.post(self.URL, json={})
+
+        self.respond(503)
+        self.assertEqual(self.client.post(self.URL, json={}).status_code, 503)
+        self.assertEqual(self.client.session.request.call_count, 2)
+        sleep.assert_not_called()
+
+    def test_posts_marked_idempotent_are_retried(self, sleep):
+        self.respond(requests.ConnectionError(), 201)
+
+        self.assertEqual(self.client.post(self.URL, json={}, idempotent=True).status_code, 201)
+
+    def test_client_errors_are_not_retried(self, sleep):
+        self.respond(404)
+
+        self.assertEqual(self.client.get(self.URL).status_code, 404)
+        self.assertEqual(self.client.session.request.call_count, 1)
+
+    def test_open_circuit_short_circuits_the_host(self, sleep):
+        self.respond(*[requests.ConnectionError()] * 3)
+        with self.assertRaises(requests.ConnectionError):
+            self.client.get(self.URL)
+
+        with self.assertRaises(http_client.CircuitOpenError):
+            self.client.get(self.URL)
+        self.assertEqual(self.client.session.request.call_count, 3)
+
+        # Other hosts have their own breaker
+        self.respond(200)
+        self.assertEqual(self.client.get('http://ehr-service/api/v1/').status_code, 200)
+
+    @override_settings(
+        SERVICE_HTTP_CONNECT_TIMEOUT=0.2, SERVICE_HTTP_READ_TIMEOUT=3.0, SERVICE_HTTP_MAX_RETRIES=1,
+        SERVICE_HTTP_CIRCUIT_THRESHOLD=7, SERVICE_HTTP_CIRCUIT_RESET=11
+    )
+    def test_client_is_configured_from_settings(self, sleep):
+        with mock.patch.object(http_client, '_client', None):
+            client = http_client.get_client()
+
+            self.assertIs(http_client.get_client(), client)
+        self.assertEqual(client.timeout, (0.2, 3.0))
+        self.assertEqual(client.max_retries, 1)
+        self.assertEqual((client.failure_threshold, client.reset_timeout), (7, 11))
+
+
+# The laboratory and pharmacy services ship their own copies of these modules
+APP_DIR = Path(http_client.__file__).resolve().parent
+SHARED_MODULE_COPIES = {
+    module: [
+        APP_DIR.parents[1] / service / app / module
+        for service, app in [('laboratory_service', 'laboratory'), ('prescription_pharmacy_service', 'pharmacy')]
+    ]
+    for module in ['http_client.py', 'user_cache.py']
+}
+
+
+class SharedModuleCopiesTests(TestCase):
+    """Tests that the services' copies of the shared modules do not drift apart."""
+
+    @skipUnless(
+        all(copy.exists() for copies in SHARED_MODULE_COPIES.values() for copy in copies),
+        'other services are not checked out'
+    )
+    def test_copies_are_identical(self):
+        for module, copies in SHARED_MODULE_COPIES.items():
+            for copy in copies:
+                with self.subTest(copy=str(copy)):
+                    self.assertEqual(copy.read_bytes(), (APP_DIR / module).read_bytes())
+
+
+@override_settings(REMINDER_CHUNK_SIZE=2)
+class AppointmentReminderTests(TestCase):
+    """Tests for sending the daily appointment reminders in chunks."""
+
+    def create_appointments(self, count, status=Appointment.CONFIRMED, hours=2):
+        Appointment.objects.bulk_create([
+            Appointment(
+                patient_id=100 + index,
+                doctor_id=7,
+                appointment_time=timezone.now() + timedelta(hours=hours, minutes=index),
+                status=status,
+                reason_for_visit='Checkup'
+            )
+            for index in range(count)
+        ])
+
+    def send_reminders(self):
+        def users_details(user_ids):
+            return {user_id: {'id': user_id, 'first_name': 'User', 'last_name': str(user_id)} for user_id in user_ids}
+
+        with mock.patch('appointments.tasks.get_users_details', side_effect=users_details) as lookup, \
+                mock.patch('appointments.tasks.notify_notification_service_bulk', return_value=True) as notify:
+            result = send_appointment_reminders()
+        return result, lookup, notify
+
+    def test_reminders_are_sent_per_chunk(self):
+        self.create_appointments(5)
+        self.create_appointments(1, status=Appointment.PENDING)
+        self.create_appointments(1, hours=30)
+
+        result, lookup, notify = self.send_reminders()
+
+        self.assertEqual(result, 'Sent reminders for 5 appointments')
+        # One user lookup per chunk of two appointments, for their patients and the doctor
+        self.assertEqual(lookup.call_count, 3)
+        self.assertEqual(lookup.call_args_list[0].args[0], {100, 101, 7})
+        # One bulk notification per chunk for the patients and one for the doctors
+        self.assertEqual(
+            [call.args[0] for call in notify.call_args_list],
+            ['APPOINTMENT_REMINDER_PATIENT', 'APPOINTMENT_REMINDER_DOCTOR'] * 3
+        )
+        patient_batches = [call.args[1] for call in notify.call_args_list[::2]]
+        self.assertEqual([len(batch) for batch in patient_batches], [2, 2, 1])
+        self.assertEqual(
+            [reminder['recipient_id'] for batch in patient_batches for reminder in batch],
+            [100, 101, 102, 103, 104]
+        )
+        self.assertTrue(all(
+            reminder['recipient_id'] == 7 for call in notify.call_args_list[1::2] for reminder in call.args[1]
+        ))
+
+    def test_query_count_does_not_grow_with_appointments(self):
+        self.create_appointments(3)
+        with CaptureQueriesContext(connection) as few:
+            self.send_reminders()
+
+        self.create_appointments(6, hours=3)
+        with CaptureQueriesContext(connection) as many:
+            result, _, _ = self.send_reminders()
+
+        self.assertEqual(result, 'Sent reminders for 9 appointments')
+        self.assertEqual(len(many), len(few))
+
+    def test_appointments_of_unknown_users_are_skipped(self):
+        self.create_appointments(2)
+
+        with mock.patch('appointments.tasks.get_users_details', return_value={}), \
+                mock.patch('appointments.tasks.notify_notification_service_bulk') as notify:
+            result = send_appointment_reminders()
+
+        self.assertEqual(result, 'Sent reminders for 0 appointments')
+        notify.assert_not_called()
+
+
+class GenerateTimeSlotsTests(TestCase):
+    """Tests for generating only the missing time slots of a doctor."""
+
+    # 2025-01-06 is a Monday
+    START = date(2025, 1, 6)
+
+    def setUp(self):
+        self.schedules = [
+            DoctorSchedule.objects.create(
+                doctor_id=7,
+                day_of_week=day_of_week,
+                start_time=time(9, 0),
+                end_time=time(10, 0),
+                valid_from=date(2025, 1, 1)
+            )
+            for day_of_week in [DoctorSchedule.MONDAY, DoctorSchedule.WEDNESDAY]
+        ]
+
+    def generate(self, days=14):
+        slots = generate_time_slots(7, self.schedules, self.START, days=days)
+        TimeSlot.objects.bulk_create(slots, ignore_conflicts=True)
+        return slots
+
+    def test_candidate_slots(self):
+        schedule = self.schedules[0]
+        schedule.valid_to = date(2025, 1, 13)
+
+        slots = build_candidate_slots(schedule, self.START, days=21)
+
+        self.assertEqual(len(slots), 4)
+        self.assertEqual(slots[0], (
+            timezone.make_aware(datetime(2025, 1, 6, 9, 0)), timezone.make_aware(datetime(2025, 1, 6, 9, 30))
+        ))
+        self.assertEqual(slots[-1][1], timezone.make_aware(datetime(2025, 1, 13, 10, 0)))
+
+    def test_second_run_inserts_nothing(self):
+        self.assertEqual(len(self.generate()), 8)
+
+        self.assertEqual(self.generate(), [])
+        self.assertEqual(TimeSlot.objects.count(), 8)
+
+    def test_only_missing_slots_are_added(self):
+        self.generate()
+        TimeSlot.objects.filter(start_time__date=date(2025, 1, 8)).delete()
+        TimeSlot.objects.filter(start_time=timezone.make_aware(datetime(2025, 1, 13, 9, 30))).delete()
+
+        slots = self.generate(days=21)
+
+        self.assertEqual(
+            [slot.start_time for slot in slots],
+            [timezone.make_aware(value) for value in [
+                datetime(2025, 1, 8, 9, 0), datetime(2025, 1, 8, 9, 30), datetime(2025, 1, 13, 9, 30),
+                datetime(2025, 1, 20, 9, 0), datetime(2025, 1, 20, 9, 30),
+                datetime(2025, 1, 22, 9, 0), datetime(2025, 1, 22, 9, 30),
+            ]]
+        )
+        self.assertEqual(TimeSlot.objects.count(), 12)
+
+    def test_existing_slots_are_read_once(self):
+        self.generate(days=7)
+
+        with self.assertNumQueries(1):
+            slots = generate_time_slots(7, self.schedules, self.START, days=90)
+
+        self.assertEqual(len(slots), 2 * 2 * 13 - 4)
+
+    def test_unique_slot_constraint(self):
+        self.generate()
+        duplicates = [
+            TimeSlot(doctor_id=7, start_time=slot.start_time, end_time=slot.end_time)
+            for slot in TimeSlot.objects.all()
+        ]
+
+        TimeSlot.objects.bulk_create(duplicates, ignore_conflicts=True)
+        self.assertEqual(TimeSlot.objects.count(), 8)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TimeSlot.objects.create(doctor_id=7, start_time=duplicates[0].start_time, end_time=duplicates[0].end_time)
+
+    def test_generation_run_is_idempotent(self):
+        first = generate_timeslots_for_doctors([7], start_date='2025-01-06', days=14)
+        second = generate_timeslots_for_doctors([7], start_date='2025-01-06', days=14)
+
+        self.assertEqual((first['total_slots'], second['total_slots']), (8, 0))
+        self.assertEqual(TimeSlot.objects.filter(doctor_id=7).count(), 8)
+
+
+class UserProfileCacheTests(TestCase):
+    """Tests for the two-tier cache of user details."""
+
+    def setUp(self):
+        cache.clear()
+        self.user_cache = UserProfileCache(maxsize=2, ttl=60, shared_ttl=600, sync_interval=5)
+
+    def user(self, user_id):
+        return {'id': user_id, 'first_name': f'User {user_id}'}
+
+    def test_local_tier_is_a_bounded_lru(self):
+        self.user_cache.set_many(PROFILE_KEY, {1: self.user(1), 2: self.user(2)})
+        self.user_cache.get(PROFILE_KEY, 1)
+        self.user_cache.set(PROFILE_KEY, 3, self.user(3))
+
+        stats = self.user_cache.stats()
+        self.assertEqual((stats['size'], stats['evictions']), (2, 1))
+        # The least recently used user went to the shared tier only
+        self.assertEqual(self.user_cache.get(PROFILE_KEY, 1), self.user(1))
+        self.assertEqual(self.user_cache.get(PROFILE_KEY, 2), self.user(2))
+        self.assertEqual(self.user_cache.stats()['shared_hits'], 1)
+
+    def test_local_entries_expire(self):
+        self.user_cache.set(PROFILE_KEY, 1, self.user(1))
+        cache.delete(PROFILE_KEY.format(1))
+        self.assertEqual(self.user_cache.get(PROFILE_KEY, 1), self.user(1))
+
+        with mock.patch('appointments.user_cache.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(self.user_cache.get(PROFILE_KEY, 1))
+
+    def test_profiles_and_summaries_are_kept_apart(self):
+        self.user_cache.set(PROFILE_KEY, 1, self.user(1))
+
+        self.assertEqual(self.user_cache.get_many(SUMMARY_KEY, [1]), {})
+
+    def test_generation_change_clears_local_entries(self):
+        with mock.patch('appointments.user_cache.time.monotonic', return_value=1000.0):
+            self.user_cache.get(PROFILE_KEY, 1)
+            self.user_cache.set(PROFILE_KEY, 1, self.user(1))
+
+        # Published by the User Service when the user changes
+        cache.delete(PROFILE_KEY.format(1))
+        cache.set(GENERATION_KEY, 1)
+
+        with mock.patch('appointments.user_cache.time.monotonic', return_value=1002.0):
+            self.assertEqual(self.user_cache.get(PROFILE_KEY, 1), self.user(1))
+        with mock.patch('appointments.user_cache.time.monotonic', return_value=1006.0):
+            self.assertIsNone(self.user_cache.get(PROFILE_KEY, 1))
+        self.assertEqual(self.user_cache.stats()['size'], 0)
+
+    def test_shared_cache_errors_are_misses(self):
+        self.user_cache.set(PROFILE_KEY, 1, self.user(1))
+
+        with mock.patch('appointments.user_cache.cache.get_many', side_effect=ConnectionError), \
+                mock.patch('appointments.user_cache.cache.set_many', side_effect=ConnectionError), \
+                mock.patch('appointments.user_cache.cache.get', side_effect=ConnectionError):
+            self.assertEqual(self.user_cache.get_many(PROFILE_KEY, [1, 2]), {1: self.user(1)})
+            self.user_cache.set(PROFILE_KEY, 2, self.user(2))
+            self.assertEqual(self.user_cache.get(PROFILE_KEY, 2), self.user(2))
+
+        stats = self.user_cache.stats()
+        self.assertEqual((stats['local_hits'], stats['misses']), (2, 1))
+
+    def test_stats_endpoint(self):
+        self.user_cache.set(PROFILE_KEY, 1, self.user(1))
+        self.user_cache.get_many(PROFILE_KEY, [1, 2])
+
+        with mock.patch('appointments.views.user_cache', self.user_cache):
+            response = self.client.get(reverse('user-cache-stats'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {
+            'local_hits': 1, 'shared_hits': 0, 'misses': 1, 'evictions': 0,
+            'size': 1, 'maxsize': 2, 'hit_ratio': 0.5,
+        })
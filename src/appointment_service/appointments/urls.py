@@ -5,7 +5,8 @@ from .views import (
     AppointmentViewSet,
     DoctorScheduleViewSet,
     TimeSlotViewSet,
-    DoctorAvailabilityView
+    DoctorAvailabilityView,
+    UserCacheStatsView
 )
 
 # Create a router and register our viewsets with it
@@ -37,4 +38,9 @@ urlpatterns = [
     path('doctors/availability/', 
         DoctorAvailabilityView.as_view(), 
         name='doctor-availability'),
+
+    # Internal endpoints
+    path('internal/user-cache/stats/',
+        UserCacheStatsView.as_view(),
+        name='user-cache-stats'),
 ] 
\ No newline at end of file
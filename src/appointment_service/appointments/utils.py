@@ -4,6 +4,12 @@ from django.conf import settings
 from django.utils import timezone
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from . import http_client
+from .user_cache import PROFILE_KEY, SUMMARY_KEY, user_cache
+
+# Maximum number of IDs sent to the User Service bulk lookup at once
+USER_BULK_LOOKUP_BATCH_SIZE = 500
+
 
 class CustomJWTAuthentication(JWTAuthentication):
     """
@@ -24,26 +30,69 @@ class CustomJWTAuthentication(JWTAuthentication):
 
 def get_user_details(user_id, token=None):
     """
-    Get user details from User Service.
+    Get user details from User Service, served from the user cache when possible.
     """
+    user = user_cache.get(PROFILE_KEY, user_id)
+    if user is not None:
+        return user
+
     headers = {}
     if token:
         headers['Authorization'] = f'Bearer {token}'
     
     try:
-        response = requests.get(
+        response = http_client.get(
             f"{settings.USER_SERVICE_URL}/users/{user_id}/",
             headers=headers
         )
         
         if response.status_code == 200:
-            return response.json()
+            user = response.json()
+            user_cache.set(PROFILE_KEY, user_id, user)
+            return user
         else:
             return None
     except requests.RequestException:
         return None
 
 
+def get_users_details(user_ids, token=None):
+    """
+    Get details for many users from User Service in one round trip per batch.
+
+    Users already in the user cache are not requested again.
+
+    Returns:
+        Dict mapping user ID to user details, users that could not be found are omitted
+    """
+    headers = {}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+
+    user_ids = set(user_ids)
+    users = user_cache.get_many(SUMMARY_KEY, user_ids)
+    user_ids = sorted(user_ids - users.keys())
+    fetched = {}
+    for i in range(0, len(user_ids), USER_BULK_LOOKUP_BATCH_SIZE):
+        try:
+            response = http_client.post(
+                f"{settings.USER_SERVICE_URL}/users/bulk/",
+                json={'ids': user_ids[i:i + USER_BULK_LOOKUP_BATCH_SIZE]},
+                headers=headers
+            )
+        except requests.RequestException:
+            continue
+
+        if response.status_code == 200:
+            for user in response.json():
+                fetched[user['id']] = user
+
+    if fetched:
+        user_cache.set_many(SUMMARY_KEY, fetched)
+        users.update(fetched)
+    return users
+
+
 def notify_ehr_service(appointment_id, patient_id, doctor_id, appointment_time, token=None):
     """
     Notify EHR Service when an appointment is completed.
@@ -62,7 +111,7 @@ def notify_ehr_service(appointment_id, patient_id, doctor_id, appointment_time,
     }
     
     try:
-        response = requests.post(
+        response = http_client.post(
             f"{settings.EHR_SERVICE_URL}/ehr/internal/patients/{patient_id}/link-appointment/",
             json=data,
             headers=headers
@@ -76,8 +125,10 @@ def notify_billing_service(appointment_id, patient_id, doctor_id, service_descri
     """
     Notify Billing Service when an appointment is completed.
     """
+    # Billing replays the first response for a repeated key, so the call can be retried
     headers = {
-        'Content-Type': 'application/json'
+        'Content-Type': 'application/json',
+        'Idempotency-Key': f"appointment-{appointment_id}"
     }
     if token:
         headers['Authorization'] = f'Bearer {token}'
@@ -91,10 +142,11 @@ def notify_billing_service(appointment_id, patient_id, doctor_id, service_descri
     }
     
     try:
-        response = requests.post(
+        response = http_client.post(
             f"{settings.BILLING_SERVICE_URL}/billing/internal/create-invoice-for-appointment/",
             json=data,
-            headers=headers
+            headers=headers,
+            idempotent=True
         )
         return response.status_code == 200 or response.status_code == 201
     except requests.RequestException:
@@ -112,67 +164,107 @@ def notify_notification_service(notification_type, recipient_id, data, token=Non
     return True
 
 
-def generate_time_slots(doctor_id, schedule, start_date, days=7, slot_duration=30):
+def notify_notification_service_bulk(notification_type, notifications, token=None):
     """
-    Generate time slots based on doctor schedule.
-    
+    Send many notifications of one type to Notification Service in a single batch.
+
+    Args:
+        notification_type: Type of the notifications
+        notifications: List of dicts with `recipient_id` and `data`
+    """
+    print(f"[NOTIFICATION SKIPPED] Type: {notification_type}, Batch of {len(notifications)} notifications")
+
+    return True
+
+
+def generate_time_slots(doctor_id, schedules, start_date, days=7, slot_duration=30):
+    """
+    Generate the missing time slots for a doctor over a date range.
+
+    Every candidate interval is worked out in memory from the schedules, the
+    existing ``(start_time, end_time)`` pairs for the whole range are fetched
+    with a single query and only the difference is returned.
+
     Args:
         doctor_id: ID of the doctor
-        schedule: A DoctorSchedule instance
+        schedules: Iterable of DoctorSchedule instances for the doctor
         start_date: Date to start generating slots from
         days: Number of days to generate slots for
         slot_duration: Duration of each slot in minutes
-    
+
     Returns:
-        List of time slot dictionaries
+        List of unsaved TimeSlot instances
     """
     from .models import TimeSlot
-    
+
+    candidates = set()
+    for schedule in schedules:
+        candidates.update(
+            build_candidate_slots(schedule, start_date, days, slot_duration)
+        )
+
+    if not candidates:
+        return []
+
+    range_start = min(start for start, _ in candidates)
+    range_end = max(end for _, end in candidates)
+    existing = set(
+        TimeSlot.objects.filter(
+            doctor_id=doctor_id,
+            start_time__gte=range_start,
+            start_time__lt=range_end
+        ).values_list('start_time', 'end_time')
+    )
+
+    return [
+        TimeSlot(
+            doctor_id=doctor_id,
+            start_time=slot_start,
+            end_time=slot_end,
+            is_booked=False
+        )
+        for slot_start, slot_end in sorted(candidates - existing)
+    ]
+
+
+def build_candidate_slots(schedule, start_date, days=7, slot_duration=30):
+    """
+    Work out the candidate slot intervals of a schedule without touching the database.
+
+    Args:
+        schedule: A DoctorSchedule instance
+        start_date: Date to start generating slots from
+        days: Number of days to generate slots for
+        slot_duration: Duration of each slot in minutes
+
+    Returns:
+        List of (start_time, end_time) tuples of aware datetimes
+    """
     slots = []
-    current_date = start_date
+    step = timedelta(minutes=slot_duration)
     end_date = start_date + timedelta(days=days)
-    
+
+    # Jump straight to the first matching weekday instead of testing every date
+    current_date = start_date + timedelta(
+        days=(schedule.day_of_week - start_date.weekday()) % 7
+    )
+
     while current_date < end_date:
         # Check if this date falls within the schedule's validity period
-        if (schedule.valid_from <= current_date and 
+        if (schedule.valid_from <= current_date and
                 (schedule.valid_to is None or current_date <= schedule.valid_to)):
-            
-            # Check if the day of week matches the schedule
-            if current_date.weekday() == schedule.day_of_week:
-                # Create slots for this day
-                slot_start = datetime.combine(
-                    current_date, 
-                    schedule.start_time
-                )
-                slot_start = timezone.make_aware(slot_start)
-                day_end = datetime.combine(
-                    current_date,
-                    schedule.end_time
-                )
-                day_end = timezone.make_aware(day_end)
-                
-                while slot_start + timedelta(minutes=slot_duration) <= day_end:
-                    slot_end = slot_start + timedelta(minutes=slot_duration)
-                    
-                    # Check if slot already exists
-                    if not TimeSlot.objects.filter(
-                        doctor_id=doctor_id,
-                        start_time=slot_start,
-                        end_time=slot_end
-                    ).exists():
-                        # Create new slot
-                        slot = TimeSlot(
-                            doctor_id=doctor_id,
-                            start_time=slot_start,
-                            end_time=slot_end,
-                            is_booked=False
-                        )
-                        slots.append(slot)
-                    
-                    # Move to next slot
-                    slot_start = slot_end
-        
-        # Move to next day
-        current_date += timedelta(days=1)
-    
-    return slots 
\ No newline at end of file
+            slot_start = timezone.make_aware(
+                datetime.combine(current_date, schedule.start_time)
+            )
+            day_end = timezone.make_aware(
+                datetime.combine(current_date, schedule.end_time)
+            )
+
+            while slot_start + step <= day_end:
+                slots.append((slot_start, slot_start + step))
+                slot_start += step
+
+        # Move to the same weekday next week
+        current_date += timedelta(days=7)
+
+    return slots
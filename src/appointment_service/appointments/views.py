@@ -1,12 +1,14 @@
 from datetime import datetime, timedelta
 from django.utils import timezone
 from django.db import transaction
-from rest_framework import permissions, status, viewsets
+from rest_framework import permissions, serializers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.conf import settings
 
+from .availability import availability_index, day_start
+from .booking import SlotUnavailableError, book_time_slots, release_time_slots
 from .models import Appointment, DoctorSchedule, TimeSlot
 from .serializers import (
     AppointmentCreateSerializer,
@@ -14,13 +16,15 @@ from .serializers import (
     AppointmentUpdateSerializer,
     AvailabilityRequestSerializer,
     DoctorScheduleSerializer,
+    SlotGenerationSerializer,
     TimeSlotSerializer,
 )
 from .tasks import (
     send_appointment_notification,
     process_completed_appointment,
-    generate_timeslots_for_doctor
+    generate_timeslots_for_doctors
 )
+from .user_cache import user_cache
 from .utils import get_user_details, generate_time_slots
 
 
@@ -28,6 +32,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     """ViewSet for managing appointments."""
     queryset = Appointment.objects.all().order_by('-appointment_time')
     serializer_class = AppointmentSerializer
+    ordering = ('-appointment_time', '-id')
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -61,14 +66,14 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         if start_date:
             try:
                 start = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(appointment_time__date__gte=start)
+                queryset = queryset.filter(appointment_time__gte=day_start(start))
             except ValueError:
                 pass
                 
         if end_date:
             try:
                 end = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(appointment_time__date__lte=end)
+                queryset = queryset.filter(appointment_time__lt=day_start(end + timedelta(days=1)))
             except ValueError:
                 pass
                 
@@ -83,26 +88,15 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         duration_minutes = serializer.validated_data.get('duration_minutes', 30)
         
         if appointment_time and doctor_id:
-            # Check for time slot availability
+            # Lock and claim every slot overlapping the requested interval
             end_time = appointment_time + timedelta(minutes=duration_minutes)
             try:
-                time_slot = TimeSlot.objects.get(
-                    doctor_id=doctor_id,
-                    start_time=appointment_time,
-                    end_time=end_time,
-                    is_booked=False
-                )
-                # Mark the time slot as booked
-                time_slot.is_booked = True
-                time_slot.save()
-            except TimeSlot.DoesNotExist:
-                # Create a time slot if it doesn't exist (for flexibility)
-                time_slot = TimeSlot.objects.create(
-                    doctor_id=doctor_id,
-                    start_time=appointment_time,
-                    end_time=end_time,
-                    is_booked=True
-                )
+                booked_slots = book_time_slots(doctor_id, appointment_time, end_time)
+            except SlotUnavailableError as exc:
+                raise serializers.ValidationError({'appointment_time': [str(exc)]})
+            transaction.on_commit(
+                lambda: availability_index.mark_booked(doctor_id, booked_slots)
+            )
         
         # Save the appointment
         appointment = serializer.save()
@@ -179,17 +173,15 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             
         appointment.save()
         
-        # Free up the time slot
-        try:
-            time_slot = TimeSlot.objects.get(
-                doctor_id=appointment.doctor_id,
-                start_time=appointment.appointment_time,
-                end_time=appointment.appointment_time + timedelta(minutes=appointment.duration_minutes)
-            )
-            time_slot.is_booked = False
-            time_slot.save()
-        except TimeSlot.DoesNotExist:
-            pass
+        # Free up the time slots
+        released_slots = release_time_slots(
+            appointment.doctor_id,
+            appointment.appointment_time,
+            appointment.appointment_time + timedelta(minutes=appointment.duration_minutes)
+        )
+        transaction.on_commit(
+            lambda: availability_index.mark_free(appointment.doctor_id, released_slots)
+        )
         
         # Send cancellation notification
         send_appointment_notification(
@@ -224,39 +216,29 @@ class DoctorScheduleViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def generate_slots(self, request):
-        """Generate time slots based on doctor schedules."""
-        doctor_id = request.data.get('doctor_id')
-        days = request.data.get('days', 30)
-        start_date_str = request.data.get('start_date')
-        
-        if not doctor_id:
-            return Response(
-                {'error': 'Doctor ID is required.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-            
-        # Convert start_date if provided
-        start_date = None
-        if start_date_str:
-            try:
-                start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            except ValueError:
-                return Response(
-                    {'error': 'Invalid date format. Use YYYY-MM-DD.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
-        # Start background task to generate slots
-        task = generate_timeslots_for_doctor(
-            doctor_id=doctor_id,
-            start_date=start_date_str if start_date_str else None,
-            days=days
+        """
+        Generate time slots based on doctor schedules.
+
+        Accepts a single `doctor_id` or a list of `doctor_ids`. Slots are
+        generated inline, without worker processes; every doctor is handled by
+        the generate_timeslots management command.
+        """
+        serializer = SlotGenerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        report = generate_timeslots_for_doctors(
+            doctor_ids=serializer.validated_data['doctor_ids'],
+            start_date=serializer.validated_data.get('start_date'),
+            days=serializer.validated_data['days'],
+            workers=1,
+            chunk_size=settings.SLOT_GENERATION_CHUNK_SIZE,
+            batch_size=settings.SLOT_GENERATION_BATCH_SIZE
         )
         
         return Response({
-            'status': 'processing',
-            'message': f'Generating time slots for doctor {doctor_id}',
-            'task_id': task.id
+            'status': 'completed',
+            'message': f"Generated {report['total_slots']} time slots for {report['total_doctors']} doctors",
+            'report': report
         })
 
 
@@ -264,6 +246,7 @@ class TimeSlotViewSet(viewsets.ModelViewSet):
     """ViewSet for managing time slots."""
     queryset = TimeSlot.objects.all()
     serializer_class = TimeSlotSerializer
+    ordering = ('start_time', 'id')
     
     def get_queryset(self):
         """Filter time slots based on query parameters."""
@@ -284,22 +267,38 @@ class TimeSlotViewSet(viewsets.ModelViewSet):
         start_date = self.request.query_params.get('start_date')
         end_date = self.request.query_params.get('end_date')
         
+        # Compare against day boundaries so the (start_time, end_time) index stays usable
         if start_date:
             try:
                 start = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(start_time__date__gte=start)
+                queryset = queryset.filter(start_time__gte=day_start(start))
             except ValueError:
                 pass
                 
         if end_date:
             try:
                 end = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(end_time__date__lte=end)
+                queryset = queryset.filter(end_time__lt=day_start(end + timedelta(days=1)))
             except ValueError:
                 pass
                 
         return queryset.order_by('start_time')
 
+    def perform_create(self, serializer):
+        slot = serializer.save()
+        availability_index.invalidate(slot.doctor_id)
+
+    def perform_update(self, serializer):
+        old_doctor_id = serializer.instance.doctor_id
+        slot = serializer.save()
+        availability_index.invalidate(old_doctor_id)
+        availability_index.invalidate(slot.doctor_id)
+
+    def perform_destroy(self, instance):
+        doctor_id = instance.doctor_id
+        instance.delete()
+        availability_index.invalidate(doctor_id)
+
 
 class DoctorAvailabilityView(APIView):
     """API for checking doctor availability."""
@@ -314,13 +313,8 @@ class DoctorAvailabilityView(APIView):
         days_in_advance = serializer.validated_data['days_in_advance']
         end_date = start_date + timedelta(days=days_in_advance)
         
-        # Get all available time slots for the date range
-        available_slots = TimeSlot.objects.filter(
-            doctor_id=doctor_id,
-            start_time__date__gte=start_date,
-            end_time__date__lte=end_date,
-            is_booked=False
-        ).order_by('start_time')
+        # Get all available time slots for the date range from the in-process index
+        available_slots = availability_index.free_slots(doctor_id, start_date, end_date)
         
         # Get doctor details
         doctor = get_user_details(doctor_id)
@@ -330,16 +324,16 @@ class DoctorAvailabilityView(APIView):
         
         # Group slots by date for easier frontend display
         slots_by_date = {}
-        for slot in available_slots:
-            date_key = slot.start_time.date().isoformat()
+        for slot_start, slot_end, slot_id in available_slots:
+            date_key = slot_start.date().isoformat()
             if date_key not in slots_by_date:
                 slots_by_date[date_key] = []
                 
             slots_by_date[date_key].append({
-                'id': slot.id,
-                'start_time': slot.start_time.strftime('%H:%M'),
-                'end_time': slot.end_time.strftime('%H:%M'),
-                'duration_minutes': (slot.end_time - slot.start_time).seconds // 60
+                'id': slot_id,
+                'start_time': slot_start.strftime('%H:%M'),
+                'end_time': slot_end.strftime('%H:%M'),
+                'duration_minutes': (slot_end - slot_start).seconds // 60
             })
             
         return Response({
@@ -348,4 +342,10 @@ class DoctorAvailabilityView(APIView):
             'start_date': start_date.isoformat(),
             'end_date': end_date.isoformat(),
             'availability': slots_by_date
-        }) 
\ No newline at end of file
+        }) 
+
+
+class UserCacheStatsView(APIView):
+    """Hit/miss counters of this process's user details cache, for sizing it."""
+    def get(self, request):
+        return Response(user_cache.stats())
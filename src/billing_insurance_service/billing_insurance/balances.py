@@ -0,0 +1,179 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Invoice, PatientBalanceSummary
+
+# Invoices that never count towards a patient's balance
+UNBILLED_STATUSES = ['DRAFT', 'CANCELLED']
+# Invoices billed but no longer collectable
+CLOSED_STATUSES = ['WRITTEN_OFF']
+
+SUMMARY_FIELDS = [
+    'total_billed', 'paid_by_patient', 'paid_by_insurance', 'outstanding',
+    'aging_0_30', 'aging_31_60', 'aging_61_90', 'aging_over_90', 'aged_on',
+]
+
+_MONEY = DecimalField(max_digits=12, decimal_places=2)
+_ZERO = Value(Decimal('0'), output_field=_MONEY)
+
+
+def _total(expression, condition=None):
+    if condition is not None:
+        expression = Case(When(condition, then=expression), default=_ZERO, output_field=_MONEY)
+    return Coalesce(Sum(expression, output_field=_MONEY), _ZERO, output_field=_MONEY)
+
+
+def balance_aggregates(today):
+    """
+    Aggregate expressions computing a balance summary from a patient's invoices.
+
+    The amount due of each invoice is clamped at zero, like Invoice.amount_due,
+    and aged by the number of days past its due date as of `today`.
+    """
+    due = Greatest(
+        F('total_amount') - F('amount_paid_by_patient') - F('amount_paid_by_insurance'),
+        _ZERO,
+        output_field=_MONEY
+    )
+    open_invoice = ~Q(status__in=CLOSED_STATUSES)
+    return {
+        'total_billed': _total(F('total_amount')),
+        'paid_by_patient': _total(F('amount_paid_by_patient')),
+        'paid_by_insurance': _total(F('amount_paid_by_insurance')),
+        'outstanding': _total(due, open_invoice),
+        'aging_0_30': _total(due, open_invoice & Q(due_date__gte=today - timedelta(days=30))),
+        'aging_31_60': _total(due, open_invoice & Q(
+            due_date__lt=today - timedelta(days=30), due_date__gte=today - timedelta(days=60)
+        )),
+        'aging_61_90': _total(due, open_invoice & Q(
+            due_date__lt=today - timedelta(days=60), due_date__gte=today - timedelta(days=90)
+        )),
+        'aging_over_90': _total(due, open_invoice & Q(due_date__lt=today - timedelta(days=90))),
+    }
+
+
+def _empty_row(patient_id):
+    return dict({field: Decimal('0') for field in SUMMARY_FIELDS if field != 'aged_on'}, patient_id=patient_id)
+
+
+def _lock_summaries(patient_ids):
+    """
+    Lock the summary rows of some patients, inserting the missing ones first.
+
+    Returns:
+        Dict mapping patient ID to the ID of their summary row
+    """
+    PatientBalanceSummary.objects.bulk_create(
+        [PatientBalanceSummary(patient_id=patient_id) for patient_id in patient_ids],
+        ignore_conflicts=True
+    )
+    return dict(PatientBalanceSummary.objects.select_for_update().filter(
+        patient_id__in=patient_ids
+    ).order_by('patient_id').values_list('patient_id', 'id'))
+
+
+def _write_summaries(rows, today, summary_ids):
+    """
+    Overwrite locked summary rows with aggregated balances, in one UPDATE.
+
+    Rows are written with bulk_update rather than an upsert on patient_id,
+    which the MySQL backend cannot target.
+    """
+    now = timezone.now()
+    summaries = [
+        PatientBalanceSummary(id=summary_ids[row['patient_id']], aged_on=today, updated_at=now, **row)
+        for row in rows
+    ]
+    PatientBalanceSummary.objects.bulk_update(summaries, SUMMARY_FIELDS + ['updated_at'])
+
+
+def refresh_patient_balances(*patient_ids):
+    """
+    Recompute the balance summaries of some patients.
+
+    Runs in the caller's transaction, right after invoice amounts change. The
+    summary rows are locked first, so concurrent refreshes of a patient are
+    applied one after the other, each with a single aggregate query.
+    """
+    patient_ids = sorted(set(patient_ids))
+    if not patient_ids:
+        return
+
+    today = timezone.now().date()
+    with transaction.atomic():
+        summary_ids = _lock_summaries(patient_ids)
+
+        rows = {
+            row['patient_id']: row
+            for row in Invoice.objects.filter(patient_id__in=patient_ids).exclude(
+                status__in=UNBILLED_STATUSES
+            ).values('patient_id').annotate(**balance_aggregates(today)).order_by()
+        }
+        # Patients left without billed invoices are reset to zero
+        _write_summaries(
+            [rows.get(patient_id, _empty_row(patient_id)) for patient_id in patient_ids],
+            today,
+            summary_ids
+        )
+
+
+def get_patient_balance(patient_id):
+    """
+    Return a patient's balance summary without writing to the database.
+
+    A summary aged today is served as stored. One aged on an earlier day, or
+    missing, is recomputed with a single read-only aggregate query and
+    returned unsaved; the nightly rebuild re-ages the stored rows.
+    """
+    today = timezone.now().date()
+    summary = PatientBalanceSummary.objects.filter(patient_id=patient_id).first()
+    if summary is not None and summary.aged_on == today:
+        return summary
+
+    row = Invoice.objects.filter(patient_id=patient_id).exclude(
+        status__in=UNBILLED_STATUSES
+    ).aggregate(**balance_aggregates(today))
+    return PatientBalanceSummary(
+        id=summary.id if summary else None,
+        patient_id=patient_id,
+        aged_on=today,
+        updated_at=summary.updated_at if summary else None,
+        **row
+    )
+
+
+def rebuild_patient_balances(batch_size=1000):
+    """
+    Recompute every patient's balance summary with one grouped aggregate query.
+
+    Returns:
+        Number of summaries written
+    """
+    today = timezone.now().date()
+    rows = Invoice.objects.exclude(status__in=UNBILLED_STATUSES).values('patient_id').annotate(
+        **balance_aggregates(today)
+    ).order_by('patient_id')
+
+    written = 0
+    batch = []
+    with transaction.atomic():
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _write_summaries(batch, today, _lock_summaries([row['patient_id'] for row in batch]))
+                written += len(batch)
+                batch = []
+        if batch:
+            _write_summaries(batch, today, _lock_summaries([row['patient_id'] for row in batch]))
+            written += len(batch)
+
+        # Patients without billed invoices any more
+        PatientBalanceSummary.objects.exclude(
+            patient_id__in=Invoice.objects.exclude(status__in=UNBILLED_STATUSES).values('patient_id')
+        ).delete()
+    return written
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+# Longest key accepted from callers, leaving room for the key type prefix
+MAX_KEY_LENGTH = 200
+HEADER_KEY_PREFIX = 'key:'
+
+
+def header_key(key):
+    """Key of a call identified by a caller-chosen Idempotency-Key."""
+    return f"{HEADER_KEY_PREFIX}{key}"
+
+
+def key_cutoff():
+    """Return the time before which header key records have expired."""
+    hours = getattr(settings, 'BILLING_IDEMPOTENCY_KEY_TTL_HOURS', 24)
+    return timezone.now() - timedelta(hours=hours)
+
+
+def request_fingerprint(method, path, data):
+    """Return the SHA-256 of a call's method, path and body, compared when its key is reused."""
+    payload = json.dumps([method, path, data], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_records(keys):
+    """
+    Look up the idempotency records of many (scope, key) pairs in one query.
+
+    Header key records older than BILLING_IDEMPOTENCY_KEY_TTL_HOURS are
+    deleted when found, so their key can be used again. Related ID records
+    never expire, they keep an object from being invoiced twice.
+
+    Returns:
+        Dict mapping (scope, key) to its record, pairs never seen are omitted
+    """
+    if not keys:
+        return {}
+    condition = Q()
+    for scope, key in keys:
+        condition |= Q(scope=scope, key=key)
+    cutoff = key_cutoff()
+    records = {}
+    expired = []
+    for record in IdempotencyRecord.objects.filter(condition):
+        if record.key.startswith(HEADER_KEY_PREFIX) and record.created_at < cutoff:
+            expired.append(record.id)
+        else:
+            records[(record.scope, record.key)] = record
+    if expired:
+        IdempotencyRecord.objects.filter(id__in=expired, created_at__lt=cutoff).delete()
+    return records
+
+
+def purge_idempotency_records(before=None, batch_size=1000):
+    """
+    Delete expired header key records in bounded batches.
+
+    Related ID records are kept, see get_records.
+
+    Args:
+        before: Time records must be created before, defaults to the key TTL cutoff
+        batch_size: Maximum number of records deleted per statement
+
+    Returns:
+        Dict with the number of records deleted, batches, elapsed seconds and rows per second
+    """
+    before = before or key_cutoff()
+    started = time.monotonic()
+    deleted = 0
+    batches = 0
+
+    while True:
+        ids = list(
+            IdempotencyRecord.objects.filter(
+                created_at__lt=before,
+                key__startswith=HEADER_KEY_PREFIX
+            ).order_by('created_at', 'id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        count, _ = IdempotencyRecord.objects.filter(id__in=ids).delete()
+        deleted += count
+        batches += 1
+        if len(ids) < batch_size:
+            break
+
+    seconds = time.monotonic() - started
+    return {
+        'deleted': deleted,
+        'batches': batches,
+        'seconds': seconds,
+        'rows_per_second': deleted / seconds if seconds else 0.0,
+    }
+
+
+def related_key(related_id):
+    """Key of a call creating something for a related object, e.g. an appointment."""
+    return f"related:{related_id}"
+
+
+def find_record(keys):
+    """
+    Return the record of the first (scope, key) pair that has one, or None.
+    """
+    records = get_records(keys)
+    return next((records[pair] for pair in keys if pair in records), None)
+
+
+def replay(record):
+    """Return the stored response of an idempotency record."""
+    response = Response(record.response, status=record.status_code)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def is_reused(record, request_hash):
+    """Whether a header key record was stored for a call with another body."""
+    return (
+        record.key.startswith(HEADER_KEY_PREFIX)
+        and bool(record.request_hash)
+        and record.request_hash != request_hash
+    )
+
+
+def reused_key_response():
+    """Response to a call reusing an Idempotency-Key with another body."""
+    return Response(
+        {'error': f'{IDEMPOTENCY_HEADER} was already used for a request with a different body'},
+        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+    )
+
+
+class IdempotentMixin:
+    """
+    Replays the stored response when an internal call is retried.
+
+    A call is identified by the Idempotency-Key header and by the ID in the
+    request field named by `idempotency_related_field` (e.g. the appointment
+    an invoice is for), both under `idempotency_scope`. The bulk endpoint
+    records related IDs under the same scope, so an object is never created
+    twice whichever endpoint is called. Successful responses are stored in the
+    same transaction as the work, so a duplicate either finds a record with
+    one indexed lookup or, when racing the first call, fails on the unique
+    constraint and replays the winner's response. A header key reused with
+    another method, path or body is rejected with 422 rather than replayed,
+    and header keys expire after BILLING_IDEMPOTENCY_KEY_TTL_HOURS.
+    """
+    idempotency_scope = None
+    idempotency_related_field = None
+
+    def get_idempotency_keys(self, request):
+        """Return the (scope, key) pairs identifying a call, header key first."""
+        keys = []
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key:
+            keys.append((self.idempotency_scope, header_key(key)))
+        if self.idempotency_related_field and isinstance(request.data, dict):
+            related_id = request.data.get(self.idempotency_related_field)
+            if related_id not in (None, ''):
+                keys.append((self.idempotency_scope, related_key(related_id)))
+        return keys
+
+    def run_idempotent(self, request, handler):
+        """
+        Run handler(request) in a transaction, once per idempotency key.
+
+        Must not be called inside an outer transaction, so that a duplicate
+        losing the race can read the record committed by the winner.
+
+        Returns:
+            The handler's response, the stored one for a duplicate call, or
+            422 when the Idempotency-Key was used for another request
+        """
+        keys = self.get_idempotency_keys(request)
+        if not keys:
+            with transaction.atomic():
+                return handler(request)
+        if any(len(key.split(':', 1)[1]) > MAX_KEY_LENGTH for _, key in keys):
+            return Response(
+                {'error': f'Idempotency key must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        request_hash = request_fingerprint(request.method, request.path, request.data)
+        record = find_record(keys)
+        if record is not None:
+            return reused_key_response() if is_reused(record, request_hash) else replay(record)
+
+        try:
+            with transaction.atomic():
+                response = handler(request)
+                if status.is_success(response.status_code):
+                    IdempotencyRecord.objects.bulk_create([
+                        IdempotencyRecord(
+                            scope=scope,
+                            key=key,
+                            status_code=response.status_code,
+                            response=response.data,
+                            request_hash=request_hash
+                        )
+                        for scope, key in keys
+                    ])
+        except IntegrityError:
+            # A concurrent call with the same key committed first
+            record = find_record(keys)
+            if record is None:
+                raise
+            return reused_key_response() if is_reused(record, request_hash) else replay(record)
+        return response
@@ -0,0 +1,173 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .balances import refresh_patient_balances
+from .models import Invoice, InvoiceItem
+from .utils import allocate_invoice_numbers, calculate_due_date, notify_notification_service
+
+# Invoice types accepted by the internal invoice endpoints
+APPOINTMENT = 'APPOINTMENT'
+MEDICATION = 'MEDICATION'
+LAB_TEST = 'LAB_TEST'
+
+# Idempotency scope of each invoice type, shared by its single and bulk endpoints
+IDEMPOTENCY_SCOPES = {
+    APPOINTMENT: 'create-invoice-appointment',
+    MEDICATION: 'create-invoice-medication',
+    LAB_TEST: 'create-invoice-labtest',
+}
+# Request field holding the ID of the object each invoice type bills
+RELATED_FIELDS = {
+    APPOINTMENT: 'appointment_id',
+    MEDICATION: 'dispense_log_id',
+    LAB_TEST: 'lab_order_id',
+}
+CREATED_DETAILS = {
+    APPOINTMENT: "Invoice created successfully for appointment.",
+    MEDICATION: "Invoice created successfully for medication.",
+    LAB_TEST: "Invoice created successfully for lab tests.",
+}
+
+
+def _decimal(value):
+    return Decimal(str(value))
+
+
+def created_response(invoice_type, invoice):
+    """Body of the response to creating an invoice, as stored for idempotent replays."""
+    return {
+        "detail": CREATED_DETAILS[invoice_type],
+        "invoice_id": invoice.id,
+        "invoice_number": invoice.invoice_number
+    }
+
+
+def build_invoice(invoice_type, data, invoice_number, issue_date=None):
+    """
+    Build an unsaved invoice and its line items from a validated internal payload.
+
+    Item totals are computed here, as InvoiceItem.save would, so the items can
+    be inserted with bulk_create.
+
+    Args:
+        invoice_type: One of APPOINTMENT, MEDICATION or LAB_TEST
+        data: Validated data of the matching CreateInvoiceFor*Serializer
+        invoice_number: Number allocated for the invoice
+        issue_date: Issue date, defaults to today
+
+    Returns:
+        Tuple of (invoice, items), none of them saved
+    """
+    issue_date = issue_date or timezone.now().date()
+
+    if invoice_type == APPOINTMENT:
+        amount = data['amount']
+        related = {'related_appointment_id': data['appointment_id']}
+        items = [InvoiceItem(
+            item_type='CONSULTATION',
+            description=data['service_description'],
+            quantity=1,
+            unit_price=amount,
+            total_price=amount
+        )]
+        total_amount = amount
+    elif invoice_type == MEDICATION:
+        related = {'related_prescription_dispense_id': data['dispense_log_id']}
+        items = []
+        for item in data['items']:
+            quantity = _decimal(item.get('quantity', 1))
+            unit_price = _decimal(item.get('unit_price', 0))
+            items.append(InvoiceItem(
+                item_type='MEDICATION',
+                description=item.get('medication_name', 'Medication'),
+                quantity=quantity,
+                unit_price=unit_price,
+                total_price=quantity * unit_price
+            ))
+        total_amount = sum((_decimal(item.get('total_price', 0)) for item in data['items']), Decimal('0'))
+    elif invoice_type == LAB_TEST:
+        related = {'related_lab_order_id': data['lab_order_id']}
+        items = []
+        for item in data['items']:
+            price = _decimal(item.get('price', 0))
+            items.append(InvoiceItem(
+                item_type='LAB_TEST',
+                description=item.get('test_name', 'Laboratory Test'),
+                quantity=1,
+                unit_price=price,
+                total_price=price
+            ))
+        total_amount = sum((item.total_price for item in items), Decimal('0'))
+    else:
+        raise ValueError(f"Unknown invoice type: {invoice_type}")
+
+    invoice = Invoice(
+        patient_id=data['patient_id'],
+        invoice_number=invoice_number,
+        issue_date=issue_date,
+        due_date=calculate_due_date(issue_date),
+        sub_total_amount=total_amount,
+        total_amount=total_amount,  # No tax/discount for simplicity
+        status='PENDING_PATIENT',
+        **related
+    )
+    return invoice, items
+
+
+def notify_invoice_generated(invoice, service, token=None):
+    """Notify the patient about a new invoice."""
+    return notify_notification_service(
+        notification_type='INVOICE_GENERATED',
+        recipient_id=invoice.patient_id,
+        data={
+            "invoice_number": invoice.invoice_number,
+            "amount": str(invoice.total_amount),
+            "due_date": invoice.due_date.strftime("%Y-%m-%d"),
+            "service": service
+        },
+        token=token
+    )
+
+
+def create_invoices(specs):
+    """
+    Create many invoices and their items in one transaction.
+
+    Numbers are allocated as a single block, then invoices and items are
+    inserted with one bulk_create each.
+
+    Args:
+        specs: List of (invoice_type, validated data) pairs
+
+    Returns:
+        List of saved invoices, in the order of specs
+    """
+    if not specs:
+        return []
+
+    with transaction.atomic():
+        issue_date = timezone.now().date()
+        numbers = allocate_invoice_numbers(len(specs), issue_date)
+        built = [
+            build_invoice(invoice_type, data, number, issue_date)
+            for (invoice_type, data), number in zip(specs, numbers)
+        ]
+        invoices = Invoice.objects.bulk_create([invoice for invoice, items in built])
+
+        if invoices[0].pk is None:
+            # Backends without RETURNING (e.g. MySQL) leave primary keys unset
+            ids = dict(Invoice.objects.filter(invoice_number__in=numbers).values_list('invoice_number', 'id'))
+            for invoice in invoices:
+                invoice.pk = ids[invoice.invoice_number]
+
+        items = []
+        for invoice, invoice_items in built:
+            for item in invoice_items:
+                item.invoice = invoice
+                items.append(item)
+        InvoiceItem.objects.bulk_create(items)
+        refresh_patient_balances(*(invoice.patient_id for invoice in invoices))
+
+    return invoices
@@ -0,0 +1,45 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from billing_insurance.overdue import mark_overdue_invoices
+
+
+class Command(BaseCommand):
+    """Mark unpaid invoices past their due date as overdue."""
+    help = 'Move PENDING_PATIENT and PARTIALLY_PAID invoices past their due date to OVERDUE, e.g. hourly.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Day invoices must be due before (YYYY-MM-DD, defaults to today)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of invoices per UPDATE statement'
+        )
+        parser.add_argument(
+            '--no-notify',
+            action='store_true',
+            help='Do not notify patients about their overdue invoices'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            today = date.fromisoformat(options['date']) if options['date'] else None
+        except ValueError:
+            raise CommandError('Date must be in YYYY-MM-DD format.')
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size must be positive.')
+
+        report = mark_overdue_invoices(
+            today=today,
+            batch_size=options['batch_size'],
+            notify=not options['no_notify']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Marked {report['updated']} invoices overdue in {report['batches']} batches, "
+            f"{report['seconds']:.2f}s ({report['rows_per_second']:.0f} rows/s)"
+        ))
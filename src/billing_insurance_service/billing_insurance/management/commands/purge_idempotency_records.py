@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from billing_insurance.idempotency import purge_idempotency_records
+
+
+class Command(BaseCommand):
+    """Delete expired Idempotency-Key records."""
+    help = 'Delete Idempotency-Key records older than BILLING_IDEMPOTENCY_KEY_TTL_HOURS, e.g. daily.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            help='Age in hours records must exceed (defaults to BILLING_IDEMPOTENCY_KEY_TTL_HOURS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of records per DELETE statement'
+        )
+
+    def handle(self, *args, **options):
+        if options['hours'] is not None and options['hours'] < 0:
+            raise CommandError('Hours must not be negative.')
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size must be positive.')
+
+        before = timezone.now() - timedelta(hours=options['hours']) if options['hours'] is not None else None
+        report = purge_idempotency_records(before=before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {report['deleted']} idempotency records in {report['batches']} batches, "
+            f"{report['seconds']:.2f}s ({report['rows_per_second']:.0f} rows/s)"
+        ))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from billing_insurance.balances import rebuild_patient_balances
+
+
+class Command(BaseCommand):
+    """Recompute every patient balance summary from invoices."""
+    help = 'Rebuild patient balance summaries and re-age them as of today, e.g. nightly.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of summaries per UPDATE statement'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = rebuild_patient_balances(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} patient balance summaries in {time.monotonic() - started:.2f}s"
+        ))
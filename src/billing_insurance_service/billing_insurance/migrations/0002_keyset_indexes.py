@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-16 22:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_insurance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='insuranceclaim',
+            index=models.Index(fields=['created_at', 'id'], name='billing_ins_created_4462af_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='insurancepolicy',
+            index=models.Index(fields=['patient_id', 'created_at', 'id'], name='billing_ins_patient_e9d53f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['created_at', 'id'], name='billing_ins_created_1d1077_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['patient_id', 'created_at', 'id'], name='billing_ins_patient_6436df_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='billing_ins_status_3a3337_idx'),
+        ),
+    ]
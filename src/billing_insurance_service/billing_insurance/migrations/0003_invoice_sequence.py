@@ -0,0 +1,21 @@
+# Generated by Django 5.0.2 on 2026-10-16 22:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_insurance', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Issue day the sequence numbers belong to', unique=True)),
+                ('last_value', models.PositiveIntegerField(default=0, help_text='Last sequence number handed out for the day')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-16 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_insurance', '0003_invoice_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(help_text='Endpoint the key belongs to', max_length=100)),
+                ('key', models.CharField(help_text='Idempotency-Key header or related object ID', max_length=255)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('response', models.JSONField(help_text='Response body returned to the first call')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencyrecord',
+            constraint=models.UniqueConstraint(fields=('scope', 'key'), name='unique_idempotency_key'),
+        ),
+    ]
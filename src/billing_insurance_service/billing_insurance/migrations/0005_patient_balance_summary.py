@@ -0,0 +1,30 @@
+# Generated by Django 5.0.2 on 2026-10-16 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_insurance', '0004_idempotency_record'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientBalanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('patient_id', models.IntegerField(help_text='ID of the patient from User Service', unique=True)),
+                ('total_billed', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('paid_by_patient', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('paid_by_insurance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('outstanding', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('aging_0_30', models.DecimalField(decimal_places=2, default=0, help_text='Outstanding at most 30 days past due, including not yet due', max_digits=12)),
+                ('aging_31_60', models.DecimalField(decimal_places=2, default=0, help_text='Outstanding 31 to 60 days past due', max_digits=12)),
+                ('aging_61_90', models.DecimalField(decimal_places=2, default=0, help_text='Outstanding 61 to 90 days past due', max_digits=12)),
+                ('aging_over_90', models.DecimalField(decimal_places=2, default=0, help_text='Outstanding more than 90 days past due', max_digits=12)),
+                ('aged_on', models.DateField(blank=True, help_text='Day the aging buckets were computed for', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
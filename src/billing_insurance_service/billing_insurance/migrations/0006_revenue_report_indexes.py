@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-16 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_insurance', '0005_patient_balance_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='insuranceclaim',
+            index=models.Index(fields=['submission_date'], name='billing_ins_submiss_4ee742_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['issue_date'], name='billing_ins_issue_d_c97b84_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'payment_date'], name='billing_ins_status_9623e8_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-16 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_insurance', '0006_revenue_report_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'due_date'], name='billing_ins_status_a60c6e_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_insurance', '0007_invoice_status_due_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencyrecord',
+            name='request_hash',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 of the method, path and body of the first call, checked when a header key is reused', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='idempotencyrecord',
+            index=models.Index(fields=['created_at'], name='idempotency_created_at_idx'),
+        ),
+    ]
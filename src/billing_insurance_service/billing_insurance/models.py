@@ -31,6 +31,18 @@ class Invoice(models.Model):
     related_lab_order_id = models.CharField(max_length=50, null=True, blank=True, help_text="ID of related lab order, if any")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination on (created_at, id), overall and per patient or status
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['patient_id', 'created_at', 'id']),
+            models.Index(fields=['status', 'created_at', 'id']),
+            # Revenue reports by issue date
+            models.Index(fields=['issue_date']),
+            # Overdue sweep over unpaid invoices by due date
+            models.Index(fields=['status', 'due_date']),
+        ]
     
     @property
     def amount_due(self):
@@ -46,6 +58,57 @@ class Invoice(models.Model):
         return f"Invoice #{self.invoice_number} - {self.status}"
 
 
+class PatientBalanceSummary(models.Model):
+    """Per-patient totals and aging of receivables, maintained by balances.refresh_patient_balances"""
+    patient_id = models.IntegerField(unique=True, help_text="ID of the patient from User Service")
+    total_billed = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid_by_patient = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid_by_insurance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    outstanding = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    aging_0_30 = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Outstanding at most 30 days past due, including not yet due")
+    aging_31_60 = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Outstanding 31 to 60 days past due")
+    aging_61_90 = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Outstanding 61 to 90 days past due")
+    aging_over_90 = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Outstanding more than 90 days past due")
+    aged_on = models.DateField(null=True, blank=True, help_text="Day the aging buckets were computed for")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Patient {self.patient_id} - {self.outstanding} outstanding"
+
+
+class InvoiceSequence(models.Model):
+    """Per-day counter backing invoice numbers, see utils.allocate_invoice_numbers"""
+    day = models.DateField(unique=True, help_text="Issue day the sequence numbers belong to")
+    last_value = models.PositiveIntegerField(default=0, help_text="Last sequence number handed out for the day")
+
+    def __str__(self):
+        return f"{self.day} - {self.last_value}"
+
+
+class IdempotencyRecord(models.Model):
+    """Response of an internal call, replayed when the call is retried with the same key"""
+    scope = models.CharField(max_length=100, help_text="Endpoint the key belongs to")
+    key = models.CharField(max_length=255, help_text="Idempotency-Key header or related object ID")
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(help_text="Response body returned to the first call")
+    request_hash = models.CharField(
+        max_length=64, blank=True, default='',
+        help_text="SHA-256 of the method, path and body of the first call, checked when a header key is reused"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_created_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} - {self.key}"
+
+
 class InvoiceItem(models.Model):
     """Model representing an individual line item on an invoice"""
     ITEM_TYPE_CHOICES = [
@@ -99,6 +162,12 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Revenue reports on successful payments by date
+            models.Index(fields=['status', 'payment_date']),
+        ]
+    
     def __str__(self):
         invoice_num = self.invoice.invoice_number if self.invoice else "No Invoice"
         return f"Payment {self.id} - {self.amount} - {invoice_num}"
@@ -117,6 +186,11 @@ class InsurancePolicy(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient_id', 'created_at', 'id']),
+        ]
     
     @property
     def is_expired(self):
@@ -152,6 +226,13 @@ class InsuranceClaim(models.Model):
     claim_reference_number = models.CharField(max_length=100, null=True, blank=True, help_text="External reference number")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            # Revenue reports by submission date
+            models.Index(fields=['submission_date']),
+        ]
     
     def __str__(self):
         return f"Claim {self.id} - {self.insurance_policy.provider_name} - {self.status}"
@@ -0,0 +1,84 @@
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Invoice
+from .utils import notify_notification_service_bulk
+
+# Unpaid invoices that become overdue once past their due date
+OVERDUE_FROM_STATUSES = ['PENDING_PATIENT', 'PARTIALLY_PAID']
+
+
+def mark_overdue_invoices(today=None, batch_size=1000, notify=True):
+    """
+    Flip unpaid invoices past their due date to OVERDUE in bounded batches.
+
+    Each batch picks up to `batch_size` IDs from the (status, due_date) index,
+    skipping rows locked by concurrent payments, then moves them with one
+    UPDATE ... WHERE that re-checks the status. Patients of each batch are
+    notified with one bulk call after it commits.
+
+    Args:
+        today: Day invoices must be due before, defaults to today
+        batch_size: Maximum number of invoices updated per statement
+        notify: Whether to send INVOICE_OVERDUE notifications
+
+    Returns:
+        Dict with the number of invoices updated, batches, elapsed seconds and rows per second
+    """
+    today = today or timezone.now().date()
+    started = time.monotonic()
+    updated = 0
+    batches = 0
+
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Invoice.objects.select_for_update(skip_locked=True).filter(
+                    status__in=OVERDUE_FROM_STATUSES,
+                    due_date__lt=today
+                ).order_by('due_date', 'id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            count = Invoice.objects.filter(id__in=ids, status__in=OVERDUE_FROM_STATUSES).update(
+                status='OVERDUE',
+                updated_at=timezone.now()
+            )
+            invoices = list(
+                Invoice.objects.filter(id__in=ids, status='OVERDUE').values(
+                    'id', 'patient_id', 'invoice_number', 'due_date',
+                    'total_amount', 'amount_paid_by_patient', 'amount_paid_by_insurance'
+                )
+            ) if notify else []
+
+        updated += count
+        batches += 1
+        if invoices:
+            notify_notification_service_bulk('INVOICE_OVERDUE', [
+                {
+                    'recipient_id': invoice['patient_id'],
+                    'data': {
+                        "invoice_id": invoice['id'],
+                        "invoice_number": invoice['invoice_number'],
+                        "due_date": invoice['due_date'].strftime("%Y-%m-%d"),
+                        "amount_due": str(max(
+                            0,
+                            invoice['total_amount'] - invoice['amount_paid_by_patient']
+                            - invoice['amount_paid_by_insurance']
+                        ))
+                    }
+                }
+                for invoice in invoices
+            ])
+        if len(ids) < batch_size:
+            break
+
+    seconds = time.monotonic() - started
+    return {
+        'updated': updated,
+        'batches': batches,
+        'seconds': seconds,
+        'rows_per_second': updated / seconds if seconds else 0.0,
+    }
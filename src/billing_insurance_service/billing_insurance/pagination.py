@@ -0,0 +1,210 @@
+import base64
+import datetime
+import json
+from collections import OrderedDict
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over an indexed ordering such as (created_at, id).
+
+    Instead of OFFSET, each page continues from the last row of the previous
+    one with `WHERE (created_at, id) < (last_created_at, last_id)`, so deep
+    pages cost the same as the first one. Cursors are opaque and the total
+    count is only computed on request (`?count=true`), capped and estimated
+    from table statistics past the cap.
+
+    Views pick the ordering with an `ordering` attribute. It must end with a
+    unique field, usually `id`, and its fields must not be nullable.
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_cap = 10000
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+        self.fields = [
+            queryset.model._meta.get_field(field.lstrip('-'))
+            for field in self.ordering
+        ]
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true'):
+            self.count, self.count_is_estimate = self.get_estimated_count(queryset)
+
+        position, reverse = self.decode_cursor(request)
+        ordering = self._reversed(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek(ordering, position))
+
+        # Fetch one extra row to know whether there is a further page
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.count is not None:
+            response['count'] = self.count
+            response['count_is_estimate'] = self.count_is_estimate
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_is_estimate': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'ordering', None) or self.ordering)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_estimated_count(self, queryset):
+        """
+        Count rows up to `count_cap`, past it fall back to an estimate.
+
+        Returns:
+            Tuple of (count, is_estimate)
+        """
+        count = queryset.order_by()[:self.count_cap + 1].count()
+        if count <= self.count_cap:
+            return count, False
+        estimate = None
+        if not queryset.query.where:
+            estimate = _table_row_estimate(queryset)
+        return max(estimate or 0, self.count_cap), True
+
+    def decode_cursor(self, request):
+        """
+        Return the (position, reverse) pair encoded in the request's cursor.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values = payload['p']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [field.to_python(value) for field, value in zip(self.fields, values)]
+            return position, bool(payload.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        payload = {'p': [_jsonable(getattr(row, field.attname)) for field in self.fields]}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii')
+        return replace_query_param(
+            remove_query_param(self.base_url, self.count_query_param),
+            self.cursor_query_param,
+            encoded
+        )
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+    @staticmethod
+    def _seek(ordering, position):
+        """
+        Build the filter for rows strictly after `position` in `ordering`.
+
+        (a, b) > (x, y) is expanded to `a > x OR (a = x AND b > y)`, which works
+        for mixed directions and lets the database range-scan the index on a.
+        """
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            for previous_field, previous_value in zip(ordering[:index], position[:index]):
+                step &= Q(**{previous_field.lstrip('-'): previous_value})
+            condition |= step
+        return condition
+
+
+def _jsonable(value):
+    """Serialize a cursor value without losing precision (e.g. microseconds)."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, float, str, bool)):
+        return value
+    return str(value)
+
+
+def _table_row_estimate(queryset):
+    """Approximate row count of the queryset's table from database statistics."""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'mysql':
+        sql = (
+            'SELECT TABLE_ROWS FROM information_schema.TABLES '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s'
+        )
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
@@ -0,0 +1,119 @@
+import csv
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, DateField, DecimalField, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import InsuranceClaim, InvoiceItem, Payment
+
+ITEM_TYPE = 'item_type'
+PAYMENT_METHOD = 'payment_method'
+INSURER = 'insurer'
+GROUP_BY_CHOICES = [ITEM_TYPE, PAYMENT_METHOD, INSURER]
+PERIOD_CHOICES = ['day', 'month']
+
+# Invoices that never count as revenue
+EXCLUDED_INVOICE_STATUSES = ['DRAFT', 'CANCELLED']
+
+_MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _day_bounds(start_date, end_date):
+    """Aware datetimes spanning the given days, so datetime columns are range-scanned."""
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return start, end
+
+
+def _base_queryset(group_by, start_date, end_date):
+    """
+    Return (queryset, date field, group field, amount field) of a revenue breakdown.
+
+    Items count on their invoice's issue date, successful payments on their
+    payment date and insurance claims on their submission date.
+    """
+    if group_by == ITEM_TYPE:
+        queryset = InvoiceItem.objects.filter(
+            invoice__issue_date__range=(start_date, end_date)
+        ).exclude(invoice__status__in=EXCLUDED_INVOICE_STATUSES)
+        return queryset, 'invoice__issue_date', 'item_type', 'total_price'
+    if group_by == PAYMENT_METHOD:
+        start, end = _day_bounds(start_date, end_date)
+        queryset = Payment.objects.filter(status='SUCCESS', payment_date__gte=start, payment_date__lt=end)
+        return queryset, 'payment_date', 'payment_method', 'amount'
+    if group_by == INSURER:
+        queryset = InsuranceClaim.objects.filter(submission_date__range=(start_date, end_date))
+        return queryset, 'submission_date', 'insurance_policy__provider_name', 'approved_amount'
+    raise ValueError(f"Unknown grouping: {group_by}")
+
+
+def revenue_report(group_by, period, start_date, end_date):
+    """
+    Revenue per period and group, aggregated by the database.
+
+    Args:
+        group_by: One of GROUP_BY_CHOICES
+        period: 'day' or 'month'
+        start_date: First day included
+        end_date: Last day included
+
+    Returns:
+        Queryset of dicts with period, group, amount and count, ordered by period then group.
+        For insurers the amount is the approved amount and claimed_amount is added.
+    """
+    queryset, date_field, group_field, amount_field = _base_queryset(group_by, start_date, end_date)
+    aggregates = {
+        'amount': Sum(amount_field, output_field=_MONEY),
+        'count': Count('id'),
+    }
+    if group_by == INSURER:
+        aggregates['claimed_amount'] = Sum('claim_amount', output_field=_MONEY)
+
+    return queryset.annotate(
+        period=Trunc(date_field, period, output_field=DateField()),
+        group=F(group_field),
+    ).values('period', 'group').annotate(**aggregates).order_by('period', 'group')
+
+
+class _Echo:
+    """File-like object handing back what is written, for streaming a csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+EXPORT_COLUMNS = {
+    ITEM_TYPE: (
+        ['issue_date', 'invoice_number', 'patient_id', 'item_type', 'description', 'quantity', 'unit_price', 'total_price'],
+        ['invoice__issue_date', 'invoice__invoice_number', 'invoice__patient_id', 'item_type', 'description',
+         'quantity', 'unit_price', 'total_price'],
+    ),
+    PAYMENT_METHOD: (
+        ['payment_date', 'invoice_number', 'patient_id', 'payment_method', 'amount', 'transaction_id'],
+        ['payment_date', 'invoice__invoice_number', 'patient_id', 'payment_method', 'amount', 'transaction_id'],
+    ),
+    INSURER: (
+        ['submission_date', 'invoice_number', 'provider_name', 'policy_number', 'status', 'claim_amount',
+         'approved_amount'],
+        ['submission_date', 'invoice__invoice_number', 'insurance_policy__provider_name',
+         'insurance_policy__policy_number', 'status', 'claim_amount', 'approved_amount'],
+    ),
+}
+
+
+def export_revenue_rows(group_by, start_date, end_date, chunk_size=2000):
+    """
+    Yield the line-level revenue records of a breakdown as CSV lines.
+
+    Rows are read with a server-side cursor where the database supports it,
+    `chunk_size` at a time, so memory stays flat however long the range.
+    """
+    queryset, date_field, _, _ = _base_queryset(group_by, start_date, end_date)
+    header, fields = EXPORT_COLUMNS[group_by]
+    writer = csv.writer(_Echo())
+
+    yield writer.writerow(header)
+    rows = queryset.order_by(date_field, 'id').values_list(*fields)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield writer.writerow(row)
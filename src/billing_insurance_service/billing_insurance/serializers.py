@@ -1,5 +1,14 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Invoice, InvoiceItem, Payment, InsurancePolicy, InsuranceClaim
+from .models import Invoice, InvoiceItem, Payment, InsurancePolicy, InsuranceClaim, PatientBalanceSummary
+from . import reports
+from .balances import refresh_patient_balances
+from .idempotency import MAX_KEY_LENGTH
+from .utils import generate_invoice_number
 
 
 class InvoiceItemSerializer(serializers.ModelSerializer):
@@ -45,20 +54,25 @@ class InvoiceSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'invoice_number', 'amount_paid_by_patient', 
                            'amount_paid_by_insurance', 'created_at', 'updated_at']
     
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
-        # Generate invoice number - simple implementation
-        last_invoice = Invoice.objects.order_by('-id').first()
-        invoice_num = f"INV-{last_invoice.id + 1:06d}" if last_invoice else "INV-000001"
-        
-        invoice = Invoice.objects.create(invoice_number=invoice_num, **validated_data)
+        invoice = Invoice.objects.create(invoice_number=generate_invoice_number(), **validated_data)
         
         for item_data in items_data:
             InvoiceItem.objects.create(invoice=invoice, **item_data)
         
+        refresh_patient_balances(invoice.patient_id)
         return invoice
 
 
+class PatientBalanceSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PatientBalanceSummary
+        fields = ['patient_id', 'total_billed', 'paid_by_patient', 'paid_by_insurance', 'outstanding',
+                 'aging_0_30', 'aging_31_60', 'aging_61_90', 'aging_over_90', 'aged_on', 'updated_at']
+
+
 class InsurancePolicySerializer(serializers.ModelSerializer):
     is_expired = serializers.BooleanField(read_only=True)
     
@@ -103,4 +117,47 @@ class CreateInvoiceForLabTestSerializer(serializers.Serializer):
     patient_id = serializers.IntegerField()
     items = serializers.ListField(
         child=serializers.DictField()
-    ) 
\ No newline at end of file
+    ) 
+
+
+class BulkInvoiceSpecSerializer(serializers.Serializer):
+    """One invoice of a bulk creation, data holds the fields of the matching single-invoice endpoint"""
+    idempotency_key = serializers.CharField(max_length=MAX_KEY_LENGTH)
+    invoice_type = serializers.ChoiceField(choices=['APPOINTMENT', 'MEDICATION', 'LAB_TEST'])
+    data = serializers.DictField()
+
+
+class BulkInvoiceCreateSerializer(serializers.Serializer):
+    """Serializer for creating many invoices in one internal call"""
+    invoices = BulkInvoiceSpecSerializer(many=True, allow_empty=False)
+    notify = serializers.BooleanField(default=True)
+
+    def validate_invoices(self, value):
+        max_specs = getattr(settings, 'BILLING_BULK_INVOICE_MAX_SPECS', 5000)
+        if len(value) > max_specs:
+            raise serializers.ValidationError(f"At most {max_specs} invoices can be created per request.")
+
+        keys = [spec['idempotency_key'] for spec in value]
+        if len(set(keys)) != len(keys):
+            raise serializers.ValidationError("Idempotency keys must be unique within a request.")
+        return value
+
+
+class RevenueReportQuerySerializer(serializers.Serializer):
+    """Serializer for the query parameters of the revenue reports"""
+    group_by = serializers.ChoiceField(choices=reports.GROUP_BY_CHOICES, default=reports.ITEM_TYPE)
+    period = serializers.ChoiceField(choices=reports.PERIOD_CHOICES, default='day')
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        end_date = attrs.get('end_date') or timezone.now().date()
+        start_date = attrs.get('start_date') or end_date - timedelta(days=29)
+        if start_date > end_date:
+            raise serializers.ValidationError({'end_date': 'End date must not be before start date.'})
+        max_days = getattr(settings, 'BILLING_REPORT_MAX_DAYS', 366)
+        if (end_date - start_date).days >= max_days:
+            raise serializers.ValidationError({'start_date': f'Reports span at most {max_days} days.'})
+        attrs['start_date'] = start_date
+        attrs['end_date'] = end_date
+        return attrs
@@ -1,3 +1,729 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from io import StringIO
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.core.management import call_command
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .balances import rebuild_patient_balances, refresh_patient_balances
+from .idempotency import purge_idempotency_records
+from .overdue import mark_overdue_invoices
+from .models import (
+    IdempotencyRecord, InsuranceClaim, InsurancePolicy, Invoice, InvoiceItem, InvoiceSequence,
+    PatientBalanceSummary, Payment
+)
+from .utils import allocate_invoice_numbers, generate_invoice_number
+
+
+class InvoiceQueryCountTests(APITestCase):
+    """Query-count regression tests for invoice endpoints with nested relations."""
+
+    # Invoices, then one prefetch query each for items, payments and claims with their policy
+    LIST_QUERIES = 4
+
+    def create_invoices(self, count, patient_id=1):
+        """Create invoices that each have items, a payment and claims on distinct policies."""
+        for _ in range(count):
+            number = Invoice.objects.count() + 1
+            invoice = Invoice.objects.create(
+                patient_id=patient_id,
+                invoice_number=f'INV-{number:06d}',
+                due_date=date(2025, 1, 31),
+                sub_total_amount=Decimal('100.00'),
+                total_amount=Decimal('100.00'),
+                status='PENDING_PATIENT'
+            )
+            for item_type in ['CONSULTATION', 'LAB_TEST']:
+                InvoiceItem.objects.create(
+                    invoice=invoice,
+                    item_type=item_type,
+                    description=item_type.title(),
+                    unit_price=Decimal('50.00')
+                )
+            Payment.objects.create(
+                invoice=invoice,
+                patient_id=patient_id,
+                amount=Decimal('10.00'),
+                payment_method='CASH',
+                status='SUCCESS'
+            )
+            for claim_index in range(2):
+                policy = InsurancePolicy.objects.create(
+                    patient_id=patient_id,
+                    provider_name=f'Insurer {number}-{claim_index}',
+                    policy_number=f'POL-{number}-{claim_index}',
+                    member_id='M-1',
+                    valid_from=date(2024, 1, 1),
+                    valid_to=date(2026, 1, 1)
+                )
+                InsuranceClaim.objects.create(
+                    invoice=invoice,
+                    insurance_policy=policy,
+                    claim_amount=Decimal('45.00')
+                )
+
+    def assert_constant_queries(self, url, page_sizes=(1, 5, 20)):
+        """Assert that listing costs LIST_QUERIES queries whatever the page size."""
+        for page_size in page_sizes:
+            with self.subTest(page_size=page_size):
+                with self.assertNumQueries(self.LIST_QUERIES):
+                    response = self.client.get(url, {'page_size': page_size})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(response.data['results']), page_size)
+
+    def test_invoice_list_query_count(self):
+        """Test that the invoice list prefetches items, payments and claims."""
+        self.create_invoices(20)
+        self.assert_constant_queries(reverse('invoice-list-create'))
+
+    def test_invoice_list_filtered_query_count(self):
+        """Test that filtering by patient keeps the query count constant."""
+        self.create_invoices(20, patient_id=7)
+        self.create_invoices(3, patient_id=8)
+        self.assert_constant_queries(reverse('invoice-list-create') + '?patient_id=7')
+
+    def test_patient_invoice_list_query_count(self):
+        """Test that the patient invoice list prefetches nested relations."""
+        self.create_invoices(20, patient_id=3)
+        self.assert_constant_queries(reverse('patient-invoice-list', kwargs={'patient_id': 3}))
+
+    def test_invoice_list_nested_data(self):
+        """Test that prefetched relations are serialized in full."""
+        self.create_invoices(2)
+        response = self.client.get(reverse('invoice-list-create'))
+        invoice = response.data['results'][0]
+        self.assertEqual(len(invoice['items']), 2)
+        self.assertEqual(len(invoice['payments']), 1)
+        self.assertEqual(len(invoice['claims']), 2)
+        self.assertTrue(invoice['claims'][0]['provider_name'].startswith('Insurer'))
+
+    def test_invoice_detail_query_count(self):
+        """Test that an invoice detail costs the same fixed number of queries."""
+        self.create_invoices(1)
+        invoice = Invoice.objects.get()
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get(reverse('invoice-detail', kwargs={'pk': invoice.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_insurance_claim_list_query_count(self):
+        """Test that claim providers are joined rather than fetched per claim."""
+        self.create_invoices(10)
+        for page_size in (1, 20):
+            with self.subTest(page_size=page_size):
+                with self.assertNumQueries(1):
+                    response = self.client.get(reverse('insurance-claim-list'), {'page_size': page_size})
+                self.assertEqual(len(response.data['results']), page_size)
+
+
+class InvoiceNumberAllocatorTests(APITestCase):
+    """Tests for the per-day invoice number sequence."""
+
+    def test_numbers_are_sequential_per_day(self):
+        """Test that each day has its own sequence starting at 1."""
+        self.assertEqual(generate_invoice_number(date(2025, 3, 1)), 'INV-20250301-0001')
+        self.assertEqual(generate_invoice_number(date(2025, 3, 1)), 'INV-20250301-0002')
+        self.assertEqual(generate_invoice_number(date(2025, 3, 2)), 'INV-20250302-0001')
+
+    def test_allocate_block(self):
+        """Test that a block reservation hands out a contiguous range in one update."""
+        generate_invoice_number(date(2025, 3, 1))
+        with CaptureQueriesContext(connection) as queries:
+            numbers = allocate_invoice_numbers(3, date(2025, 3, 1))
+        statements = [query['sql'] for query in queries if 'invoicesequence' in query['sql']]
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(numbers, ['INV-20250301-0002', 'INV-20250301-0003', 'INV-20250301-0004'])
+        self.assertEqual(InvoiceSequence.objects.get(day=date(2025, 3, 1)).last_value, 4)
+
+    def test_seeds_from_existing_invoices(self):
+        """Test that the first allocation of a day continues after invoices already numbered."""
+        for number in ['INV-20250301-0009', 'INV-20250301-10000', 'INV-20250302-0500']:
+            Invoice.objects.create(
+                patient_id=1,
+                invoice_number=number,
+                due_date=date(2025, 3, 31),
+                sub_total_amount=Decimal('1.00'),
+                total_amount=Decimal('1.00')
+            )
+        self.assertEqual(generate_invoice_number(date(2025, 3, 1)), 'INV-20250301-10001')
+
+    def test_rolled_back_allocation_is_released(self):
+        """Test that numbers reserved in a rolled back transaction are handed out again."""
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                generate_invoice_number(date(2025, 3, 1))
+                raise RuntimeError
+        self.assertEqual(generate_invoice_number(date(2025, 3, 1)), 'INV-20250301-0001')
+
+    def test_internal_endpoints_and_serializer_share_sequence(self):
+        """Test that every invoice creation path draws from the same sequence."""
+        today = timezone.localdate().strftime('%Y%m%d')
+        response = self.client.post(reverse('create-invoice-appointment'), {
+            'appointment_id': 1,
+            'patient_id': 1,
+            'doctor_id': 2,
+            'service_description': 'Consultation',
+            'amount': '30.00'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['invoice_number'], f'INV-{today}-0001')
+
+        response = self.client.post(reverse('create-invoice-labtest'), {
+            'lab_order_id': 'LAB-1',
+            'patient_id': 1,
+            'items': [{'test_name': 'CBC', 'price': '20.00'}]
+        }, format='json')
+        self.assertEqual(response.data['invoice_number'], f'INV-{today}-0002')
+
+        response = self.client.post(reverse('invoice-list-create'), {
+            'patient_id': 1,
+            'issue_date': '2025-03-01',
+            'due_date': '2025-03-31',
+            'sub_total_amount': '10.00',
+            'total_amount': '10.00'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['invoice_number'], f'INV-{today}-0003')
+
+
+class BulkCreateInvoicesTests(APITestCase):
+    """Tests for the bulk internal invoice endpoint."""
+
+    def setUp(self):
+        self.url = reverse('bulk-create-invoices')
+
+    def lab_spec(self, key, order_id, prices=('20.00', '15.50')):
+        return {
+            'idempotency_key': key,
+            'invoice_type': 'LAB_TEST',
+            'data': {
+                'lab_order_id': order_id,
+                'patient_id': 5,
+                'items': [{'test_name': f'Test {index}', 'price': price} for index, price in enumerate(prices)]
+            }
+        }
+
+    def test_bulk_create(self):
+        """Test that every spec gets an invoice with items and consecutive numbers."""
+        specs = [self.lab_spec(f'lab-{index}', f'LAB-{index}') for index in range(3)]
+        specs.append({
+            'idempotency_key': 'med-1',
+            'invoice_type': 'MEDICATION',
+            'data': {
+                'dispense_log_id': '9',
+                'patient_id': 6,
+                'items': [{'medication_name': 'Paracetamol', 'quantity': 2, 'unit_price': '1.25', 'total_price': '2.50'}]
+            }
+        })
+        response = self.client.post(self.url, {'invoices': specs, 'notify': False}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual([result['idempotency_key'] for result in response.data['results']],
+                         ['lab-0', 'lab-1', 'lab-2', 'med-1'])
+        sequence = [int(result['invoice_number'].split('-')[-1]) for result in response.data['results']]
+        self.assertEqual(sequence, [1, 2, 3, 4])
+
+        invoice = Invoice.objects.get(related_lab_order_id='LAB-1')
+        self.assertEqual(invoice.total_amount, Decimal('35.50'))
+        self.assertEqual(invoice.items.count(), 2)
+        item = InvoiceItem.objects.get(invoice__related_prescription_dispense_id='9')
+        self.assertEqual(item.total_price, Decimal('2.50'))
+
+    def test_invalid_specs_reported_per_item(self):
+        """Test that invalid specs are reported without failing the valid ones."""
+        invalid = {'idempotency_key': 'bad', 'invoice_type': 'LAB_TEST', 'data': {'patient_id': 5}}
+        response = self.client.post(self.url, {
+            'invoices': [self.lab_spec('good', 'LAB-1'), invalid],
+            'notify': False
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['results'][0]['status'], 'created')
+        self.assertEqual(response.data['results'][1]['status'], 'invalid')
+        self.assertIn('lab_order_id', response.data['results'][1]['errors'])
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_duplicate_keys_rejected(self):
+        """Test that a request reusing an idempotency key is rejected as a whole."""
+        response = self.client.post(self.url, {
+            'invoices': [self.lab_spec('same', 'LAB-1'), self.lab_spec('same', 'LAB-2')]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Invoice.objects.exists())
+
+    @override_settings(BILLING_BULK_INVOICE_CHUNK_SIZE=10)
+    def test_query_count_per_chunk(self):
+        """Test that inserts are batched per chunk rather than issued per invoice."""
+        specs = [self.lab_spec(f'lab-{index}', f'LAB-{index}') for index in range(25)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'invoices': specs, 'notify': False}, format='json')
+        self.assertEqual(response.data['created'], 25)
+
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT')]
+        # Invoices, items, idempotency records and missing balance summaries per chunk, plus the day's sequence row
+        self.assertEqual(len(inserts), 3 * 4 + 1)
+        self.assertEqual(InvoiceItem.objects.count(), 50)
+
+    def test_repeated_keys_replay_results(self):
+        """Test that resending specs replays their results instead of creating duplicates."""
+        first = self.client.post(self.url, {
+            'invoices': [self.lab_spec('lab-1', 'LAB-1')],
+            'notify': False
+        }, format='json')
+        second = self.client.post(self.url, {
+            'invoices': [self.lab_spec('lab-1', 'LAB-1'), self.lab_spec('lab-2', 'LAB-2')],
+            'notify': False
+        }, format='json')
+
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        replayed, created = second.data['results']
+        self.assertTrue(replayed['replayed'])
+        self.assertEqual(replayed['invoice_id'], first.data['results'][0]['invoice_id'])
+        self.assertNotIn('replayed', created)
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    def test_single_and_bulk_deduplicate_each_other(self):
+        """Test that an object invoiced by one endpoint is replayed, not invoiced again, by the other."""
+        single = self.client.post(reverse('create-invoice-labtest'), self.lab_spec('x', 'LAB-1')['data'], format='json')
+        bulk = self.client.post(self.url, {
+            'invoices': [self.lab_spec('lab-1', 'LAB-1'), self.lab_spec('lab-2', 'LAB-2')],
+            'notify': False
+        }, format='json')
+
+        replayed = bulk.data['results'][0]
+        self.assertTrue(replayed['replayed'])
+        self.assertEqual(replayed['invoice_id'], single.data['invoice_id'])
+
+        retried = self.client.post(reverse('create-invoice-labtest'), self.lab_spec('y', 'LAB-2')['data'], format='json')
+        self.assertEqual(retried['Idempotent-Replayed'], 'true')
+        self.assertEqual(retried.data['invoice_id'], bulk.data['results'][1]['invoice_id'])
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    def test_same_object_twice_in_request(self):
+        """Test that a request cannot invoice one object twice."""
+        response = self.client.post(self.url, {
+            'invoices': [self.lab_spec('lab-1', 'LAB-1'), self.lab_spec('lab-2', 'LAB-1')],
+            'notify': False
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertIn('lab_order_id', response.data['results'][1]['errors'])
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_key_reused_for_another_spec(self):
+        """Test that a key resent with different data is reported invalid instead of replayed."""
+        self.client.post(self.url, {'invoices': [self.lab_spec('lab-1', 'LAB-1')], 'notify': False}, format='json')
+        response = self.client.post(self.url, {
+            'invoices': [self.lab_spec('lab-1', 'LAB-2'), self.lab_spec('lab-3', 'LAB-3')],
+            'notify': False
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        reused, created = response.data['results']
+        self.assertEqual(reused['status'], 'invalid')
+        self.assertIn('idempotency_key', reused['errors'])
+        self.assertEqual(created['status'], 'created')
+        self.assertFalse(Invoice.objects.filter(related_lab_order_id='LAB-2').exists())
+
+
+class IdempotencyTests(APITestCase):
+    """Tests for idempotent replays of the internal invoice endpoints."""
+
+    def setUp(self):
+        self.url = reverse('create-invoice-appointment')
+        self.payload = {
+            'appointment_id': 11,
+            'patient_id': 1,
+            'doctor_id': 2,
+            'service_description': 'Consultation',
+            'amount': '30.00'
+        }
+
+    def test_header_key_replays_response(self):
+        """Test that a retry with the same Idempotency-Key replays the first response."""
+        first = self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        with self.assertNumQueries(1):
+            second = self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_related_id_used_without_header(self):
+        """Test that the related appointment ID deduplicates calls without a header."""
+        self.client.post(self.url, self.payload, format='json')
+        response = self.client.post(self.url, self.payload, format='json')
+
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(Invoice.objects.filter(related_appointment_id=11).count(), 1)
+        self.assertTrue(IdempotencyRecord.objects.filter(scope='create-invoice-appointment', key='related:11').exists())
+
+    def test_new_header_key_for_same_appointment(self):
+        """Test that a retry with another header key still replays the appointment's invoice."""
+        first = self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        second = self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='def')
+
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data['invoice_id'], first.data['invoice_id'])
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_failed_calls_are_not_recorded(self):
+        """Test that a rejected call can be retried with a corrected payload."""
+        invalid = dict(self.payload, amount='not-a-number')
+        response = self.client.post(self.url, invalid, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+
+    def test_keys_are_scoped_per_endpoint(self):
+        """Test that the same key on another endpoint creates its own invoice."""
+        self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        response = self.client.post(reverse('create-invoice-labtest'), {
+            'lab_order_id': 'LAB-1',
+            'patient_id': 1,
+            'items': [{'test_name': 'CBC', 'price': '20.00'}]
+        }, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    def test_key_reused_with_another_body(self):
+        """Test that a retry with the same Idempotency-Key but another body is rejected."""
+        self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        other = dict(self.payload, appointment_id=12, amount='45.00')
+        response = self.client.post(self.url, other, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_expired_key_can_be_reused(self):
+        """Test that a header key past its TTL no longer replays, while the related ID still does."""
+        self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        IdempotencyRecord.objects.update(created_at=timezone.now() - timedelta(hours=25))
+
+        other = dict(self.payload, appointment_id=12)
+        response = self.client.post(self.url, other, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+
+        response = self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='def')
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    def test_purge_deletes_expired_header_keys(self):
+        """Test that purging removes expired header key records in batches and keeps related IDs."""
+        for index in range(3):
+            payload = dict(self.payload, appointment_id=20 + index)
+            self.client.post(self.url, payload, format='json', HTTP_IDEMPOTENCY_KEY=f'key-{index}')
+        IdempotencyRecord.objects.update(created_at=timezone.now() - timedelta(hours=25))
+        self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='fresh')
+
+        report = purge_idempotency_records(batch_size=2)
+
+        self.assertEqual(report['deleted'], 3)
+        self.assertEqual(report['batches'], 2)
+        self.assertEqual(
+            sorted(IdempotencyRecord.objects.filter(key__startswith='key:').values_list('key', flat=True)),
+            ['key:fresh']
+        )
+        self.assertEqual(IdempotencyRecord.objects.filter(key__startswith='related:').count(), 4)
+
+    def test_purge_command(self):
+        """Test that the command purges records older than the given hours."""
+        self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        IdempotencyRecord.objects.update(created_at=timezone.now() - timedelta(hours=2))
+
+        out = StringIO()
+        call_command('purge_idempotency_records', '--hours', '1', stdout=out)
+        self.assertIn('Deleted 1 idempotency records in 1 batches', out.getvalue())
+
+
+class PatientBalanceTests(APITestCase):
+    """Tests for the maintained patient balance summary."""
+
+    def create_invoice(self, patient_id, days_past_due, total='100.00', status='PENDING_PATIENT', **paid):
+        invoice = Invoice.objects.create(
+            patient_id=patient_id,
+            invoice_number=generate_invoice_number(),
+            due_date=timezone.now().date() - timedelta(days=days_past_due),
+            sub_total_amount=Decimal(total),
+            total_amount=Decimal(total),
+            status=status,
+            **paid
+        )
+        return invoice
+
+    def balance(self, patient_id):
+        response = self.client.get(reverse('patient-balance', kwargs={'patient_id': patient_id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_aging_buckets(self):
+        """Test that outstanding amounts land in the bucket of their days past due."""
+        self.create_invoice(1, -10)
+        self.create_invoice(1, 45, amount_paid_by_patient=Decimal('40.00'))
+        self.create_invoice(1, 75, amount_paid_by_insurance=Decimal('100.00'))
+        self.create_invoice(1, 120, total='50.00')
+        self.create_invoice(1, 200, status='WRITTEN_OFF')
+        self.create_invoice(1, 5, status='CANCELLED')
+        self.create_invoice(2, 10)
+        rebuild_patient_balances()
+
+        with self.assertNumQueries(1):
+            data = self.balance(1)
+        self.assertEqual(Decimal(data['total_billed']), Decimal('450.00'))
+        self.assertEqual(Decimal(data['paid_by_patient']), Decimal('40.00'))
+        self.assertEqual(Decimal(data['paid_by_insurance']), Decimal('100.00'))
+        self.assertEqual(Decimal(data['outstanding']), Decimal('210.00'))
+        self.assertEqual(Decimal(data['aging_0_30']), Decimal('100.00'))
+        self.assertEqual(Decimal(data['aging_31_60']), Decimal('60.00'))
+        self.assertEqual(Decimal(data['aging_61_90']), Decimal('0.00'))
+        self.assertEqual(Decimal(data['aging_over_90']), Decimal('50.00'))
+
+    def test_payment_updates_summary(self):
+        """Test that paying an invoice updates the summary in the same transaction."""
+        response = self.client.post(reverse('create-invoice-appointment'), {
+            'appointment_id': 1,
+            'patient_id': 3,
+            'doctor_id': 2,
+            'service_description': 'Consultation',
+            'amount': '80.00'
+        }, format='json')
+        self.assertEqual(PatientBalanceSummary.objects.get(patient_id=3).outstanding, Decimal('80.00'))
+
+        self.client.post(reverse('invoice-payment', kwargs={'pk': response.data['invoice_id']}), {
+            'amount': '30.00',
+            'payment_method': 'CASH'
+        }, format='json')
+        summary = PatientBalanceSummary.objects.get(patient_id=3)
+        self.assertEqual(summary.paid_by_patient, Decimal('30.00'))
+        self.assertEqual(summary.outstanding, Decimal('50.00'))
+
+    def test_claim_approval_updates_summary(self):
+        """Test that an approved claim moves the insurer payment into the summary."""
+        invoice = self.create_invoice(4, 0)
+        policy = InsurancePolicy.objects.create(
+            patient_id=4,
+            provider_name='Insurer',
+            policy_number='POL-1',
+            member_id='M-1',
+            valid_from=date(2024, 1, 1),
+            valid_to=date(2030, 1, 1)
+        )
+        claim = InsuranceClaim.objects.create(invoice=invoice, insurance_policy=policy, claim_amount=Decimal('70.00'))
+
+        self.client.patch(reverse('insurance-claim-detail', kwargs={'pk': claim.pk}), {
+            'status': 'APPROVED',
+            'approved_amount': '70.00'
+        }, format='json')
+        summary = PatientBalanceSummary.objects.get(patient_id=4)
+        self.assertEqual(summary.paid_by_insurance, Decimal('70.00'))
+        self.assertEqual(summary.outstanding, Decimal('30.00'))
+
+    def test_stale_aging_is_computed_on_read(self):
+        """Test that a summary aged on an earlier day is re-aged for the response without being written."""
+        self.create_invoice(5, 25)
+        rebuild_patient_balances()
+        stale_day = timezone.now().date() - timedelta(days=10)
+        PatientBalanceSummary.objects.filter(patient_id=5).update(aged_on=stale_day, aging_0_30=0)
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.balance(5)
+
+        self.assertEqual(Decimal(data['aging_0_30']), Decimal('100.00'))
+        self.assertEqual(data['aged_on'], timezone.now().date().isoformat())
+        self.assertFalse([query for query in queries if not query['sql'].startswith('SELECT')])
+        self.assertEqual(PatientBalanceSummary.objects.get(patient_id=5).aged_on, stale_day)
+
+    def test_refresh_without_targeted_upsert(self):
+        """Test that summaries are written on backends that cannot upsert on patient_id, like MySQL."""
+        self.create_invoice(7, 5)
+        rebuild_patient_balances()
+        invoice = self.create_invoice(7, 5, total='40.00')
+
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(connection.features, 'supports_update_conflicts', False):
+            refresh_patient_balances(7, 8)
+            self.assertEqual(PatientBalanceSummary.objects.get(patient_id=7).outstanding, Decimal('140.00'))
+            self.assertEqual(PatientBalanceSummary.objects.get(patient_id=8).outstanding, Decimal('0'))
+
+            invoice.status = 'CANCELLED'
+            invoice.save()
+            self.assertEqual(rebuild_patient_balances(), 1)
+        self.assertEqual(PatientBalanceSummary.objects.get(patient_id=7).outstanding, Decimal('100.00'))
+
+    def test_patient_without_invoices(self):
+        """Test that a patient without invoices has an empty balance."""
+        data = self.balance(6)
+        self.assertEqual(Decimal(data['outstanding']), Decimal('0'))
+        self.assertFalse(PatientBalanceSummary.objects.filter(patient_id=6).exists())
+
+
+class RevenueReportTests(APITestCase):
+    """Tests for the revenue reports and their CSV export."""
+
+    def setUp(self):
+        self.policy = InsurancePolicy.objects.create(
+            patient_id=1,
+            provider_name='Insurer A',
+            policy_number='POL-A',
+            member_id='M-1',
+            valid_from=date(2024, 1, 1),
+            valid_to=date(2030, 1, 1)
+        )
+        for issue_date, status in [(date(2025, 1, 5), 'PAID'), (date(2025, 1, 20), 'PAID'),
+                                   (date(2025, 2, 3), 'PENDING_PATIENT'), (date(2025, 2, 3), 'CANCELLED')]:
+            invoice = Invoice.objects.create(
+                patient_id=1,
+                invoice_number=generate_invoice_number(issue_date),
+                issue_date=issue_date,
+                due_date=issue_date + timedelta(days=30),
+                sub_total_amount=Decimal('60.00'),
+                total_amount=Decimal('60.00'),
+                status=status
+            )
+            InvoiceItem.objects.create(invoice=invoice, item_type='CONSULTATION', description='Visit', unit_price=Decimal('40.00'))
+            InvoiceItem.objects.create(invoice=invoice, item_type='LAB_TEST', description='CBC', unit_price=Decimal('20.00'))
+            Payment.objects.create(
+                invoice=invoice,
+                patient_id=1,
+                payment_date=timezone.make_aware(datetime.combine(issue_date, datetime.min.time()).replace(hour=12)),
+                amount=Decimal('60.00'),
+                payment_method='CASH' if issue_date.day == 5 else 'CREDIT_CARD',
+                status='SUCCESS'
+            )
+            InsuranceClaim.objects.create(
+                invoice=invoice,
+                insurance_policy=self.policy,
+                submission_date=issue_date,
+                claim_amount=Decimal('50.00'),
+                approved_amount=Decimal('45.00')
+            )
+        self.url = reverse('revenue-report')
+        self.range = {'start_date': '2025-01-01', 'end_date': '2025-02-28'}
+
+    def rows(self, **params):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, dict(self.range, **params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(str(row['period']), row['group'], row['amount'], row['count']) for row in response.data['results']]
+
+    def test_monthly_by_item_type(self):
+        """Test that cancelled invoices are left out and items are summed per month."""
+        self.assertEqual(self.rows(group_by='item_type', period='month'), [
+            ('2025-01-01', 'CONSULTATION', Decimal('80.00'), 2),
+            ('2025-01-01', 'LAB_TEST', Decimal('40.00'), 2),
+            ('2025-02-01', 'CONSULTATION', Decimal('40.00'), 1),
+            ('2025-02-01', 'LAB_TEST', Decimal('20.00'), 1),
+        ])
+
+    def test_daily_by_payment_method(self):
+        """Test that payments are bucketed by the day they were made."""
+        self.assertEqual(self.rows(group_by='payment_method', period='day'), [
+            ('2025-01-05', 'CASH', Decimal('60.00'), 1),
+            ('2025-01-20', 'CREDIT_CARD', Decimal('60.00'), 1),
+            ('2025-02-03', 'CREDIT_CARD', Decimal('120.00'), 2),
+        ])
+
+    def test_monthly_by_insurer(self):
+        """Test that insurer revenue is the approved amount of claims."""
+        response = self.client.get(self.url, dict(self.range, group_by='insurer', period='month'))
+        january = response.data['results'][0]
+        self.assertEqual(january['group'], 'Insurer A')
+        self.assertEqual(january['amount'], Decimal('90.00'))
+        self.assertEqual(january['claimed_amount'], Decimal('100.00'))
+
+    def test_invalid_range(self):
+        """Test that reversed or overly long ranges are rejected."""
+        response = self.client.get(self.url, {'start_date': '2025-02-01', 'end_date': '2025-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'start_date': '2023-01-01', 'end_date': '2025-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_csv_export(self):
+        """Test that the export streams one CSV line per record."""
+        response = self.client.get(reverse('revenue-report-export'), dict(self.range, group_by='payment_method'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'payment_date,invoice_number,patient_id,payment_method,amount,transaction_id')
+        self.assertEqual(len(lines), 5)
+        self.assertIn('CASH,60.00', lines[1])
+
+
+class OverdueSweepTests(APITestCase):
+    """Tests for the overdue invoice sweeper."""
+
+    def create_invoice(self, due_date, status):
+        return Invoice.objects.create(
+            patient_id=1,
+            invoice_number=generate_invoice_number(),
+            due_date=due_date,
+            sub_total_amount=Decimal('100.00'),
+            total_amount=Decimal('100.00'),
+            amount_paid_by_patient=Decimal('25.00'),
+            status=status
+        )
+
+    def test_marks_unpaid_invoices_past_due(self):
+        """Test that only unpaid invoices due before the day become overdue."""
+        today = date(2025, 6, 1)
+        overdue = [
+            self.create_invoice(date(2025, 5, 1), 'PENDING_PATIENT'),
+            self.create_invoice(date(2025, 5, 31), 'PARTIALLY_PAID'),
+        ]
+        untouched = [
+            self.create_invoice(date(2025, 6, 1), 'PENDING_PATIENT'),
+            self.create_invoice(date(2025, 5, 1), 'PAID'),
+            self.create_invoice(date(2025, 5, 1), 'PENDING_INSURANCE'),
+        ]
+
+        with mock.patch('billing_insurance.overdue.notify_notification_service_bulk') as notify:
+            report = mark_overdue_invoices(today=today)
+
+        self.assertEqual(report['updated'], 2)
+        self.assertEqual(
+            set(Invoice.objects.filter(status='OVERDUE').values_list('id', flat=True)),
+            {invoice.id for invoice in overdue}
+        )
+        for invoice in untouched:
+            old_status = invoice.status
+            invoice.refresh_from_db()
+            self.assertEqual(invoice.status, old_status)
+
+        notify.assert_called_once()
+        notification_type, notifications = notify.call_args[0]
+        self.assertEqual(notification_type, 'INVOICE_OVERDUE')
+        self.assertEqual({item['data']['invoice_id'] for item in notifications}, {invoice.id for invoice in overdue})
+        self.assertEqual(notifications[0]['data']['amount_due'], '75.00')
+
+    def test_bounded_batches(self):
+        """Test that each batch updates at most batch_size rows with one statement."""
+        for day in range(1, 8):
+            self.create_invoice(date(2025, 5, day), 'PENDING_PATIENT')
+
+        with CaptureQueriesContext(connection) as queries:
+            report = mark_overdue_invoices(today=date(2025, 6, 1), batch_size=3, notify=False)
+
+        self.assertEqual((report['updated'], report['batches']), (7, 3))
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 3)
+
+    def test_command(self):
+        """Test that the command reports the rows updated and the throughput."""
+        self.create_invoice(date(2025, 5, 1), 'PENDING_PATIENT')
+        out = StringIO()
+        call_command('mark_overdue_invoices', '--date', '2025-06-01', '--no-notify', stdout=out)
+        self.assertIn('Marked 1 invoices overdue in 1 batches', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
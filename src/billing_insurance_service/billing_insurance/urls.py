@@ -6,6 +6,7 @@ urlpatterns = [
     path('invoices/', views.InvoiceListCreateView.as_view(), name='invoice-list-create'),
     path('invoices/<int:pk>/', views.InvoiceDetailView.as_view(), name='invoice-detail'),
     path('patients/<int:patient_id>/invoices/', views.PatientInvoiceListView.as_view(), name='patient-invoice-list'),
+    path('patients/<int:patient_id>/balance/', views.PatientBalanceView.as_view(), name='patient-balance'),
     path('invoices/<int:pk>/pay/', views.InvoicePaymentView.as_view(), name='invoice-payment'),
     
     # Insurance policy management
@@ -17,8 +18,13 @@ urlpatterns = [
     path('insurance-claims/', views.InsuranceClaimListCreateView.as_view(), name='insurance-claim-list'),
     path('insurance-claims/<int:pk>/', views.InsuranceClaimDetailView.as_view(), name='insurance-claim-detail'),
     
+    # Reports
+    path('reports/revenue/', views.RevenueReportView.as_view(), name='revenue-report'),
+    path('reports/revenue/export/', views.RevenueReportExportView.as_view(), name='revenue-report-export'),
+    
     # Internal APIs for integration with other services
     path('billing/internal/create-invoice-for-appointment/', views.CreateInvoiceForAppointmentView.as_view(), name='create-invoice-appointment'),
     path('billing/internal/create-invoice-for-medication/', views.CreateInvoiceForMedicationView.as_view(), name='create-invoice-medication'),
     path('billing/internal/create-invoice-for-labtest/', views.CreateInvoiceForLabTestView.as_view(), name='create-invoice-labtest'),
+    path('billing/internal/invoices/bulk/', views.BulkCreateInvoicesView.as_view(), name='bulk-create-invoices'),
 ] 
\ No newline at end of file
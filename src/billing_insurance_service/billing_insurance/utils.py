@@ -1,5 +1,9 @@
 import requests
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Length
+from django.utils import timezone
 from datetime import datetime, timedelta
 from rest_framework import authentication, exceptions
 from rest_framework_simplejwt.authentication import JWTAuthentication
@@ -38,38 +42,89 @@ def get_user_details(user_id, token=None):
 def notify_notification_service(notification_type, recipient_id, data, token=None):
     """
     Send notification via Notification Service.
+
+    Notification Service exposes no notification endpoints yet, so
+    notifications are only logged.
     """
     print(f"[NOTIFICATION SKIPPED] Type: {notification_type}, Recipient: {recipient_id}")
     print(f"Notification data: {data}")
-    
+
+    return True
+
+
+def notify_notification_service_bulk(notification_type, notifications, token=None):
+    """
+    Send many notifications of one type to Notification Service in a single batch.
+
+    Notification Service exposes no notification endpoints yet, so
+    notifications are only logged.
+
+    Args:
+        notification_type: Type of the notifications
+        notifications: List of dicts with `recipient_id` and `data`
+    """
+    print(f"[NOTIFICATION SKIPPED] Type: {notification_type}, Batch of {len(notifications)} notifications")
+
     return True
 
 
-def generate_invoice_number():
+def allocate_invoice_numbers(count=1, day=None):
+    """
+    Reserve a contiguous block of invoice numbers for a day.
+
+    Numbers come from the day's InvoiceSequence row, bumped with a single
+    UPDATE ... SET last_value = last_value + count. The row stays locked until
+    the caller's transaction ends, so concurrent callers get disjoint blocks
+    and a rolled back invoice gives its numbers back. The first allocation of
+    a day seeds the counter from invoices already numbered for it.
+
+    Args:
+        count: Number of invoice numbers to reserve
+        day: Issue day, defaults to today
+
+    Returns:
+        List of invoice numbers in the format INV-YYYYMMDD-XXXX
+    """
+    from .models import InvoiceSequence
+
+    day = day or timezone.localdate()
+    with transaction.atomic():
+        sequence = InvoiceSequence.objects.filter(day=day)
+        if not sequence.update(last_value=F('last_value') + count):
+            try:
+                with transaction.atomic():
+                    InvoiceSequence.objects.create(day=day, last_value=_last_invoice_sequence(day) + count)
+            except IntegrityError:
+                # Another worker created the day's row first
+                sequence.update(last_value=F('last_value') + count)
+        last_value = sequence.values_list('last_value', flat=True).get()
+
+    prefix = f"INV-{day:%Y%m%d}"
+    return [f"{prefix}-{value:04d}" for value in range(last_value - count + 1, last_value + 1)]
+
+
+def generate_invoice_number(day=None):
     """
     Generate a unique invoice number.
     Format: INV-YYYYMMDD-XXXX where XXXX is a sequential number for the day
     """
+    return allocate_invoice_numbers(1, day)[0]
+
+
+def _last_invoice_sequence(day):
+    """Highest sequence number among invoices already numbered for a day."""
     from .models import Invoice
-    
-    today = datetime.now().strftime("%Y%m%d")
-    
-    # Get latest invoice number for today
-    latest_invoice = Invoice.objects.filter(
-        invoice_number__startswith=f"INV-{today}"
-    ).order_by('-invoice_number').first()
-    
-    if latest_invoice:
-        # Extract the sequence number and increment it
-        try:
-            seq_num = int(latest_invoice.invoice_number.split('-')[-1])
-            next_seq = seq_num + 1
-        except (ValueError, IndexError):
-            next_seq = 1
-    else:
-        next_seq = 1
-    
-    return f"INV-{today}-{next_seq:04d}"
+
+    prefix = f"INV-{day:%Y%m%d}-"
+    # Numbers past 9999 are longer, so order by length before value
+    latest = Invoice.objects.filter(
+        invoice_number__startswith=prefix
+    ).order_by(Length('invoice_number').desc(), '-invoice_number').values_list('invoice_number', flat=True).first()
+
+    try:
+        return int(latest[len(prefix):]) if latest else 0
+    except ValueError:
+        return 0
 
 
 def calculate_due_date(issue_date, days=30):
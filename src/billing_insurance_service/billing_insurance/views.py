@@ -1,28 +1,51 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
-from django.db import transaction
-from django.utils import timezone
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
 from rest_framework import generics, status, permissions, views
 from rest_framework.response import Response
 
-from .models import Invoice, InvoiceItem, Payment, InsurancePolicy, InsuranceClaim
+from .models import Invoice, Payment, InsurancePolicy, InsuranceClaim, IdempotencyRecord
 from .serializers import (
     InvoiceSerializer, InvoiceItemSerializer, PaymentSerializer,
     InsurancePolicySerializer, InsuranceClaimSerializer,
-    InvoicePaymentSerializer, 
+    InvoicePaymentSerializer, PatientBalanceSummarySerializer,
     CreateInvoiceForAppointmentSerializer,
     CreateInvoiceForMedicationSerializer,
-    CreateInvoiceForLabTestSerializer
+    CreateInvoiceForLabTestSerializer,
+    BulkInvoiceCreateSerializer,
+    RevenueReportQuerySerializer
 )
-from .utils import notify_notification_service, generate_invoice_number, calculate_due_date
+from . import invoicing, reports
+from .balances import get_patient_balance, refresh_patient_balances
+from .idempotency import (
+    IdempotentMixin, get_records, header_key, is_reused, related_key, request_fingerprint
+)
+from .invoicing import create_invoices, created_response, notify_invoice_generated
+from .utils import notify_notification_service
+
+
+def invoice_queryset():
+    """
+    Invoices with every relation nested by InvoiceSerializer prefetched.
+
+    Items, payments and claims (with their insurance policy) are loaded in one
+    query each, so serializing a page of invoices costs a fixed number of queries.
+    """
+    return Invoice.objects.prefetch_related(
+        'items',
+        'payments',
+        Prefetch('claims', queryset=InsuranceClaim.objects.select_related('insurance_policy')),
+    )
 
 
 class InvoiceListCreateView(generics.ListCreateAPIView):
     """List and create invoices"""
-    queryset = Invoice.objects.all().order_by('-created_at')
     serializer_class = InvoiceSerializer
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = invoice_queryset().order_by('-created_at')
         
         # Filter by patient_id if provided
         patient_id = self.request.query_params.get('patient_id')
@@ -39,9 +62,14 @@ class InvoiceListCreateView(generics.ListCreateAPIView):
 
 class InvoiceDetailView(generics.RetrieveUpdateAPIView):
     """Retrieve or update an invoice"""
-    queryset = Invoice.objects.all()
+    queryset = invoice_queryset()
     serializer_class = InvoiceSerializer
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        invoice = serializer.save()
+        refresh_patient_balances(invoice.patient_id)
+
 
 class PatientInvoiceListView(generics.ListAPIView):
     """List invoices for a specific patient"""
@@ -49,7 +77,14 @@ class PatientInvoiceListView(generics.ListAPIView):
     
     def get_queryset(self):
         patient_id = self.kwargs['patient_id']
-        return Invoice.objects.filter(patient_id=patient_id).order_by('-created_at')
+        return invoice_queryset().filter(patient_id=patient_id).order_by('-created_at')
+
+
+class PatientBalanceView(views.APIView):
+    """Outstanding balance and receivables aging of a patient"""
+    def get(self, request, patient_id):
+        summary = get_patient_balance(patient_id)
+        return Response(PatientBalanceSummarySerializer(summary).data)
 
 
 class InvoicePaymentView(views.APIView):
@@ -108,6 +143,7 @@ class InvoicePaymentView(views.APIView):
             invoice.status = 'PARTIALLY_PAID'
             
         invoice.save()
+        refresh_patient_balances(invoice.patient_id)
         
         # Notify patient about successful payment
         notify_notification_service(
@@ -156,9 +192,10 @@ class InsuranceClaimListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         # Filter by invoice_id if provided
         invoice_id = self.request.query_params.get('invoice_id')
+        queryset = InsuranceClaim.objects.select_related('insurance_policy')
         if invoice_id:
-            return InsuranceClaim.objects.filter(invoice_id=invoice_id).order_by('-created_at')
-        return InsuranceClaim.objects.all().order_by('-created_at')
+            return queryset.filter(invoice_id=invoice_id).order_by('-created_at')
+        return queryset.order_by('-created_at')
     
     @transaction.atomic    
     def perform_create(self, serializer):
@@ -186,7 +223,7 @@ class InsuranceClaimListCreateView(generics.ListCreateAPIView):
 
 class InsuranceClaimDetailView(generics.RetrieveUpdateAPIView):
     """Retrieve or update an insurance claim"""
-    queryset = InsuranceClaim.objects.all()
+    queryset = InsuranceClaim.objects.select_related('insurance_policy')
     serializer_class = InsuranceClaimSerializer
     
     @transaction.atomic
@@ -220,6 +257,7 @@ class InsuranceClaimDetailView(generics.RetrieveUpdateAPIView):
                     invoice.status = 'PARTIALLY_PAID'
                     
                 invoice.save()
+                refresh_patient_balances(invoice.patient_id)
                 
                 # Notify patient about claim approval
                 notify_notification_service(
@@ -235,180 +273,267 @@ class InsuranceClaimDetailView(generics.RetrieveUpdateAPIView):
                 )
 
 
+class RevenueReportView(views.APIView):
+    """Revenue per day or month, broken down by item type, payment method or insurer"""
+    def get(self, request):
+        serializer = RevenueReportQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        params = serializer.validated_data
+        rows = reports.revenue_report(
+            params['group_by'], params['period'], params['start_date'], params['end_date']
+        )
+        return Response({
+            "group_by": params['group_by'],
+            "period": params['period'],
+            "start_date": params['start_date'],
+            "end_date": params['end_date'],
+            "results": list(rows)
+        })
+
+
+class RevenueReportExportView(views.APIView):
+    """Stream the records behind a revenue report as CSV"""
+    def get(self, request):
+        serializer = RevenueReportQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        params = serializer.validated_data
+        response = StreamingHttpResponse(
+            reports.export_revenue_rows(params['group_by'], params['start_date'], params['end_date']),
+            content_type='text/csv'
+        )
+        filename = f"revenue-{params['group_by']}-{params['start_date']}-{params['end_date']}.csv"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
 # Internal API endpoints
-class CreateInvoiceForAppointmentView(views.APIView):
+class CreateInvoiceForAppointmentView(IdempotentMixin, views.APIView):
     """Internal API to create invoice for an appointment"""
-    @transaction.atomic
+    idempotency_scope = invoicing.IDEMPOTENCY_SCOPES[invoicing.APPOINTMENT]
+    idempotency_related_field = invoicing.RELATED_FIELDS[invoicing.APPOINTMENT]
+
     def post(self, request):
+        return self.run_idempotent(request, self.create_invoice)
+
+    def create_invoice(self, request):
         serializer = CreateInvoiceForAppointmentSerializer(data=request.data)
         
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
-        # Extract data
-        appointment_id = serializer.validated_data['appointment_id']
-        patient_id = serializer.validated_data['patient_id']
-        doctor_id = serializer.validated_data['doctor_id']
-        service_description = serializer.validated_data['service_description']
-        amount = serializer.validated_data['amount']
-        
-        # Create invoice
-        invoice = Invoice.objects.create(
-            patient_id=patient_id,
-            invoice_number=generate_invoice_number(),
-            issue_date=timezone.now().date(),
-            due_date=calculate_due_date(timezone.now().date()),
-            sub_total_amount=amount,
-            total_amount=amount,  # No tax/discount for simplicity
-            status='PENDING_PATIENT',
-            related_appointment_id=appointment_id
-        )
-        
-        # Add invoice item
-        invoice_item = InvoiceItem.objects.create(
-            invoice=invoice,
-            item_type='CONSULTATION',
-            description=service_description,
-            quantity=1,
-            unit_price=amount,
-            total_price=amount
-        )
+        invoice = create_invoices([(invoicing.APPOINTMENT, serializer.validated_data)])[0]
         
-        # Notify patient about new invoice
-        notify_notification_service(
-            notification_type='INVOICE_GENERATED',
-            recipient_id=patient_id,
-            data={
-                "invoice_number": invoice.invoice_number,
-                "amount": str(amount),
-                "due_date": invoice.due_date.strftime("%Y-%m-%d"),
-                "service": service_description
-            },
-            token=request.auth
-        )
+        # Notify once committed, so the day's invoice sequence is not held locked meanwhile
+        service_description = serializer.validated_data['service_description']
+        transaction.on_commit(lambda: notify_invoice_generated(invoice, service_description, request.auth))
         
-        return Response({
-            "detail": "Invoice created successfully for appointment.",
-            "invoice_id": invoice.id,
-            "invoice_number": invoice.invoice_number
-        }, status=status.HTTP_201_CREATED)
+        return Response(created_response(invoicing.APPOINTMENT, invoice), status=status.HTTP_201_CREATED)
 
 
-class CreateInvoiceForMedicationView(views.APIView):
+class CreateInvoiceForMedicationView(IdempotentMixin, views.APIView):
     """Internal API to create invoice for medication dispensed"""
-    @transaction.atomic
+    idempotency_scope = invoicing.IDEMPOTENCY_SCOPES[invoicing.MEDICATION]
+    idempotency_related_field = invoicing.RELATED_FIELDS[invoicing.MEDICATION]
+
     def post(self, request):
+        return self.run_idempotent(request, self.create_invoice)
+
+    def create_invoice(self, request):
         serializer = CreateInvoiceForMedicationSerializer(data=request.data)
         
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
-        # Extract data
-        dispense_log_id = serializer.validated_data['dispense_log_id']
-        patient_id = serializer.validated_data['patient_id']
-        items = serializer.validated_data['items']
-        
-        # Calculate total amount
-        total_amount = sum(float(item.get('total_price', 0)) for item in items)
-        
-        # Create invoice
-        invoice = Invoice.objects.create(
-            patient_id=patient_id,
-            invoice_number=generate_invoice_number(),
-            issue_date=timezone.now().date(),
-            due_date=calculate_due_date(timezone.now().date()),
-            sub_total_amount=total_amount,
-            total_amount=total_amount,  # No tax/discount for simplicity
-            status='PENDING_PATIENT',
-            related_prescription_dispense_id=dispense_log_id
-        )
+        invoice = create_invoices([(invoicing.MEDICATION, serializer.validated_data)])[0]
         
-        # Add invoice items
-        for item in items:
-            InvoiceItem.objects.create(
-                invoice=invoice,
-                item_type='MEDICATION',
-                description=item.get('medication_name', 'Medication'),
-                quantity=item.get('quantity', 1),
-                unit_price=item.get('unit_price', 0),
-                total_price=item.get('total_price', 0)
-            )
+        # Notify once committed, so the day's invoice sequence is not held locked meanwhile
+        transaction.on_commit(lambda: notify_invoice_generated(invoice, "Medication", request.auth))
         
-        # Notify patient about new invoice
-        notify_notification_service(
-            notification_type='INVOICE_GENERATED',
-            recipient_id=patient_id,
-            data={
-                "invoice_number": invoice.invoice_number,
-                "amount": str(total_amount),
-                "due_date": invoice.due_date.strftime("%Y-%m-%d"),
-                "service": "Medication"
-            },
-            token=request.auth
-        )
-        
-        return Response({
-            "detail": "Invoice created successfully for medication.",
-            "invoice_id": invoice.id,
-            "invoice_number": invoice.invoice_number
-        }, status=status.HTTP_201_CREATED)
+        return Response(created_response(invoicing.MEDICATION, invoice), status=status.HTTP_201_CREATED)
 
 
-class CreateInvoiceForLabTestView(views.APIView):
+class CreateInvoiceForLabTestView(IdempotentMixin, views.APIView):
     """Internal API to create invoice for lab tests"""
-    @transaction.atomic
+    idempotency_scope = invoicing.IDEMPOTENCY_SCOPES[invoicing.LAB_TEST]
+    idempotency_related_field = invoicing.RELATED_FIELDS[invoicing.LAB_TEST]
+
     def post(self, request):
+        return self.run_idempotent(request, self.create_invoice)
+
+    def create_invoice(self, request):
         serializer = CreateInvoiceForLabTestSerializer(data=request.data)
         
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
-        # Extract data
-        lab_order_id = serializer.validated_data['lab_order_id']
-        patient_id = serializer.validated_data['patient_id']
-        items = serializer.validated_data['items']
+        invoice = create_invoices([(invoicing.LAB_TEST, serializer.validated_data)])[0]
         
-        # Calculate total amount
-        total_amount = sum(float(item.get('price', 0)) for item in items)
+        # Notify once committed, so the day's invoice sequence is not held locked meanwhile
+        transaction.on_commit(lambda: notify_invoice_generated(invoice, "Laboratory Tests", request.auth))
         
-        # Create invoice
-        invoice = Invoice.objects.create(
-            patient_id=patient_id,
-            invoice_number=generate_invoice_number(),
-            issue_date=timezone.now().date(),
-            due_date=calculate_due_date(timezone.now().date()),
-            sub_total_amount=total_amount,
-            total_amount=total_amount,  # No tax/discount for simplicity
-            status='PENDING_PATIENT',
-            related_lab_order_id=lab_order_id
+        return Response(created_response(invoicing.LAB_TEST, invoice), status=status.HTTP_201_CREATED)
+
+
+class BulkCreateInvoicesView(views.APIView):
+    """
+    Internal API to create many invoices in one call, e.g. for end-of-day settlement.
+
+    Each spec carries an invoice_type, an idempotency_key echoed back in its
+    result, and the fields of the matching single-invoice endpoint. Valid specs
+    are created in chunks of BILLING_BULK_INVOICE_CHUNK_SIZE, one transaction
+    and one block of invoice numbers per chunk. Invalid specs are reported
+    without failing the others, and specs whose key was already used replay
+    their earlier result, unless the key was used for another spec.
+    """
+    spec_serializers = {
+        invoicing.APPOINTMENT: CreateInvoiceForAppointmentSerializer,
+        invoicing.MEDICATION: CreateInvoiceForMedicationSerializer,
+        invoicing.LAB_TEST: CreateInvoiceForLabTestSerializer,
+    }
+    services = {
+        invoicing.MEDICATION: "Medication",
+        invoicing.LAB_TEST: "Laboratory Tests",
+    }
+    idempotency_scope = 'bulk-invoices'
+
+    def spec_keys(self, spec):
+        """
+        Return the idempotency keys of a spec: its own key, scoped to this
+        endpoint, and the ID of the object it bills, scoped like the matching
+        single-invoice endpoint so both endpoints deduplicate each other.
+        """
+        result, invoice_type, data = spec
+        return (
+            (self.idempotency_scope, header_key(result['idempotency_key'])),
+            (
+                invoicing.IDEMPOTENCY_SCOPES[invoice_type],
+                related_key(data[invoicing.RELATED_FIELDS[invoice_type]])
+            ),
         )
-        
-        # Add invoice items
-        for item in items:
-            InvoiceItem.objects.create(
-                invoice=invoice,
-                item_type='LAB_TEST',
-                description=item.get('test_name', 'Laboratory Test'),
-                quantity=1,
-                unit_price=item.get('price', 0),
-                total_price=item.get('price', 0)
-            )
-        
-        # Notify patient about new invoice
-        notify_notification_service(
-            notification_type='INVOICE_GENERATED',
-            recipient_id=patient_id,
-            data={
-                "invoice_number": invoice.invoice_number,
-                "amount": str(total_amount),
-                "due_date": invoice.due_date.strftime("%Y-%m-%d"),
-                "service": "Laboratory Tests"
-            },
-            token=request.auth
+
+    def spec_hash(self, spec):
+        """Return the fingerprint of a spec, stored with its own key."""
+        _, invoice_type, data = spec
+        return request_fingerprint(
+            self.request.method, self.request.path, {'invoice_type': invoice_type, 'data': data}
         )
-        
+
+    def create_chunk(self, chunk, notify, token):
+        """
+        Create the invoices of a chunk of specs in one transaction.
+
+        Specs whose key was already used, or whose object was already invoiced
+        through either endpoint, get the stored result back instead, and specs
+        reusing a key for other data are marked invalid. Both keys of the new
+        invoices are recorded together with them.
+        """
+        for attempt in range(2):
+            records = get_records([pair for spec in chunk for pair in self.spec_keys(spec)])
+            pending = []
+            for spec in chunk:
+                own_key, object_key = self.spec_keys(spec)
+                if own_key in records and is_reused(records[own_key], self.spec_hash(spec)):
+                    spec[0].update(status="invalid", errors={
+                        "idempotency_key": ["This key was already used for a different invoice."]
+                    })
+                elif own_key in records:
+                    spec[0].update(records[own_key].response, replayed=True)
+                elif object_key in records:
+                    stored = records[object_key].response
+                    spec[0].update(
+                        status="created",
+                        invoice_id=stored['invoice_id'],
+                        invoice_number=stored['invoice_number'],
+                        replayed=True
+                    )
+                else:
+                    pending.append(spec)
+            if not pending:
+                return
+
+            try:
+                with transaction.atomic():
+                    invoices = create_invoices([(invoice_type, data) for _, invoice_type, data in pending])
+                    created = [
+                        dict(result, status="created", invoice_id=invoice.id, invoice_number=invoice.invoice_number)
+                        for (result, _, _), invoice in zip(pending, invoices)
+                    ]
+                    new_records = []
+                    for spec, invoice, result in zip(pending, invoices, created):
+                        (own_scope, own_key), (object_scope, object_key) = self.spec_keys(spec)
+                        new_records.append(IdempotencyRecord(
+                            scope=own_scope,
+                            key=own_key,
+                            status_code=status.HTTP_201_CREATED,
+                            response=result,
+                            request_hash=self.spec_hash(spec)
+                        ))
+                        new_records.append(IdempotencyRecord(
+                            scope=object_scope,
+                            key=object_key,
+                            status_code=status.HTTP_201_CREATED,
+                            response=created_response(spec[1], invoice)
+                        ))
+                    IdempotencyRecord.objects.bulk_create(new_records)
+            except IntegrityError:
+                # A concurrent request used some of these keys, replay them on the retry
+                if attempt:
+                    raise
+                continue
+
+            for (result, invoice_type, data), invoice, created_result in zip(pending, invoices, created):
+                result.update(created_result)
+                if notify:
+                    service = self.services.get(invoice_type) or data['service_description']
+                    notify_invoice_generated(invoice, service, token)
+            return
+
+    def post(self, request):
+        serializer = BulkInvoiceCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        valid = []
+        billed = set()
+        for spec in serializer.validated_data['invoices']:
+            result = {
+                "idempotency_key": spec['idempotency_key'],
+                "invoice_type": spec['invoice_type'],
+            }
+            results.append(result)
+            spec_serializer = self.spec_serializers[spec['invoice_type']](data=spec['data'])
+            related_field = invoicing.RELATED_FIELDS[spec['invoice_type']]
+            if spec_serializer.is_valid():
+                related = (spec['invoice_type'], str(spec_serializer.validated_data[related_field]))
+                if related in billed:
+                    result.update(status="invalid", errors={
+                        related_field: ["Another invoice in this request is for the same object."]
+                    })
+                    continue
+                billed.add(related)
+                valid.append((result, spec['invoice_type'], spec_serializer.validated_data))
+            else:
+                result.update(status="invalid", errors=spec_serializer.errors)
+
+        chunk_size = getattr(settings, 'BILLING_BULK_INVOICE_CHUNK_SIZE', 500)
+        notify = serializer.validated_data['notify']
+        for start in range(0, len(valid), chunk_size):
+            self.create_chunk(valid[start:start + chunk_size], notify, request.auth)
+
+        created = sum(1 for result in results if result['status'] == "created")
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
         return Response({
-            "detail": "Invoice created successfully for lab tests.",
-            "invoice_id": invoice.id,
-            "invoice_number": invoice.invoice_number
-        }, status=status.HTTP_201_CREATED)
+            "created": created,
+            "failed": len(results) - created,
+            "results": results
+        }, status=response_status)
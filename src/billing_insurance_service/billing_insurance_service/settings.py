@@ -140,6 +140,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'billing_insurance.pagination.KeysetPagination',
+    'PAGE_SIZE': 20
 }
 
 # JWT settings
@@ -154,3 +156,13 @@ SIMPLE_JWT = {
 # Service URLs
 USER_SERVICE_URL = os.environ.get('USER_SERVICE_URL', 'http://localhost:8000/api/v1')
 NOTIFICATION_SERVICE_URL = ""
+
+# Bulk internal invoice creation: specs accepted per request and invoices inserted per transaction
+BILLING_BULK_INVOICE_MAX_SPECS = int(os.environ.get('BILLING_BULK_INVOICE_MAX_SPECS', 5000))
+BILLING_BULK_INVOICE_CHUNK_SIZE = int(os.environ.get('BILLING_BULK_INVOICE_CHUNK_SIZE', 500))
+
+# Hours an Idempotency-Key is remembered, expired records are removed by purge_idempotency_records
+BILLING_IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('BILLING_IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+# Longest date range, in days, a revenue report or export may span
+BILLING_REPORT_MAX_DAYS = int(os.environ.get('BILLING_REPORT_MAX_DAYS', 366))
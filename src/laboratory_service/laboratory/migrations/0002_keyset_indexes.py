@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-16 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboratory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='laborder',
+            index=models.Index(fields=['created_at', 'id'], name='laboratory__created_e4f4f4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='laborder',
+            index=models.Index(fields=['patient_id', 'created_at', 'id'], name='laboratory__patient_4b5e18_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='laborderitem',
+            index=models.Index(fields=['created_at', 'id'], name='laboratory__created_f2775d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='labresult',
+            index=models.Index(fields=['created_at', 'id'], name='laboratory__created_c3b8dd_idx'),
+        ),
+    ]
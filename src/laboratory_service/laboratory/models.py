@@ -58,6 +58,11 @@ class LabOrder(models.Model):
     class Meta:
         verbose_name = "Lab Order"
         verbose_name_plural = "Lab Orders"
+        indexes = [
+            # Keyset pagination on (created_at, id), overall and per patient
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['patient_id', 'created_at', 'id']),
+        ]
 
 
 class LabOrderItem(models.Model):
@@ -84,6 +89,9 @@ class LabOrderItem(models.Model):
     class Meta:
         verbose_name = "Lab Order Item"
         verbose_name_plural = "Lab Order Items"
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
 
 
 class LabResult(models.Model):
@@ -108,6 +116,9 @@ class LabResult(models.Model):
     class Meta:
         verbose_name = "Lab Result"
         verbose_name_plural = "Lab Results"
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
 
 
 class TestNormalRange(models.Model):
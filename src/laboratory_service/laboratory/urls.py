@@ -6,7 +6,8 @@ from .views import (
     LabOrderViewSet,
     LabOrderItemViewSet,
     LabResultViewSet,
-    TestNormalRangeViewSet
+    TestNormalRangeViewSet,
+    UserCacheStatsView
 )
 
 router = DefaultRouter()
@@ -18,4 +19,5 @@ router.register(r'test-normal-ranges', TestNormalRangeViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('internal/user-cache/stats/', UserCacheStatsView.as_view(), name='user-cache-stats'),
 ] 
\ No newline at end of file
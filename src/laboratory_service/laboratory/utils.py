@@ -3,6 +3,9 @@ from django.conf import settings
 from rest_framework import authentication, exceptions
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from . import http_client
+from .user_cache import PROFILE_KEY, user_cache
+
 
 class CustomJWTAuthentication(JWTAuthentication):
     """
@@ -23,21 +26,27 @@ class CustomJWTAuthentication(JWTAuthentication):
 
 def get_user_details(user_id, token=None):
     """
-    Get user details from User Service.
+    Get user details from User Service, served from the user cache when possible.
     """
+    user = user_cache.get(PROFILE_KEY, user_id)
+    if user is not None:
+        return user
+
     headers = {}
     if token:
         headers['Authorization'] = f'Bearer {token}'
     
     try:
-        response = requests.get(
+        response = http_client.get(
             f"{settings.USER_SERVICE_URL}/users/{user_id}/",
             headers=headers
         )
         
         if response.status_code == 200:
-            return response.json()
+            user = response.json()
+            user_cache.set(PROFILE_KEY, user_id, user)
+            return user
         else:
             return None
     except requests.RequestException:
-        return None 
\ No newline at end of file
+        return None
@@ -2,6 +2,7 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions, status, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 
 from .models import TestCatalog, LabOrder, LabOrderItem, LabResult, TestNormalRange
@@ -14,6 +15,7 @@ from .serializers import (
     LabResultCreateSerializer,
     TestNormalRangeSerializer
 )
+from .user_cache import user_cache
 from .utils import CustomJWTAuthentication, get_user_details
 
 
@@ -185,13 +187,24 @@ class LabResultViewSet(viewsets.ModelViewSet):
                 lab_order_item__status='COMPLETED'
             )
         
-        serializer = LabResultSerializer(lab_results, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(lab_results)
+        serializer = LabResultSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class TestNormalRangeViewSet(viewsets.ModelViewSet):
     """ViewSet cho khoảng tham chiếu xét nghiệm."""
     queryset = TestNormalRange.objects.all()
     serializer_class = TestNormalRangeSerializer
+    ordering = ('test', 'parameter_name', 'id')
+    authentication_classes = [CustomJWTAuthentication]
+    permission_classes = [permissions.AllowAny]
+
+
+class UserCacheStatsView(APIView):
+    """Hit/miss counters of this process's user details cache, for sizing it."""
     authentication_classes = [CustomJWTAuthentication]
     permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        return Response(user_cache.stats())
@@ -139,6 +139,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'laboratory.pagination.KeysetPagination',
+    'PAGE_SIZE': 20
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
@@ -154,3 +156,37 @@ SIMPLE_JWT = {
 
 # User Service URL
 USER_SERVICE_URL = os.environ.get('USER_SERVICE_URL', 'http://localhost:8000/api/v1')
+
+# Inter-service HTTP client: timeouts in seconds, retries apply to idempotent calls only
+SERVICE_HTTP_CONNECT_TIMEOUT = float(os.environ.get('SERVICE_HTTP_CONNECT_TIMEOUT', 1.0))
+SERVICE_HTTP_READ_TIMEOUT = float(os.environ.get('SERVICE_HTTP_READ_TIMEOUT', 5.0))
+SERVICE_HTTP_MAX_RETRIES = int(os.environ.get('SERVICE_HTTP_MAX_RETRIES', 2))
+SERVICE_HTTP_BACKOFF = float(os.environ.get('SERVICE_HTTP_BACKOFF', 0.1))
+SERVICE_HTTP_POOL_SIZE = int(os.environ.get('SERVICE_HTTP_POOL_SIZE', 20))
+SERVICE_HTTP_CIRCUIT_THRESHOLD = int(os.environ.get('SERVICE_HTTP_CIRCUIT_THRESHOLD', 5))
+SERVICE_HTTP_CIRCUIT_RESET = int(os.environ.get('SERVICE_HTTP_CIRCUIT_RESET', 30))
+
+# Cache shared by the services: Redis when REDIS_URL is set, e.g. redis://redis:6379/0
+# for the redis service of docker-compose.yml. Without it every process has its
+# own LocMemCache and never sees the User Service's invalidations, so cached user
+# details are only kept for a few seconds.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# User details cache: in-process LRU in front of the shared cache, TTLs in seconds
+USER_CACHE_MAXSIZE = int(os.environ.get('USER_CACHE_MAXSIZE', 2048))
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60 if REDIS_URL else 5))
+USER_CACHE_SHARED_TTL = int(os.environ.get('USER_CACHE_SHARED_TTL', 600 if REDIS_URL else 5))
+USER_CACHE_SYNC_INTERVAL = int(os.environ.get('USER_CACHE_SYNC_INTERVAL', 5))
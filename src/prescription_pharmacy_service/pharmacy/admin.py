@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     Medication, Prescription, PrescriptionItem, 
-    PharmacyStock, BatchExpiry, DispenseLog, DispenseItem
+    PharmacyStock, BatchExpiry, DispenseLog, DispenseItem, StockAlert
 )
 
 @admin.register(Medication)
@@ -46,3 +46,9 @@ class DispenseLogAdmin(admin.ModelAdmin):
     list_display = ['id', 'prescription', 'pharmacist_name', 'date_dispensed', 'payment_status']
     list_filter = ['payment_status', 'date_dispensed']
     inlines = [DispenseItemInline]
+
+
+@admin.register(StockAlert)
+class StockAlertAdmin(admin.ModelAdmin):
+    list_display = ['alert_type', 'object_id', 'raised_at', 'evaluated_at', 'notified_at']
+    list_filter = ['alert_type']
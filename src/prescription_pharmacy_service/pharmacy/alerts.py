@@ -0,0 +1,154 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, IntegerField, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BatchExpiry, PharmacyStock, StockAlert
+from .utils import notify_notification_service_bulk
+
+LOW_STOCK = 'LOW_STOCK'
+EXPIRING_BATCH = 'EXPIRING_BATCH'
+
+
+def low_stock(today):
+    """
+    Medications at or below their reorder level, in one aggregate query.
+
+    Expired batches cannot be dispensed, so a medication is also low when its
+    non-expired batches no longer cover the reorder level.
+    """
+    usable = Coalesce(
+        Sum('batches__quantity', filter=Q(batches__expiry_date__gte=today)),
+        Value(0),
+        output_field=IntegerField()
+    )
+    return list(PharmacyStock.objects.annotate(usable_quantity=usable).filter(
+        Q(quantity_on_hand__lte=F('reorder_level')) | Q(usable_quantity__lte=F('reorder_level'))
+    ).values(
+        'id', 'medication_id', 'quantity_on_hand', 'usable_quantity', 'reorder_level',
+        medication_code=F('medication__medication_code'),
+        medication_name=F('medication__name'),
+    ).order_by('id'))
+
+
+def expiring_batches(today, within_days):
+    """
+    Batches still holding stock that expire within `within_days` days or have expired.
+    """
+    return list(BatchExpiry.objects.filter(
+        quantity__gt=0, expiry_date__lte=today + timedelta(days=within_days)
+    ).values(
+        'id', 'pharmacy_stock_id', 'batch_number', 'quantity', 'expiry_date',
+        medication_code=F('pharmacy_stock__medication__medication_code'),
+        medication_name=F('pharmacy_stock__medication__name'),
+    ).order_by('expiry_date', 'id'))
+
+
+def _payload(alert):
+    return {key: value.isoformat() if isinstance(value, date) else value for key, value in alert.items()}
+
+
+def evaluate_alerts(today=None, within_days=None, batch_size=500):
+    """
+    Evaluate the stock alerts and store them in StockAlert for every process to read.
+
+    New alerts are inserted unnotified, raised ones get their details
+    refreshed, and cleared ones are deleted, so an alert that comes back is
+    notified again.
+
+    Args:
+        today: Day stock is evaluated on, defaults to today
+        within_days: Expiry window in days, defaults to PHARMACY_ALERT_EXPIRY_DAYS
+        batch_size: Number of alerts written per statement
+
+    Returns:
+        Dict with the evaluation time and date, the expiry window, the
+        low_stock and expiring_batches alerts, and the number of alerts
+        raised and cleared by this evaluation
+    """
+    now = timezone.now()
+    today = today or now.date()
+    if within_days is None:
+        within_days = getattr(settings, 'PHARMACY_ALERT_EXPIRY_DAYS', 30)
+
+    alerts = {
+        'evaluated_at': now,
+        'as_of': today,
+        'expiry_window_days': within_days,
+        'low_stock': low_stock(today),
+        'expiring_batches': expiring_batches(today, within_days),
+    }
+    current = {
+        **{(LOW_STOCK, alert['id']): _payload(alert) for alert in alerts['low_stock']},
+        **{(EXPIRING_BATCH, alert['id']): _payload(alert) for alert in alerts['expiring_batches']},
+    }
+
+    with transaction.atomic():
+        stored = {
+            (alert_type, object_id): pk
+            for pk, alert_type, object_id in StockAlert.objects.values_list('id', 'alert_type', 'object_id')
+        }
+        cleared = [pk for key, pk in stored.items() if key not in current]
+        for start in range(0, len(cleared), batch_size):
+            StockAlert.objects.filter(pk__in=cleared[start:start + batch_size]).delete()
+
+        StockAlert.objects.bulk_create([
+            StockAlert(alert_type=alert_type, object_id=object_id, data=data, raised_at=now, evaluated_at=now)
+            for (alert_type, object_id), data in current.items()
+            if (alert_type, object_id) not in stored
+        ], batch_size=batch_size)
+        StockAlert.objects.bulk_update([
+            StockAlert(pk=stored[key], data=data, evaluated_at=now)
+            for key, data in current.items()
+            if key in stored
+        ], ['data', 'evaluated_at'], batch_size=batch_size)
+
+    alerts['raised'] = len(current.keys() - stored.keys())
+    alerts['cleared'] = len(cleared)
+    return alerts
+
+
+def get_alerts():
+    """
+    Return the stored stock alerts of the latest evaluation, without evaluating them.
+    """
+    alerts = {LOW_STOCK: [], EXPIRING_BATCH: []}
+    for alert_type, data in StockAlert.objects.order_by('id').values_list('alert_type', 'data'):
+        alerts[alert_type].append(data)
+    alerts[EXPIRING_BATCH].sort(key=lambda alert: (alert['expiry_date'], alert['id']))
+    alerts[LOW_STOCK].sort(key=lambda alert: alert['id'])
+    return {
+        'evaluated_at': StockAlert.objects.aggregate(evaluated_at=Max('evaluated_at'))['evaluated_at'],
+        'low_stock': alerts[LOW_STOCK],
+        'expiring_batches': alerts[EXPIRING_BATCH],
+    }
+
+
+def notify_alerts(batch_size=None):
+    """
+    Push the stored alerts not notified yet to Notification Service.
+
+    Alerts are marked notified batch by batch once sent, so a failed batch is
+    retried by the next run and nothing is notified twice while it stays raised.
+
+    Returns:
+        Number of notifications sent
+    """
+    batch_size = batch_size or getattr(settings, 'PHARMACY_ALERT_NOTIFY_BATCH_SIZE', 500)
+    pending = list(StockAlert.objects.filter(notified_at__isnull=True).order_by('alert_type', 'id').values_list(
+        'id', 'alert_type', 'data'
+    ))
+
+    sent = 0
+    for notification_type in (LOW_STOCK, EXPIRING_BATCH):
+        alerts = [(pk, data) for pk, alert_type, data in pending if alert_type == notification_type]
+        for start in range(0, len(alerts), batch_size):
+            batch = alerts[start:start + batch_size]
+            notifications = [{'recipient_role': 'PHARMACIST', 'data': data} for _, data in batch]
+            if notify_notification_service_bulk(notification_type, notifications):
+                StockAlert.objects.filter(pk__in=[pk for pk, _ in batch]).update(notified_at=timezone.now())
+                sent += len(batch)
+    return sent
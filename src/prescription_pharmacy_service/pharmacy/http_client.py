@@ -0,0 +1,171 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+# Upstream statuses worth retrying, usually a restarting service behind nginx
+RETRY_STATUS_CODES = {502, 503, 504}
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised when calls to a downstream service are short-circuited."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one downstream host.
+
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds, then lets a single trial call through.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Half-open: re-arm the timer so only one trial call goes through
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class ServiceClient:
+    """
+    Pooled, keep-alive HTTP client for calls to other services.
+
+    Connections are reused through per-host pools, every call has connect and
+    read timeouts, idempotent calls are retried with jittered exponential
+    backoff and each downstream host has its own circuit breaker.
+    """
+
+    def __init__(self, connect_timeout=1.0, read_timeout=5.0, max_retries=2,
+                 backoff=0.1, max_backoff=2.0, pool_size=20,
+                 failure_threshold=5, reset_timeout=30):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, idempotent=None, **kwargs):
+        """
+        Send a request to another service.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL of the downstream endpoint
+            idempotent: Whether the call may be retried, defaults to True for
+                idempotent HTTP methods only
+
+        Raises:
+            requests.RequestException: On connection errors, timeouts or an open circuit
+        """
+        host = urlsplit(url).netloc
+        breaker = self._breaker(host)
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"Circuit open for {host}")
+
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempts = 1 + (self.max_retries if idempotent else 0)
+        kwargs.setdefault('timeout', self.timeout)
+
+        for attempt in range(attempts):
+            is_last_attempt = attempt + 1 >= attempts
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                breaker.record_failure()
+                if is_last_attempt:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                if is_last_attempt:
+                    return response
+
+            time.sleep(self._backoff_delay(attempt))
+
+    def _breaker(self, host):
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._breakers[host] = breaker
+            return breaker
+
+    def _backoff_delay(self, attempt):
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide client, configured from the SERVICE_HTTP_* settings."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ServiceClient(
+                    connect_timeout=getattr(settings, 'SERVICE_HTTP_CONNECT_TIMEOUT', 1.0),
+                    read_timeout=getattr(settings, 'SERVICE_HTTP_READ_TIMEOUT', 5.0),
+                    max_retries=getattr(settings, 'SERVICE_HTTP_MAX_RETRIES', 2),
+                    backoff=getattr(settings, 'SERVICE_HTTP_BACKOFF', 0.1),
+                    pool_size=getattr(settings, 'SERVICE_HTTP_POOL_SIZE', 20),
+                    failure_threshold=getattr(settings, 'SERVICE_HTTP_CIRCUIT_THRESHOLD', 5),
+                    reset_timeout=getattr(settings, 'SERVICE_HTTP_CIRCUIT_RESET', 30),
+                )
+    return _client
+
+
+def get(url, **kwargs):
+    return get_client().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return get_client().post(url, **kwargs)
@@ -0,0 +1,239 @@
+from collections import defaultdict
+
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+from rest_framework import status
+
+from .models import BatchExpiry, DispenseItem, DispenseLog, PharmacyStock, PrescriptionItem
+
+# Prescriptions that medications can be dispensed for
+DISPENSABLE_STATUSES = ['VERIFIED', 'DISPENSED_PARTIAL']
+
+
+class DispenseError(Exception):
+    """Raised when a dispense cannot be applied, its transaction must be rolled back."""
+
+    def __init__(self, detail, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def _conditional_increment(queryset, field, amounts, condition):
+    """
+    Add per-row amounts to a column with one UPDATE, only where `condition` holds.
+
+    Args:
+        queryset: Rows to update, keyed by `amounts`
+        field: Name of the integer column to change
+        amounts: Dict mapping primary key to the (possibly negative) amount to add
+        condition: Function of (pk, amount) returning the Q a row must match
+
+    Returns:
+        Number of rows updated
+    """
+    delta = Case(
+        *[When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()],
+        output_field=IntegerField()
+    )
+    match = Q()
+    for pk, amount in amounts.items():
+        match |= Q(pk=pk) & condition(pk, amount)
+    return queryset.filter(match).update(**{field: F(field) + delta})
+
+
+def _plan_batches(demand, today):
+    """
+    Split the quantity needed of each stock across its batches, first expiry first out.
+
+    Non-expired batches are read in (pharmacy_stock, expiry_date) index order
+    with SELECT ... FOR UPDATE. A locking read sees the latest committed
+    quantities, even under REPEATABLE READ, and keeps them until the
+    transaction ends. Rows are consumed only until every demand is covered.
+
+    Returns:
+        Tuple of (dict mapping stock ID to a list of (batch, quantity) slices,
+        dict mapping stock ID to the quantity batches could not cover)
+    """
+    batches = BatchExpiry.objects.select_for_update().filter(
+        pharmacy_stock_id__in=demand, expiry_date__gte=today, quantity__gt=0
+    ).only(
+        'id', 'pharmacy_stock_id', 'batch_number', 'quantity', 'expiry_date'
+    ).order_by('pharmacy_stock_id', 'expiry_date', 'id')
+
+    remaining = dict(demand)
+    uncovered = len(remaining)
+    slices = defaultdict(list)
+    for batch in batches.iterator(chunk_size=100):
+        needed = remaining[batch.pharmacy_stock_id]
+        if not needed:
+            continue
+        quantity = min(batch.quantity, needed)
+        slices[batch.pharmacy_stock_id].append((batch, quantity))
+        remaining[batch.pharmacy_stock_id] -= quantity
+        if quantity == needed:
+            uncovered -= 1
+            if not uncovered:
+                break
+    return slices, {stock_id: quantity for stock_id, quantity in remaining.items() if quantity}
+
+
+def allocate_batches(demand, today=None):
+    """
+    Take the demanded quantities out of non-expired batches, first expiry first out.
+
+    The batches planned from are locked, so their quantities are decremented
+    with a single UPDATE that concurrent dispenses cannot invalidate. Must run
+    inside transaction.atomic.
+
+    Args:
+        demand: Dict mapping stock ID to the quantity to take
+        today: Day batches must not have expired before, defaults to today
+
+    Returns:
+        Dict mapping stock ID to a list of (batch, quantity) slices
+
+    Raises:
+        DispenseError: Non-expired batches do not cover the demand
+    """
+    today = today or timezone.now().date()
+    slices, short = _plan_batches(demand, today)
+    if short:
+        stock = PharmacyStock.objects.select_related('medication').get(pk=next(iter(short)))
+        raise DispenseError(f"Insufficient non-expired stock for medication {stock.medication.name}")
+
+    _conditional_increment(
+        BatchExpiry.objects.all(), 'quantity',
+        {batch.pk: -quantity for stock_slices in slices.values() for batch, quantity in stock_slices},
+        lambda pk, amount: Q()
+    )
+    return slices
+
+
+def dispense(prescription, items_data, pharmacist_id, pharmacist_name, notes=''):
+    """
+    Dispense medications for a prescription with a fixed number of queries.
+
+    Prescription items are loaded in one query. Dispensed quantities and stock
+    levels are each changed by a single conditional UPDATE, for example
+    `quantity_on_hand = quantity_on_hand - n WHERE quantity_on_hand >= n`, so
+    concurrent dispenses can never oversell nor over-dispense: if any row does
+    not match, a DispenseError is raised. Quantities are taken out of the
+    non-expired batches first expiry first out, with one dispense item per
+    batch slice. Must run inside transaction.atomic, which the caller rolls
+    back on error.
+
+    Args:
+        prescription: Prescription to dispense for
+        items_data: List of dicts with prescription_item_id and quantity_dispensed
+        pharmacist_id: ID of the dispensing pharmacist
+        pharmacist_name: Name of the dispensing pharmacist
+        notes: Notes of the dispense
+
+    Returns:
+        Tuple of (dispense log, billing items)
+    """
+    if prescription.status not in DISPENSABLE_STATUSES:
+        raise DispenseError("Only VERIFIED or DISPENSED_PARTIAL prescriptions can be dispensed.")
+
+    requested = defaultdict(int)
+    for item_data in items_data:
+        requested[item_data['prescription_item_id']] += item_data['quantity_dispensed']
+
+    items = PrescriptionItem.objects.filter(
+        prescription=prescription, pk__in=requested
+    ).select_related('medication').in_bulk()
+    for prescription_item_id in requested:
+        if prescription_item_id not in items:
+            raise DispenseError(
+                f"Prescription item {prescription_item_id} not found",
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+
+    for prescription_item_id, quantity in requested.items():
+        item = items[prescription_item_id]
+        if item.quantity_dispensed + quantity > item.quantity_prescribed:
+            raise DispenseError(f"Cannot dispense more than prescribed for item {prescription_item_id}")
+
+    updated = _conditional_increment(
+        PrescriptionItem.objects.all(), 'quantity_dispensed', requested,
+        lambda pk, quantity: Q(quantity_dispensed__lte=F('quantity_prescribed') - quantity)
+    )
+    if updated != len(requested):
+        # Another dispense for the same items committed in the meantime
+        raise DispenseError("Cannot dispense more than prescribed, the prescription was dispensed concurrently")
+
+    demand = defaultdict(int)
+    for prescription_item_id, quantity in requested.items():
+        demand[items[prescription_item_id].medication_id] += quantity
+    stock_ids = dict(
+        PharmacyStock.objects.filter(medication_id__in=demand).values_list('medication_id', 'id')
+    )
+    for medication_id in demand:
+        if medication_id not in stock_ids:
+            medication = next(item.medication for item in items.values() if item.medication_id == medication_id)
+            raise DispenseError(f"No stock record for medication {medication.name}")
+
+    updated = _conditional_increment(
+        PharmacyStock.objects.all(), 'quantity_on_hand',
+        {stock_ids[medication_id]: -quantity for medication_id, quantity in demand.items()},
+        lambda pk, amount: Q(quantity_on_hand__gte=-amount)
+    )
+    if updated != len(demand):
+        stocks = PharmacyStock.objects.filter(pk__in=stock_ids.values()).select_related('medication')
+        short = next(
+            (stock for stock in stocks if stock.quantity_on_hand < demand[stock.medication_id]), None
+        )
+        name = short.medication.name if short else "requested medications"
+        raise DispenseError(f"Insufficient stock for medication {name}")
+
+    slices = allocate_batches({
+        stock_ids[medication_id]: quantity for medication_id, quantity in demand.items()
+    })
+
+    dispense_log = DispenseLog.objects.create(
+        prescription=prescription,
+        pharmacist_id=pharmacist_id,
+        pharmacist_name=pharmacist_name,
+        notes=notes
+    )
+    # Hand the batch slices of each medication out to its items, one dispense item per slice
+    dispense_items = []
+    for item_data in items_data:
+        medication_id = items[item_data['prescription_item_id']].medication_id
+        stock_slices = slices[stock_ids[medication_id]]
+        quantity = item_data['quantity_dispensed']
+        while quantity:
+            batch, available = stock_slices[0]
+            portion = min(quantity, available)
+            dispense_items.append(DispenseItem(
+                dispense_log=dispense_log,
+                prescription_item_id=item_data['prescription_item_id'],
+                medication_id=medication_id,
+                quantity_dispensed=portion,
+                batch_number=batch.batch_number
+            ))
+            quantity -= portion
+            if portion == available:
+                stock_slices.pop(0)
+            else:
+                stock_slices[0] = (batch, available - portion)
+    DispenseItem.objects.bulk_create(dispense_items)
+
+    fully_dispensed = not PrescriptionItem.objects.filter(
+        prescription=prescription, quantity_dispensed__lt=F('quantity_prescribed')
+    ).exists()
+    prescription.status = 'DISPENSED_FULL' if fully_dispensed else 'DISPENSED_PARTIAL'
+    prescription.save(update_fields=['status', 'updated_at'])
+
+    billing_items = []
+    for item_data in items_data:
+        medication = items[item_data['prescription_item_id']].medication
+        quantity = item_data['quantity_dispensed']
+        billing_items.append({
+            "medication_name": medication.name,
+            "quantity": quantity,
+            "unit_price": float(medication.unit_price),
+            "total_price": float(medication.unit_price) * quantity
+        })
+    return dispense_log, billing_items
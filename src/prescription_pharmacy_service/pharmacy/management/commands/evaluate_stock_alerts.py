@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pharmacy.alerts import evaluate_alerts, notify_alerts
+
+
+class Command(BaseCommand):
+    """Evaluate reorder and expiry alerts."""
+    help = 'Store medications below their reorder level and expiring batches, and notify new alerts, e.g. every 5 minutes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Day stock is evaluated on (YYYY-MM-DD, defaults to today)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Alert on batches expiring within this many days'
+        )
+        parser.add_argument(
+            '--no-notify',
+            action='store_true',
+            help='Only refresh the stored alerts'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            today = date.fromisoformat(options['date']) if options['date'] else None
+        except ValueError:
+            raise CommandError('Date must be in YYYY-MM-DD format.')
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError('Days must not be negative.')
+
+        alerts = evaluate_alerts(today=today, within_days=options['days'])
+        sent = 0 if options['no_notify'] else notify_alerts()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(alerts['low_stock'])} medications below reorder level, "
+            f"{len(alerts['expiring_batches'])} batches expiring within {alerts['expiry_window_days']} days, "
+            f"{alerts['raised']} raised, {alerts['cleared']} cleared, {sent} notifications sent"
+        ))
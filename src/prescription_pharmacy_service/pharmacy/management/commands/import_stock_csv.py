@@ -0,0 +1,58 @@
+import csv
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pharmacy.receiving import RECEIPT_COLUMNS, receive_lines
+
+
+class Command(BaseCommand):
+    """Receive a stock delivery from a CSV file."""
+    help = (
+        'Import delivery lines with the columns ' + ', '.join(RECEIPT_COLUMNS) +
+        ', streaming the file in one transaction per chunk.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import, or - to read standard input')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=getattr(settings, 'PHARMACY_RECEIPT_CHUNK_SIZE', 500),
+            help='Number of lines received per transaction'
+        )
+        parser.add_argument(
+            '--max-errors',
+            type=int,
+            default=50,
+            help='Number of line errors printed'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('Chunk size must be positive.')
+
+        try:
+            stream = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        except OSError as error:
+            raise CommandError(f"Cannot open {options['path']}: {error}")
+
+        with stream:
+            reader = csv.DictReader(stream)
+            missing = set(RECEIPT_COLUMNS) - set(reader.fieldnames or [])
+            if missing:
+                raise CommandError(f"Missing columns: {', '.join(sorted(missing))}")
+            # Line numbers count the header, so they match the file
+            report = receive_lines(enumerate(reader, start=2), chunk_size=options['chunk_size'])
+
+        for error in report['errors'][:options['max_errors']]:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        if len(report['errors']) > options['max_errors']:
+            self.stderr.write(f"... and {len(report['errors']) - options['max_errors']} more errors")
+
+        style = self.style.WARNING if report['errors'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Received {report['received']} lines, {len(report['errors'])} failed, "
+            f"{report['seconds']:.2f}s ({report['lines_per_second']:.0f} lines/s)"
+        ))
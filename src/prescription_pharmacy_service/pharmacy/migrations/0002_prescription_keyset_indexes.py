@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-16 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['created_at', 'id'], name='pharmacy_pr_created_9cad92_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['patient_id', 'created_at', 'id'], name='pharmacy_pr_patient_f11c1f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='pharmacy_pr_status_3400c5_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0002_prescription_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='batchexpiry',
+            index=models.Index(fields=['pharmacy_stock', 'expiry_date'], name='pharmacy_ba_pharmac_452bef_idx'),
+        ),
+    ]
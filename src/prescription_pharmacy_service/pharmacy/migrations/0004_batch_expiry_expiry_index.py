@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0003_batch_expiry_fefo_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='batchexpiry',
+            index=models.Index(fields=['expiry_date'], name='pharmacy_ba_expiry__53fc7c_idx'),
+        ),
+    ]
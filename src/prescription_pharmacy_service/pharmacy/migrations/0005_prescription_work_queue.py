@@ -0,0 +1,27 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0004_batch_expiry_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prescription',
+            name='claimed_by',
+            field=models.PositiveIntegerField(blank=True, help_text='ID dược sĩ đang xử lý đơn', null=True),
+        ),
+        migrations.AddField(
+            model_name='prescription',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, help_text='Hạn giữ đơn của dược sĩ', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['status', 'date_prescribed', 'id'], name='pharmacy_pr_status_4baf82_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0005_prescription_work_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alert_type', models.CharField(choices=[('LOW_STOCK', 'Low Stock'), ('EXPIRING_BATCH', 'Expiring Batch')], help_text='Loại cảnh báo', max_length=20)),
+                ('object_id', models.PositiveIntegerField(help_text='ID kho thuốc hoặc lô thuốc được cảnh báo')),
+                ('data', models.JSONField(help_text='Chi tiết cảnh báo tại lần đánh giá gần nhất')),
+                ('raised_at', models.DateTimeField(help_text='Thời điểm cảnh báo xuất hiện')),
+                ('evaluated_at', models.DateTimeField(help_text='Thời điểm đánh giá gần nhất')),
+                ('notified_at', models.DateTimeField(blank=True, help_text='Thời điểm đã gửi thông báo', null=True)),
+            ],
+            options={
+                'verbose_name': 'Stock Alert',
+                'verbose_name_plural': 'Stock Alerts',
+                'indexes': [models.Index(fields=['notified_at'], name='pharmacy_st_notifie_704bc5_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stockalert',
+            constraint=models.UniqueConstraint(fields=('alert_type', 'object_id'), name='unique_stock_alert'),
+        ),
+    ]
@@ -41,6 +41,8 @@ class Prescription(models.Model):
     date_prescribed = models.DateTimeField(default=timezone.now, help_text="Ngày kê đơn")
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='PENDING_VERIFICATION', help_text="Trạng thái đơn thuốc")
     notes_for_pharmacist = models.TextField(blank=True, help_text="Ghi chú cho dược sĩ")
+    claimed_by = models.PositiveIntegerField(null=True, blank=True, help_text="ID dược sĩ đang xử lý đơn")
+    claimed_until = models.DateTimeField(null=True, blank=True, help_text="Hạn giữ đơn của dược sĩ")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -50,6 +52,14 @@ class Prescription(models.Model):
     class Meta:
         verbose_name = "Prescription"
         verbose_name_plural = "Prescriptions"
+        indexes = [
+            # Keyset pagination on (created_at, id), overall and per patient or status
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['patient_id', 'created_at', 'id']),
+            models.Index(fields=['status', 'created_at', 'id']),
+            # Pharmacist work queue, oldest prescriptions of a status first
+            models.Index(fields=['status', 'date_prescribed', 'id']),
+        ]
 
 
 class PrescriptionItem(models.Model):
@@ -99,6 +109,41 @@ class BatchExpiry(models.Model):
     class Meta:
         verbose_name = "Batch Expiry"
         verbose_name_plural = "Batch Expiries"
+        indexes = [
+            # First expiry first out allocation per stock
+            models.Index(fields=['pharmacy_stock', 'expiry_date']),
+            # Expiry alerts across the whole formulary
+            models.Index(fields=['expiry_date']),
+        ]
+
+
+class StockAlert(models.Model):
+    """Cảnh báo tồn kho thấp và lô thuốc sắp hết hạn, cập nhật bởi evaluate_stock_alerts"""
+    ALERT_TYPE_CHOICES = [
+        ('LOW_STOCK', 'Low Stock'),
+        ('EXPIRING_BATCH', 'Expiring Batch'),
+    ]
+
+    alert_type = models.CharField(max_length=20, choices=ALERT_TYPE_CHOICES, help_text="Loại cảnh báo")
+    object_id = models.PositiveIntegerField(help_text="ID kho thuốc hoặc lô thuốc được cảnh báo")
+    data = models.JSONField(help_text="Chi tiết cảnh báo tại lần đánh giá gần nhất")
+    raised_at = models.DateTimeField(help_text="Thời điểm cảnh báo xuất hiện")
+    evaluated_at = models.DateTimeField(help_text="Thời điểm đánh giá gần nhất")
+    notified_at = models.DateTimeField(null=True, blank=True, help_text="Thời điểm đã gửi thông báo")
+
+    def __str__(self):
+        return f"{self.alert_type} - {self.object_id}"
+
+    class Meta:
+        verbose_name = "Stock Alert"
+        verbose_name_plural = "Stock Alerts"
+        constraints = [
+            models.UniqueConstraint(fields=['alert_type', 'object_id'], name='unique_stock_alert'),
+        ]
+        indexes = [
+            # Alerts still to be notified
+            models.Index(fields=['notified_at']),
+        ]
 
 
 class DispenseLog(models.Model):
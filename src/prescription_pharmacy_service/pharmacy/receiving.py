@@ -0,0 +1,141 @@
+import time
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import BatchExpiry, Medication, PharmacyStock
+from .serializers import StockReceiptLineSerializer
+
+# Columns of a delivery line, in the order of an import file
+RECEIPT_COLUMNS = ['medication_code', 'batch_number', 'quantity', 'expiry_date']
+
+
+def _stock_ids(medication_codes):
+    """
+    Map medication codes to their stock IDs, creating missing stock records.
+
+    Returns:
+        Dict mapping each known medication code to its stock ID
+    """
+    rows = Medication.objects.filter(medication_code__in=medication_codes).values_list(
+        'medication_code', 'id', 'stock__id'
+    )
+    stock_ids = {}
+    unstocked = {}
+    for medication_code, medication_id, stock_id in rows:
+        if stock_id is None:
+            unstocked[medication_id] = medication_code
+        else:
+            stock_ids[medication_code] = stock_id
+
+    if unstocked:
+        PharmacyStock.objects.bulk_create(
+            [PharmacyStock(medication_id=medication_id) for medication_id in unstocked],
+            ignore_conflicts=True
+        )
+        stock_ids.update(
+            (unstocked[medication_id], stock_id)
+            for medication_id, stock_id in PharmacyStock.objects.filter(
+                medication_id__in=unstocked
+            ).values_list('medication_id', 'id')
+        )
+    return stock_ids
+
+
+def receive_stock(lines):
+    """
+    Receive a chunk of delivery lines in one transaction.
+
+    One batch is created per line with a single bulk INSERT, and the quantities
+    of each medication are summed and added to its stock with a single UPDATE
+    of `quantity_on_hand = quantity_on_hand + n`, so concurrent dispenses and
+    receipts are never lost.
+
+    Args:
+        lines: List of validated (line number, line) pairs, see StockReceiptLineSerializer
+
+    Returns:
+        List of {'line', 'errors'} dicts for lines of unknown medications, which are skipped
+    """
+    with transaction.atomic():
+        stock_ids = _stock_ids({line['medication_code'] for _, line in lines})
+
+        errors = []
+        batches = []
+        amounts = defaultdict(int)
+        for line_number, line in lines:
+            stock_id = stock_ids.get(line['medication_code'])
+            if stock_id is None:
+                errors.append({
+                    'line': line_number,
+                    'errors': {'medication_code': [f"Unknown medication {line['medication_code']}."]}
+                })
+                continue
+            batches.append(BatchExpiry(
+                pharmacy_stock_id=stock_id,
+                batch_number=line['batch_number'],
+                quantity=line['quantity'],
+                expiry_date=line['expiry_date']
+            ))
+            amounts[stock_id] += line['quantity']
+
+        if batches:
+            BatchExpiry.objects.bulk_create(batches)
+            PharmacyStock.objects.filter(pk__in=amounts).update(
+                quantity_on_hand=F('quantity_on_hand') + Case(
+                    *[When(pk=stock_id, then=Value(amount)) for stock_id, amount in amounts.items()],
+                    output_field=IntegerField()
+                ),
+                last_stocked_date=timezone.now()
+            )
+    return errors
+
+
+def receive_lines(rows, chunk_size=500):
+    """
+    Validate and receive delivery lines, `chunk_size` lines per transaction.
+
+    Rows are consumed as they come, so a file of any size can be streamed in.
+    Invalid lines are reported with their line number and the others received.
+
+    Args:
+        rows: Iterable of (line number, dict of raw fields) pairs
+        chunk_size: Number of lines received per transaction
+
+    Returns:
+        Dict with the number of lines received, the per-line errors, the
+        duration in seconds and the throughput in lines per second
+    """
+    started = time.monotonic()
+    received = 0
+    errors = []
+    chunk = []
+
+    def flush():
+        nonlocal received
+        chunk_errors = receive_stock(chunk)
+        received += len(chunk) - len(chunk_errors)
+        errors.extend(chunk_errors)
+        chunk.clear()
+
+    for line_number, row in rows:
+        serializer = StockReceiptLineSerializer(data=row)
+        if serializer.is_valid():
+            chunk.append((line_number, serializer.validated_data))
+            if len(chunk) >= chunk_size:
+                flush()
+        else:
+            errors.append({'line': line_number, 'errors': serializer.errors})
+    if chunk:
+        flush()
+
+    errors.sort(key=lambda error: error['line'])
+    seconds = time.monotonic() - started
+    return {
+        'received': received,
+        'errors': errors,
+        'seconds': seconds,
+        'lines_per_second': (received + len(errors)) / seconds if seconds else 0.0,
+    }
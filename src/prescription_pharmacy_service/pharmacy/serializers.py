@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import (
     Medication, Prescription, PrescriptionItem, 
@@ -82,19 +83,78 @@ class PrescriptionSerializer(serializers.ModelSerializer):
         return prescription
 
 
+class PrescriptionQueueSerializer(serializers.ModelSerializer):
+    """Slim projection of a prescription in the pharmacist work queue, without nested items"""
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Prescription
+        fields = [
+            'id', 'patient_id', 'patient_name', 'doctor_id', 'doctor_name', 'date_prescribed',
+            'status', 'notes_for_pharmacist', 'item_count', 'claimed_by', 'claimed_until'
+        ]
+        read_only_fields = fields
+
+
+class ClaimPrescriptionsSerializer(serializers.Serializer):
+    """Serializer for claiming the next prescriptions of a queue"""
+    pharmacist_id = serializers.IntegerField()
+    count = serializers.IntegerField(min_value=1, default=1)
+    status = serializers.ChoiceField(choices=['PENDING_VERIFICATION', 'VERIFIED'], default='PENDING_VERIFICATION')
+
+    def validate_count(self, value):
+        max_claim = getattr(settings, 'PHARMACY_QUEUE_MAX_CLAIM', 50)
+        if value > max_claim:
+            raise serializers.ValidationError(f"At most {max_claim} prescriptions can be claimed at once.")
+        return value
+
+
+class ReleasePrescriptionsSerializer(serializers.Serializer):
+    """Serializer for releasing claimed prescriptions, all of the pharmacist's when no IDs are given"""
+    pharmacist_id = serializers.IntegerField()
+    prescription_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
+class PrescriptionSummarySerializer(PrescriptionSerializer):
+    """Prescription with its items but without the nested dispense history, for `?fields=summary`"""
+    dispense_logs = None
+
+    class Meta(PrescriptionSerializer.Meta):
+        fields = [field for field in PrescriptionSerializer.Meta.fields if field != 'dispense_logs']
+
+
+class DispenseItemInputSerializer(serializers.Serializer):
+    prescription_item_id = serializers.IntegerField()
+    quantity_dispensed = serializers.IntegerField(min_value=1)
+
+
 class PrescriptionDispenseSerializer(serializers.Serializer):
     pharmacist_id = serializers.IntegerField()
     pharmacist_name = serializers.CharField()
-    items_dispensed = serializers.ListField(
-        child=serializers.DictField(
-            child=serializers.IntegerField(),
-            allow_empty=False
-        )
-    )
+    items_dispensed = DispenseItemInputSerializer(many=True, allow_empty=False)
     notes = serializers.CharField(required=False, allow_blank=True)
 
 
 class MedicationStockUpdateSerializer(serializers.Serializer):
     quantity_to_add = serializers.IntegerField(min_value=1)
     batch_number = serializers.CharField()
-    expiry_date = serializers.DateField() 
\ No newline at end of file
+    expiry_date = serializers.DateField() 
+
+
+class StockReceiptLineSerializer(serializers.Serializer):
+    """One line of a stock delivery"""
+    medication_code = serializers.CharField(max_length=50)
+    batch_number = serializers.CharField(max_length=100)
+    quantity = serializers.IntegerField(min_value=1)
+    expiry_date = serializers.DateField()
+
+
+class StockReceiptSerializer(serializers.Serializer):
+    """Serializer for receiving a whole delivery in one call, lines are validated one by one"""
+    lines = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_lines(self, value):
+        max_lines = getattr(settings, 'PHARMACY_RECEIPT_MAX_LINES', 5000)
+        if len(value) > max_lines:
+            raise serializers.ValidationError(f"At most {max_lines} lines can be received per request.")
+        return value
@@ -1,3 +1,729 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from pharmacy.alerts import EXPIRING_BATCH, LOW_STOCK, evaluate_alerts, notify_alerts
+from pharmacy.inventory import DispenseError, allocate_batches, dispense
+from pharmacy.models import (
+    BatchExpiry, DispenseItem, DispenseLog, Medication, PharmacyStock, Prescription, PrescriptionItem, StockAlert
+)
+from pharmacy.work_queue import claim_prescriptions
+
+
+def create_medication(code, quantity_on_hand, batches=None):
+    """Create a medication and its stock, held in one batch unless `batches` lists (quantity, expiry_date)."""
+    medication = Medication.objects.create(
+        medication_code=code,
+        name=f'Medication {code}',
+        unit_price=Decimal('2.50'),
+        dosage_form='Tablet',
+        strength='500mg'
+    )
+    stock = PharmacyStock.objects.create(medication=medication, quantity_on_hand=quantity_on_hand)
+    if batches is None:
+        batches = [(quantity_on_hand, date.today() + timedelta(days=365))]
+    BatchExpiry.objects.bulk_create([
+        BatchExpiry(pharmacy_stock=stock, batch_number=f'{code}-{index}', quantity=quantity, expiry_date=expiry_date)
+        for index, (quantity, expiry_date) in enumerate(batches)
+    ])
+    return medication
+
+
+def create_prescription(medications, quantity_prescribed=10, prescription_status='VERIFIED'):
+    prescription = Prescription.objects.create(
+        patient_id=1,
+        patient_name='Patient',
+        doctor_id=2,
+        doctor_name='Doctor',
+        status=prescription_status
+    )
+    items = [
+        PrescriptionItem.objects.create(
+            prescription=prescription,
+            medication=medication,
+            dosage='1 tablet',
+            frequency='3 times a day',
+            duration_days=5,
+            quantity_prescribed=quantity_prescribed
+        )
+        for medication in medications
+    ]
+    return prescription, items
+
+
+@mock.patch('pharmacy.views.notify_billing_service')
+class DispensePrescriptionTests(APITestCase):
+    """Tests for the set-based dispensing endpoint."""
+
+    def setUp(self):
+        self.client.force_authenticate(user=SimpleNamespace(is_authenticated=True))
+
+    def post_dispense(self, prescription, items):
+        return self.client.post(reverse('dispense-prescription', kwargs={'pk': prescription.pk}), {
+            'pharmacist_id': 3,
+            'pharmacist_name': 'Pharmacist',
+            'items_dispensed': [
+                {'prescription_item_id': item.pk, 'quantity_dispensed': quantity}
+                for item, quantity in items
+            ]
+        }, format='json')
+
+    def test_dispense_decrements_stock(self, notify_billing):
+        """Test that stock, dispensed quantities and dispense rows are all written."""
+        medications = [create_medication('A', 100), create_medication('B', 100)]
+        prescription, items = create_prescription(medications)
+
+        response = self.post_dispense(prescription, [(items[0], 10), (items[1], 4)])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(PharmacyStock.objects.order_by('medication__medication_code').values_list('quantity_on_hand', flat=True)),
+            [90, 96]
+        )
+        self.assertEqual(DispenseItem.objects.filter(dispense_log__prescription=prescription).count(), 2)
+        prescription.refresh_from_db()
+        self.assertEqual(prescription.status, 'DISPENSED_PARTIAL')
+        notify_billing.assert_called_once()
+        self.assertEqual(notify_billing.call_args.kwargs['items'][1]['total_price'], 10.0)
+
+        response = self.post_dispense(prescription, [(items[1], 6)])
+        prescription.refresh_from_db()
+        self.assertEqual(prescription.status, 'DISPENSED_FULL')
+
+    def test_query_count_is_constant(self, notify_billing):
+        """Test that dispensing costs the same number of queries for any number of items."""
+        counts = []
+        for size in (1, 5):
+            medications = [create_medication(f'{size}-{index}', 100) for index in range(size)]
+            prescription, items = create_prescription(medications)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post_dispense(prescription, [(item, 1) for item in items])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_insufficient_stock_rolls_back(self, notify_billing):
+        """Test that a shortage of one medication leaves every row untouched."""
+        medications = [create_medication('A', 100), create_medication('B', 3)]
+        prescription, items = create_prescription(medications)
+
+        response = self.post_dispense(prescription, [(items[0], 5), (items[1], 5)])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Medication B', response.data['detail'])
+        self.assertEqual(PharmacyStock.objects.get(medication=medications[0]).quantity_on_hand, 100)
+        self.assertEqual(PrescriptionItem.objects.get(pk=items[0].pk).quantity_dispensed, 0)
+        self.assertFalse(DispenseLog.objects.exists())
+        notify_billing.assert_not_called()
+
+    def test_cannot_dispense_more_than_prescribed(self, notify_billing):
+        """Test that repeated items are summed against the prescribed quantity."""
+        prescription, items = create_prescription([create_medication('A', 100)], quantity_prescribed=5)
+
+        response = self.post_dispense(prescription, [(items[0], 3), (items[0], 3)])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(PharmacyStock.objects.get().quantity_on_hand, 100)
+
+    def test_item_of_another_prescription(self, notify_billing):
+        """Test that items must belong to the prescription being dispensed."""
+        medication = create_medication('A', 100)
+        prescription, _ = create_prescription([medication])
+        _, other_items = create_prescription([medication])
+
+        response = self.post_dispense(prescription, [(other_items[0], 1)])
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_non_positive_quantity_rejected(self, notify_billing):
+        """Test that a negative quantity cannot be used to add stock."""
+        prescription, items = create_prescription([create_medication('A', 100)])
+
+        response = self.post_dispense(prescription, [(items[0], -5)])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(PharmacyStock.objects.get().quantity_on_hand, 100)
+
+
+class BatchAllocationTests(APITestCase):
+    """Tests for first expiry first out batch allocation."""
+
+    def setUp(self):
+        self.today = date.today()
+
+    def batches(self, medication):
+        return list(BatchExpiry.objects.filter(
+            pharmacy_stock__medication=medication
+        ).order_by('batch_number').values_list('quantity', flat=True))
+
+    def dispense(self, prescription, items):
+        with transaction.atomic():
+            return dispense(prescription, [
+                {'prescription_item_id': item.pk, 'quantity_dispensed': quantity}
+                for item, quantity in items
+            ], pharmacist_id=1, pharmacist_name='Pharmacist')
+
+    def test_earliest_expiry_first_across_batches(self):
+        """Test that a quantity is split over batches by expiry, one dispense item per slice."""
+        medication = create_medication('A', 30, batches=[
+            (10, self.today + timedelta(days=90)),
+            (10, self.today + timedelta(days=10)),
+            (10, self.today + timedelta(days=30)),
+        ])
+        prescription, items = create_prescription([medication], quantity_prescribed=30)
+
+        dispense_log, _ = self.dispense(prescription, [(items[0], 15)])
+
+        self.assertEqual(self.batches(medication), [10, 0, 5])
+        self.assertEqual(
+            list(dispense_log.items.order_by('id').values_list('batch_number', 'quantity_dispensed')),
+            [('A-1', 10), ('A-2', 5)]
+        )
+        self.assertEqual(PharmacyStock.objects.get(medication=medication).quantity_on_hand, 15)
+
+    def test_expired_batches_are_skipped(self):
+        """Test that expired stock is never dispensed, even when on hand."""
+        medication = create_medication('A', 20, batches=[
+            (15, self.today - timedelta(days=1)),
+            (5, self.today),
+        ])
+        prescription, items = create_prescription([medication], quantity_prescribed=20)
+
+        with self.assertRaises(DispenseError) as error:
+            self.dispense(prescription, [(items[0], 6)])
+        self.assertIn('non-expired', error.exception.detail)
+
+        self.dispense(prescription, [(items[0], 5)])
+        self.assertEqual(self.batches(medication), [15, 0])
+
+    def test_items_sharing_a_medication(self):
+        """Test that items of the same medication take consecutive slices."""
+        medication = create_medication('A', 8, batches=[
+            (4, self.today + timedelta(days=5)),
+            (4, self.today + timedelta(days=6)),
+        ])
+        prescription, _ = create_prescription([medication, medication], quantity_prescribed=4)
+        items = list(prescription.items.order_by('id'))
+
+        dispense_log, _ = self.dispense(prescription, [(items[0], 3), (items[1], 3)])
+
+        self.assertEqual(
+            list(dispense_log.items.order_by('id').values_list('prescription_item_id', 'batch_number', 'quantity_dispensed')),
+            [(items[0].pk, 'A-0', 3), (items[1].pk, 'A-0', 1), (items[1].pk, 'A-1', 2)]
+        )
+
+    def test_hundreds_of_batches(self):
+        """Test that a medication with hundreds of batches is allocated in two queries."""
+        medication = create_medication('A', 500, batches=[
+            (1, self.today + timedelta(days=day)) for day in range(500)
+        ])
+        stock = PharmacyStock.objects.get(medication=medication)
+
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            slices = allocate_batches({stock.pk: 3})
+
+        self.assertEqual([batch.expiry_date for batch, _ in slices[stock.pk]],
+                         [self.today + timedelta(days=day) for day in range(3)])
+        # Locking read of the plan, then one update of the batches taken from
+        self.assertEqual(len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 2)
+        self.assertEqual(BatchExpiry.objects.filter(pharmacy_stock=stock, quantity=0).count(), 3)
+
+
+    def test_plan_is_a_locking_read(self):
+        """Test that batches are planned from a locking read, which sees quantities committed meanwhile."""
+        create_medication('A', 10)
+        stock = PharmacyStock.objects.get()
+
+        with mock.patch.object(
+            BatchExpiry.objects, 'select_for_update', wraps=BatchExpiry.objects.select_for_update
+        ) as select_for_update, transaction.atomic():
+            allocate_batches({stock.pk: 4})
+
+        select_for_update.assert_called_once_with()
+
+
+class StockReceivingTests(APITestCase):
+    """Tests for receiving stock deliveries"""
+
+    def setUp(self):
+        self.client.force_authenticate(user=SimpleNamespace(is_authenticated=True))
+        self.expiry = (date.today() + timedelta(days=365)).isoformat()
+
+    def line(self, medication_code, quantity, batch_number='LOT-1'):
+        return {
+            'medication_code': medication_code,
+            'batch_number': batch_number,
+            'quantity': quantity,
+            'expiry_date': self.expiry,
+        }
+
+    def test_bulk_receipt_sums_quantities(self):
+        """Test that each line adds a batch and quantities are summed per medication."""
+        create_medication('A', 10)
+        create_medication('B', 0)
+
+        response = self.client.post(reverse('pharmacy-stock-receive'), {'lines': [
+            self.line('A', 5, 'LOT-1'), self.line('B', 7), self.line('A', 3, 'LOT-2'),
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['received'], 3)
+        stocks = PharmacyStock.objects.order_by('medication__medication_code')
+        self.assertEqual([stock.quantity_on_hand for stock in stocks], [18, 7])
+        self.assertTrue(all(stock.last_stocked_date for stock in stocks))
+        self.assertEqual(BatchExpiry.objects.filter(pharmacy_stock=stocks[0]).count(), 3)
+
+    def test_invalid_lines_reported_by_number(self):
+        """Test that bad lines are reported without failing the rest of the delivery."""
+        create_medication('A', 0)
+
+        response = self.client.post(reverse('pharmacy-stock-receive'), {'lines': [
+            self.line('A', 5), self.line('A', 0), self.line('UNKNOWN', 1),
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3])
+        self.assertIn('quantity', response.data['errors'][0]['errors'])
+        self.assertIn('medication_code', response.data['errors'][1]['errors'])
+        self.assertEqual(PharmacyStock.objects.get().quantity_on_hand, 5)
+
+    def test_missing_stock_record_is_created(self):
+        """Test that a catalogued medication without stock gets a stock record."""
+        medication = Medication.objects.create(
+            medication_code='NEW', name='New', unit_price=Decimal('1.00'), dosage_form='Tablet', strength='5mg'
+        )
+
+        response = self.client.post(reverse('pharmacy-stock-receive'), {'lines': [self.line('NEW', 4)]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(PharmacyStock.objects.get(medication=medication).quantity_on_hand, 4)
+
+    def test_query_count_is_constant(self):
+        """Test that receiving costs the same number of queries for any number of lines."""
+        for index in range(20):
+            create_medication(f'M{index}', 0)
+        counts = []
+        for size in (2, 20):
+            lines = [self.line(f'M{index}', 1) for index in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('pharmacy-stock-receive'), {'lines': lines}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_single_update_sets_last_stocked_date(self):
+        """Test that adding one batch records when the stock was received."""
+        stock = PharmacyStock.objects.get(medication=create_medication('A', 10))
+
+        response = self.client.post(reverse('pharmacy-stock-update', kwargs={'pk': stock.pk}), {
+            'quantity_to_add': 5, 'batch_number': 'LOT-9', 'expiry_date': self.expiry,
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stock.refresh_from_db()
+        self.assertEqual(stock.quantity_on_hand, 15)
+        self.assertIsNotNone(stock.last_stocked_date)
+
+    def test_import_command(self):
+        """Test that the CSV import streams a file in chunks and reports errors by file line."""
+        create_medication('A', 0)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write('medication_code,batch_number,quantity,expiry_date\n')
+            for index in range(5):
+                csv_file.write(f'A,LOT-{index},2,{self.expiry}\n')
+            csv_file.write('A,LOT-X,two,not-a-date\n')
+        self.addCleanup(os.remove, csv_file.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_stock_csv', csv_file.name, chunk_size=2, stdout=stdout, stderr=stderr)
+
+        self.assertEqual(PharmacyStock.objects.get().quantity_on_hand, 10)
+        self.assertIn('Received 5 lines, 1 failed', stdout.getvalue())
+        self.assertIn('lines/s', stdout.getvalue())
+        self.assertIn('Line 7', stderr.getvalue())
+
+
+@mock.patch('pharmacy.alerts.notify_notification_service_bulk', return_value=True)
+class StockAlertTests(APITestCase):
+    """Tests for the reorder and expiry alerts"""
+
+    def setUp(self):
+        self.client.force_authenticate(user=SimpleNamespace(is_authenticated=True))
+        self.today = date.today()
+
+    def test_low_stock_counts_only_usable_batches(self, notify):
+        """Test that medications are low when on hand or non-expired stock reaches the reorder level."""
+        create_medication('LOW', 10)
+        create_medication('OK', 50)
+        create_medication('EXPIRED', 50, batches=[
+            (45, self.today - timedelta(days=1)), (5, self.today + timedelta(days=100)),
+        ])
+
+        alerts = evaluate_alerts(within_days=0)
+
+        self.assertEqual(
+            [(alert['medication_code'], alert['usable_quantity']) for alert in alerts['low_stock']],
+            [('LOW', 10), ('EXPIRED', 5)]
+        )
+        self.assertEqual([alert['batch_number'] for alert in alerts['expiring_batches']], ['EXPIRED-0'])
+
+    def test_expiring_within_window(self, notify):
+        """Test that batches are reported up to the end of the expiry window, soonest first."""
+        create_medication('A', 300, batches=[
+            (100, self.today + timedelta(days=40)),
+            (100, self.today + timedelta(days=30)),
+            (100, self.today + timedelta(days=31)),
+        ])
+        BatchExpiry.objects.create(
+            pharmacy_stock=PharmacyStock.objects.get(), batch_number='EMPTY', quantity=0, expiry_date=self.today
+        )
+
+        alerts = evaluate_alerts(within_days=31)
+
+        self.assertEqual([alert['batch_number'] for alert in alerts['expiring_batches']], ['A-1', 'A-2'])
+
+    def test_query_count_is_constant(self, notify):
+        """Test that evaluating alerts costs the same queries however large the formulary."""
+        counts = []
+        for size in (1, 20):
+            StockAlert.objects.all().delete()
+            for index in range(size):
+                create_medication(f'{size}-{index}', 5)
+            with CaptureQueriesContext(connection) as queries:
+                alerts = evaluate_alerts()
+            self.assertEqual(alerts['raised'], len(alerts['low_stock']))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_endpoint_serves_stored_evaluation(self, notify):
+        """Test that the endpoint reads the stored evaluation instead of evaluating stock itself."""
+        create_medication('A', 5)
+        evaluate_alerts()
+        create_medication('B', 5)
+
+        response = self.client.get(reverse('pharmacy-stock-alerts'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([alert['medication_code'] for alert in response.data['low_stock']], ['A'])
+        self.assertIsNotNone(response.data['evaluated_at'])
+
+    def test_only_new_alerts_are_notified(self, notify):
+        """Test that notifications are batched and not repeated while an alert stays raised."""
+        for index in range(3):
+            create_medication(f'M{index}', 5)
+
+        evaluate_alerts()
+        self.assertEqual(notify_alerts(batch_size=2), 3)
+        self.assertEqual([call.args[0] for call in notify.call_args_list], [LOW_STOCK, LOW_STOCK])
+
+        notify.reset_mock()
+        create_medication('NEW', 5, batches=[(5, self.today)])
+        evaluate_alerts()
+        self.assertEqual(notify_alerts(), 2)
+        self.assertEqual(
+            {call.args[0]: len(call.args[1]) for call in notify.call_args_list},
+            {LOW_STOCK: 1, EXPIRING_BATCH: 1}
+        )
+
+    def test_cleared_alert_is_notified_again(self, notify):
+        """Test that an alert that clears and comes back is notified again."""
+        stock = PharmacyStock.objects.get(medication=create_medication('A', 5))
+        evaluate_alerts()
+        notify_alerts()
+
+        PharmacyStock.objects.filter(pk=stock.pk).update(quantity_on_hand=50)
+        BatchExpiry.objects.filter(pharmacy_stock=stock).update(quantity=50)
+        self.assertEqual(evaluate_alerts()['cleared'], 1)
+        self.assertFalse(StockAlert.objects.exists())
+
+        PharmacyStock.objects.filter(pk=stock.pk).update(quantity_on_hand=5)
+        evaluate_alerts()
+        self.assertEqual(notify_alerts(), 1)
+
+    def test_failed_batches_are_retried(self, notify):
+        """Test that alerts whose notification failed are sent again on the next run."""
+        create_medication('A', 5)
+        evaluate_alerts()
+        notify.return_value = False
+        self.assertEqual(notify_alerts(), 0)
+
+        notify.return_value = True
+        evaluate_alerts()
+        self.assertEqual(notify_alerts(), 1)
+        self.assertEqual(notify_alerts(), 0)
+
+    def test_command(self, notify):
+        """Test that the scheduled command evaluates and notifies."""
+        create_medication('A', 5)
+        stdout = StringIO()
+
+        call_command('evaluate_stock_alerts', days=7, stdout=stdout)
+
+        self.assertIn('1 medications below reorder level', stdout.getvalue())
+        self.assertIn('1 notifications sent', stdout.getvalue())
+
+
+class WorkQueueTests(APITestCase):
+    """Tests for the pharmacist work queue"""
+
+    def setUp(self):
+        self.client.force_authenticate(user=SimpleNamespace(is_authenticated=True))
+        self.medication = create_medication('A', 100)
+
+    def create_queue(self, size, prescription_status='PENDING_VERIFICATION'):
+        prescriptions = []
+        for index in range(size):
+            prescription, _ = create_prescription([self.medication], prescription_status=prescription_status)
+            prescription.date_prescribed = timezone.now() - timedelta(hours=size - index)
+            prescription.save(update_fields=['date_prescribed'])
+            prescriptions.append(prescription)
+        return prescriptions
+
+    def claim(self, pharmacist_id, count=2, **data):
+        return self.client.post(reverse('pharmacy-queue-claim'), {
+            'pharmacist_id': pharmacist_id, 'count': count, **data
+        }, format='json')
+
+    def test_claims_oldest_first_and_disjoint(self):
+        """Test that pharmacists get the oldest prescriptions and never the same ones."""
+        prescriptions = self.create_queue(5)
+
+        first = self.claim(1)
+        second = self.claim(2)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in first.data], [p.pk for p in prescriptions[:2]])
+        self.assertEqual([row['id'] for row in second.data], [p.pk for p in prescriptions[2:4]])
+        self.assertEqual(first.data[0]['item_count'], 1)
+        self.assertNotIn('items', first.data[0])
+
+    def test_reclaim_renews_own_lease(self):
+        """Test that claiming again returns the pharmacist's current work first."""
+        prescriptions = self.create_queue(3)
+        self.claim(1, count=1)
+
+        response = self.claim(1, count=2)
+
+        self.assertEqual([row['id'] for row in response.data], [p.pk for p in prescriptions[:2]])
+
+    def test_expired_lease_returns_to_queue(self):
+        """Test that a prescription whose lease ran out can be claimed by someone else."""
+        prescription = self.create_queue(1)[0]
+        claim_prescriptions(pharmacist_id=1, count=1, lease_seconds=60)
+        self.assertEqual(self.claim(2).data, [])
+
+        Prescription.objects.filter(pk=prescription.pk).update(claimed_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual([row['id'] for row in self.claim(2).data], [prescription.pk])
+
+    def test_release_and_verify_free_claims(self):
+        """Test that released and verified prescriptions can be claimed from the next queue."""
+        prescriptions = self.create_queue(2)
+        self.claim(1)
+
+        response = self.client.post(reverse('pharmacy-queue-release'), {
+            'pharmacist_id': 1, 'prescription_ids': [prescriptions[0].pk]
+        }, format='json')
+        self.assertEqual(response.data['released'], 1)
+        self.assertEqual([row['id'] for row in self.claim(2).data], [prescriptions[0].pk])
+
+        self.client.post(reverse('verify-prescription', kwargs={'pk': prescriptions[1].pk}))
+        response = self.claim(2, status='VERIFIED')
+        self.assertEqual([row['id'] for row in response.data], [prescriptions[1].pk])
+
+    def test_query_count_is_constant(self):
+        """Test that claiming costs the same queries for any count or backlog size."""
+        self.create_queue(30)
+        counts = []
+        for count in (1, 10):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.claim(count, count=count)
+            self.assertEqual(len(response.data), count)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_count_is_capped(self):
+        """Test that a single call cannot claim the whole backlog."""
+        response = self.claim(1, count=10000)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PrescriptionReadTests(APITestCase):
+    """Tests for the query counts of prescription reads"""
+
+    def setUp(self):
+        self.client.force_authenticate(user=SimpleNamespace(is_authenticated=True))
+        self.medications = [create_medication('A', 100), create_medication('B', 100)]
+
+    def create_dispensed(self, patient_id, count):
+        prescriptions = []
+        for _ in range(count):
+            prescription, items = create_prescription(self.medications, prescription_status='DISPENSED_PARTIAL')
+            Prescription.objects.filter(pk=prescription.pk).update(patient_id=patient_id)
+            dispense_log = DispenseLog.objects.create(prescription=prescription, pharmacist_id=3, pharmacist_name='Pharmacist')
+            DispenseItem.objects.bulk_create([
+                DispenseItem(dispense_log=dispense_log, prescription_item=item, medication=item.medication,
+                             quantity_dispensed=1, batch_number='LOT-1')
+                for item in items
+            ])
+            prescriptions.append(prescription)
+        return prescriptions
+
+    def count_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_patient_list_query_count_is_constant(self):
+        """Test that listing costs the same queries for 1 or 10 fully dispensed prescriptions."""
+        self.create_dispensed(1, 1)
+        self.create_dispensed(2, 10)
+
+        one, _ = self.count_queries(reverse('patient-prescription-list', kwargs={'patient_id': 1}))
+        ten, response = self.count_queries(reverse('patient-prescription-list', kwargs={'patient_id': 2}))
+
+        self.assertEqual(one, ten)
+        # Prescriptions, items with medications, dispense logs, dispense items with medications
+        self.assertEqual(ten, 4)
+        self.assertEqual(response.data['results'][0]['items'][0]['medication_name'], 'Medication A')
+        self.assertEqual(len(response.data['results'][0]['dispense_logs'][0]['items']), 2)
+
+    def test_summary_skips_dispense_history(self):
+        """Test that ?fields=summary neither loads nor returns dispense logs."""
+        self.create_dispensed(1, 10)
+        url = reverse('prescription-list-create')
+
+        full, _ = self.count_queries(url)
+        summary, response = self.count_queries(url, fields='summary')
+
+        self.assertEqual(summary, full - 2)
+        self.assertNotIn('dispense_logs', response.data['results'][0])
+        self.assertEqual(len(response.data['results'][0]['items']), 2)
+
+    def test_detail_and_pending_views_prefetch(self):
+        """Test that the detail and pending views load relations in a fixed number of queries."""
+        prescription = self.create_dispensed(1, 1)[0]
+        for _ in range(5):
+            create_prescription(self.medications)
+
+        detail, response = self.count_queries(reverse('prescription-detail', kwargs={'pk': prescription.pk}))
+        self.assertEqual(detail, 4)
+        self.assertEqual(len(response.data['dispense_logs']), 1)
+
+        pending, response = self.count_queries(reverse('pending-prescription-list'), fields='summary')
+        self.assertEqual(pending, 2)
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class DispenseConcurrencyTests(TransactionTestCase):
+    """Stress test of concurrent dispenses competing for the same stock."""
+
+    THREADS = 12
+    QUANTITY = 2
+    STOCK = 15
+
+    def test_concurrent_dispenses_never_oversell(self):
+        """Test that racing dispenses sell exactly the stock on hand and no more."""
+        medication = create_medication('A', self.STOCK)
+        prescriptions = [
+            create_prescription([medication], quantity_prescribed=self.QUANTITY)
+            for _ in range(self.THREADS)
+        ]
+        barrier = threading.Barrier(self.THREADS)
+        outcomes = []
+
+        def worker(prescription, item):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        with transaction.atomic():
+                            dispense(prescription, [
+                                {'prescription_item_id': item.pk, 'quantity_dispensed': self.QUANTITY}
+                            ], pharmacist_id=1, pharmacist_name='Pharmacist')
+                        outcomes.append('dispensed')
+                        return
+                    except DispenseError:
+                        outcomes.append('rejected')
+                        return
+                    except OperationalError:
+                        # SQLite serializes writers, retry until the database is free
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(prescription, items[0]))
+            for prescription, items in prescriptions
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        dispensed = outcomes.count('dispensed')
+        self.assertEqual(len(outcomes), self.THREADS)
+        self.assertEqual(dispensed, self.STOCK // self.QUANTITY)
+        stock = PharmacyStock.objects.get(medication=medication)
+        self.assertEqual(stock.quantity_on_hand, self.STOCK - dispensed * self.QUANTITY)
+        self.assertEqual(DispenseItem.objects.count(), dispensed)
+
+
+class WorkQueueConcurrencyTests(TransactionTestCase):
+    """Stress test of pharmacists claiming from the same queue at once."""
+
+    THREADS = 8
+    COUNT = 3
+    BACKLOG = 20
+
+    def test_concurrent_claims_are_disjoint(self):
+        """Test that racing claims never hand out a prescription twice."""
+        medication = create_medication('A', 100)
+        for _ in range(self.BACKLOG):
+            create_prescription([medication], prescription_status='PENDING_VERIFICATION')
+        barrier = threading.Barrier(self.THREADS)
+        claimed = {}
+
+        def worker(pharmacist_id):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        claimed[pharmacist_id] = [
+                            prescription.pk for prescription in claim_prescriptions(pharmacist_id, self.COUNT)
+                        ]
+                        return
+                    except OperationalError:
+                        # SQLite serializes writers, retry until the database is free
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(pharmacist_id,)) for pharmacist_id in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ids = [pk for pks in claimed.values() for pk in pks]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), self.BACKLOG)
+        self.assertEqual(
+            Prescription.objects.filter(claimed_by__isnull=False).count(), self.BACKLOG
+        )
@@ -15,10 +15,17 @@ urlpatterns = [
     
     # Pharmacist endpoints
     path('pharmacy/prescriptions/pending/', views.PendingPrescriptionListView.as_view(), name='pending-prescription-list'),
+    path('pharmacy/queue/claim/', views.ClaimPrescriptionsView.as_view(), name='pharmacy-queue-claim'),
+    path('pharmacy/queue/release/', views.ReleasePrescriptionsView.as_view(), name='pharmacy-queue-release'),
     path('pharmacy/prescriptions/<int:pk>/verify/', views.VerifyPrescriptionView.as_view(), name='verify-prescription'),
     path('pharmacy/prescriptions/<int:pk>/dispense/', views.DispensePrescriptionView.as_view(), name='dispense-prescription'),
     
     # Pharmacy stock management
     path('pharmacy/stock/', views.PharmacyStockListView.as_view(), name='pharmacy-stock-list'),
+    path('pharmacy/stock/receive/', views.StockReceiptView.as_view(), name='pharmacy-stock-receive'),
     path('pharmacy/stock/<int:pk>/', views.PharmacyStockUpdateView.as_view(), name='pharmacy-stock-update'),
+    path('pharmacy/alerts/', views.StockAlertsView.as_view(), name='pharmacy-stock-alerts'),
+
+    # Internal endpoints
+    path('internal/user-cache/stats/', views.UserCacheStatsView.as_view(), name='user-cache-stats'),
 ] 
\ No newline at end of file
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Cache keys shared with the User Service, which deletes them when a user changes
+PROFILE_KEY = 'user-profile:{}'
+SUMMARY_KEY = 'user-summary:{}'
+GENERATION_KEY = 'user-cache:generation'
+
+_UNSYNCED = object()
+
+
+class UserProfileCache:
+    """
+    Two-tier cache for user details fetched from the User Service.
+
+    The first tier is an in-process LRU with a short TTL, the second one is the
+    configured Django cache (Redis when REDIS_URL is set), shared by every
+    service. When a user changes, the User Service deletes the shared entries
+    and bumps a generation counter. Each process checks that counter at most once every
+    USER_CACHE_SYNC_INTERVAL seconds and drops its local entries when it moves.
+    """
+
+    def __init__(self, maxsize=None, ttl=None, shared_ttl=None, sync_interval=None):
+        self.maxsize = maxsize or getattr(settings, 'USER_CACHE_MAXSIZE', 2048)
+        self.ttl = ttl or getattr(settings, 'USER_CACHE_TTL', 60)
+        self.shared_ttl = shared_ttl or getattr(settings, 'USER_CACHE_SHARED_TTL', 600)
+        self.sync_interval = sync_interval or getattr(settings, 'USER_CACHE_SYNC_INTERVAL', 5)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = _UNSYNCED
+        self._synced_at = 0.0
+        self._counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_many(self, key_template, user_ids):
+        """
+        Look up many users, checking the local tier before the shared one.
+
+        Returns:
+            Dict mapping user ID to cached details, misses are omitted
+        """
+        self._sync()
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                key = key_template.format(user_id)
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    found[user_id] = entry[1]
+                else:
+                    missing.append(user_id)
+            self._counters['local_hits'] += len(found)
+
+        if missing:
+            keys = {key_template.format(user_id): user_id for user_id in missing}
+            shared = _shared_call(cache.get_many, list(keys), default={})
+            for key, value in shared.items():
+                found[keys[key]] = value
+            self._store_local(shared)
+            with self._lock:
+                self._counters['shared_hits'] += len(shared)
+                self._counters['misses'] += len(missing) - len(shared)
+        return found
+
+    def get(self, key_template, user_id):
+        return self.get_many(key_template, [user_id]).get(user_id)
+
+    def set_many(self, key_template, users):
+        """Store details for many users in both tiers."""
+        entries = {key_template.format(user_id): user for user_id, user in users.items()}
+        self._store_local(entries)
+        _shared_call(cache.set_many, entries, self.shared_ttl)
+
+    def set(self, key_template, user_id, user):
+        self.set_many(key_template, {user_id: user})
+
+    def clear(self):
+        """Drop every local entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the local tier."""
+        with self._lock:
+            counters = dict(self._counters)
+            counters['size'] = len(self._entries)
+        counters['maxsize'] = self.maxsize
+        lookups = counters['local_hits'] + counters['shared_hits'] + counters['misses']
+        counters['hit_ratio'] = (
+            round((counters['local_hits'] + counters['shared_hits']) / lookups, 4)
+            if lookups else None
+        )
+        return counters
+
+    def _store_local(self, entries):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in entries.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def _sync(self):
+        """Drop local entries once the User Service has published an invalidation."""
+        now = time.monotonic()
+        if now - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = now
+        generation = _shared_call(cache.get, GENERATION_KEY)
+        if generation != self._generation:
+            if self._generation is not _UNSYNCED:
+                self.clear()
+            self._generation = generation
+
+
+def _shared_call(method, *args, default=None):
+    """Call the shared cache, treating an unreachable backend as a miss."""
+    try:
+        result = method(*args)
+    except Exception:
+        return default
+    return default if result is None else result
+
+
+user_cache = UserProfileCache()
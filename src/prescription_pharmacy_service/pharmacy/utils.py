@@ -3,6 +3,9 @@ from django.conf import settings
 from rest_framework import authentication, exceptions
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from . import http_client
+from .user_cache import PROFILE_KEY, user_cache
+
 
 class CustomJWTAuthentication(JWTAuthentication):
     """
@@ -23,26 +26,33 @@ class CustomJWTAuthentication(JWTAuthentication):
 
 def get_user_details(user_id, token=None):
     """
-    Get user details from User Service.
+    Get user details from User Service, served from the user cache when possible.
     """
+    user = user_cache.get(PROFILE_KEY, user_id)
+    if user is not None:
+        return user
+
     headers = {}
     if token:
         headers['Authorization'] = f'Bearer {token}'
     
     try:
-        response = requests.get(
+        response = http_client.get(
             f"{settings.USER_SERVICE_URL}/users/{user_id}/",
             headers=headers
         )
         
         if response.status_code == 200:
-            return response.json()
+            user = response.json()
+            user_cache.set(PROFILE_KEY, user_id, user)
+            return user
         else:
             return None
     except requests.RequestException:
         return None
 
 
+
 def notify_ehr_service(prescription_id, patient_id, issue_date, token=None):
     """
     Notify EHR Service about a new prescription.
@@ -60,7 +70,7 @@ def notify_ehr_service(prescription_id, patient_id, issue_date, token=None):
     }
     
     try:
-        response = requests.post(
+        response = http_client.post(
             f"{settings.EHR_SERVICE_URL}/ehr/internal/patients/{patient_id}/add-prescription-reference/",
             json=data,
             headers=headers
@@ -74,8 +84,10 @@ def notify_billing_service(dispense_log_id, patient_id, items, token=None):
     """
     Notify Billing Service about a medication dispense.
     """
+    # Billing replays the first response for a repeated key, so the call can be retried
     headers = {
-        'Content-Type': 'application/json'
+        'Content-Type': 'application/json',
+        'Idempotency-Key': f"dispense-{dispense_log_id}"
     }
     if token:
         headers['Authorization'] = f'Bearer {token}'
@@ -87,11 +99,28 @@ def notify_billing_service(dispense_log_id, patient_id, items, token=None):
     }
     
     try:
-        response = requests.post(
+        response = http_client.post(
             f"{settings.BILLING_SERVICE_URL}/billing/internal/create-invoice-for-medication/",
             json=data,
-            headers=headers
+            headers=headers,
+            idempotent=True
         )
         return response.status_code == 200 or response.status_code == 201
     except requests.RequestException:
-        return False 
\ No newline at end of file
+        return False 
+
+
+def notify_notification_service_bulk(notification_type, notifications, token=None):
+    """
+    Send many notifications of one type to Notification Service in a single batch.
+
+    Notification Service exposes no notification endpoints yet, so
+    notifications are only logged.
+
+    Args:
+        notification_type: Type of the notifications
+        notifications: List of dicts with the recipient and `data`
+    """
+    print(f"[NOTIFICATION SKIPPED] Type: {notification_type}, Batch of {len(notifications)} notifications")
+
+    return True
@@ -1,18 +1,27 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 from django.db import transaction
+from django.db.models import F, Prefetch
+from django.utils import timezone
 from rest_framework import generics, status, views
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
 from .models import (
-    Medication, Prescription, PrescriptionItem, 
-    PharmacyStock, BatchExpiry, DispenseLog, DispenseItem
+    Medication, Prescription, PrescriptionItem,
+    PharmacyStock, BatchExpiry, DispenseItem
 )
 from .serializers import (
-    MedicationSerializer, PrescriptionSerializer, 
+    MedicationSerializer, PrescriptionSerializer, PrescriptionSummarySerializer,
     PharmacyStockSerializer, PrescriptionDispenseSerializer,
-    MedicationStockUpdateSerializer
+    MedicationStockUpdateSerializer, StockReceiptSerializer, PrescriptionQueueSerializer,
+    ClaimPrescriptionsSerializer, ReleasePrescriptionsSerializer
 )
+from .alerts import get_alerts
+from .inventory import DISPENSABLE_STATUSES, DispenseError, dispense
+from .receiving import receive_lines
+from .user_cache import user_cache
+from .work_queue import claim_prescriptions, release_prescriptions
 from .utils import notify_ehr_service, notify_billing_service
 
 
@@ -20,6 +29,7 @@ class MedicationListCreateView(generics.ListCreateAPIView):
     """List and create medications"""
     queryset = Medication.objects.all()
     serializer_class = MedicationSerializer
+    ordering = ('name', 'id')
     
 
 class MedicationDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -28,10 +38,49 @@ class MedicationDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = MedicationSerializer
 
 
-class PrescriptionListCreateView(generics.ListCreateAPIView):
+def prescription_queryset(summary=False):
+    """
+    Prescriptions with every relation nested by PrescriptionSerializer prefetched.
+
+    Items and dispense items are loaded with their medication in one query
+    each, so serializing a page of prescriptions costs a fixed number of
+    queries. Summaries skip the dispense history altogether.
+    """
+    items = Prefetch('items', queryset=PrescriptionItem.objects.select_related('medication'))
+    if summary:
+        return Prescription.objects.prefetch_related(items)
+    return Prescription.objects.prefetch_related(
+        items,
+        Prefetch('dispense_logs__items', queryset=DispenseItem.objects.select_related('medication')),
+    )
+
+
+class PrescriptionReadMixin:
+    """
+    Serve prescriptions from prescription_queryset().
+
+    Reads with `?fields=summary` leave out the dispense history, which is
+    neither loaded nor serialized.
+    """
+    summary_query_param = 'fields'
+
+    def is_summary(self):
+        return (
+            self.request.method == 'GET'
+            and self.request.query_params.get(self.summary_query_param) == 'summary'
+        )
+
+    def get_queryset(self):
+        return prescription_queryset(summary=self.is_summary())
+
+    def get_serializer_class(self):
+        if self.is_summary():
+            return PrescriptionSummarySerializer
+        return PrescriptionSerializer
+
+
+class PrescriptionListCreateView(PrescriptionReadMixin, generics.ListCreateAPIView):
     """List and create prescriptions"""
-    queryset = Prescription.objects.all()
-    serializer_class = PrescriptionSerializer
     
     def perform_create(self, serializer):
         prescription = serializer.save()
@@ -45,31 +94,65 @@ class PrescriptionListCreateView(generics.ListCreateAPIView):
         return prescription
 
 
-class PrescriptionDetailView(generics.RetrieveAPIView):
+class PrescriptionDetailView(PrescriptionReadMixin, generics.RetrieveAPIView):
     """Retrieve a prescription"""
-    queryset = Prescription.objects.all()
-    serializer_class = PrescriptionSerializer
 
 
-class PatientPrescriptionListView(generics.ListAPIView):
+class PatientPrescriptionListView(PrescriptionReadMixin, generics.ListAPIView):
     """List prescriptions for a specific patient"""
-    serializer_class = PrescriptionSerializer
     
     def get_queryset(self):
         patient_id = self.kwargs['patient_id']
-        return Prescription.objects.filter(patient_id=patient_id)
+        return super().get_queryset().filter(patient_id=patient_id)
 
 
-class PendingPrescriptionListView(generics.ListAPIView):
+class PendingPrescriptionListView(PrescriptionReadMixin, generics.ListAPIView):
     """List pending prescriptions for pharmacist verification"""
-    serializer_class = PrescriptionSerializer
     
     def get_queryset(self):
-        return Prescription.objects.filter(
+        return super().get_queryset().filter(
             status__in=['PENDING_VERIFICATION', 'VERIFIED']
         )
 
 
+class ClaimPrescriptionsView(views.APIView):
+    """
+    Claim the next prescriptions of a queue for a pharmacist.
+
+    Pharmacists pull work from here instead of polling the pending list: each
+    call leases up to `count` of the oldest unclaimed prescriptions with the
+    given status, and concurrent calls never hand out the same prescription.
+    """
+    def post(self, request):
+        serializer = ClaimPrescriptionsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        prescriptions = claim_prescriptions(
+            pharmacist_id=serializer.validated_data['pharmacist_id'],
+            count=serializer.validated_data['count'],
+            queue_status=serializer.validated_data['status']
+        )
+        return Response(
+            PrescriptionQueueSerializer(prescriptions, many=True).data,
+            status=status.HTTP_200_OK
+        )
+
+
+class ReleasePrescriptionsView(views.APIView):
+    """Give a pharmacist's claimed prescriptions back to the queue"""
+    def post(self, request):
+        serializer = ReleasePrescriptionsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        released = release_prescriptions(
+            pharmacist_id=serializer.validated_data['pharmacist_id'],
+            prescription_ids=serializer.validated_data.get('prescription_ids')
+        )
+        return Response({"released": released}, status=status.HTTP_200_OK)
+
+
 class VerifyPrescriptionView(views.APIView):
     """Verify a prescription by pharmacist"""
     def post(self, request, pk):
@@ -82,6 +165,9 @@ class VerifyPrescriptionView(views.APIView):
             )
         
         prescription.status = 'VERIFIED'
+        # Verified prescriptions join the dispensing queue unclaimed
+        prescription.claimed_by = None
+        prescription.claimed_until = None
         prescription.save()
         
         return Response(
@@ -92,11 +178,10 @@ class VerifyPrescriptionView(views.APIView):
 
 class DispensePrescriptionView(views.APIView):
     """Dispense medications for a prescription"""
-    @transaction.atomic
     def post(self, request, pk):
         prescription = get_object_or_404(Prescription, pk=pk)
         
-        if prescription.status not in ['VERIFIED', 'DISPENSED_PARTIAL']:
+        if prescription.status not in DISPENSABLE_STATUSES:
             return Response(
                 {"detail": "Only VERIFIED or DISPENSED_PARTIAL prescriptions can be dispensed."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -106,84 +191,19 @@ class DispensePrescriptionView(views.APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create dispense log
-        dispense_log = DispenseLog.objects.create(
-            prescription=prescription,
-            pharmacist_id=serializer.validated_data['pharmacist_id'],
-            pharmacist_name=serializer.validated_data['pharmacist_name'],
-            notes=serializer.validated_data.get('notes', '')
-        )
-        
-        items_data = serializer.validated_data['items_dispensed']
-        billing_items = []
-        all_items_dispensed = True
-        
-        for item_data in items_data:
-            prescription_item_id = item_data.get('prescription_item_id')
-            quantity_dispensed = item_data.get('quantity_dispensed')
-            batch_number = item_data.get('batch_number')
-            
-            prescription_item = get_object_or_404(PrescriptionItem, pk=prescription_item_id)
-            
-            # Check if we're dispensing more than prescribed
-            if prescription_item.quantity_dispensed + quantity_dispensed > prescription_item.quantity_prescribed:
-                return Response(
-                    {"detail": f"Cannot dispense more than prescribed for item {prescription_item_id}"},
-                    status=status.HTTP_400_BAD_REQUEST
+        try:
+            with transaction.atomic():
+                dispense_log, billing_items = dispense(
+                    prescription,
+                    serializer.validated_data['items_dispensed'],
+                    pharmacist_id=serializer.validated_data['pharmacist_id'],
+                    pharmacist_name=serializer.validated_data['pharmacist_name'],
+                    notes=serializer.validated_data.get('notes', '')
                 )
-            
-            # Check if we have enough stock
-            try:
-                stock = PharmacyStock.objects.get(medication=prescription_item.medication)
-                if stock.quantity_on_hand < quantity_dispensed:
-                    return Response(
-                        {"detail": f"Insufficient stock for medication {prescription_item.medication.name}"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Reduce stock
-                stock.quantity_on_hand -= quantity_dispensed
-                stock.save()
-                
-            except PharmacyStock.DoesNotExist:
-                return Response(
-                    {"detail": f"No stock record for medication {prescription_item.medication.name}"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Create dispense item
-            dispense_item = DispenseItem.objects.create(
-                dispense_log=dispense_log,
-                prescription_item=prescription_item,
-                medication=prescription_item.medication,
-                quantity_dispensed=quantity_dispensed,
-                batch_number=batch_number
-            )
-            
-            # Update prescription item's dispensed quantity
-            prescription_item.quantity_dispensed += quantity_dispensed
-            prescription_item.save()
-            
-            # Check if any items are not fully dispensed
-            if prescription_item.quantity_dispensed < prescription_item.quantity_prescribed:
-                all_items_dispensed = False
-            
-            # Add to billing items
-            billing_items.append({
-                "medication_name": prescription_item.medication.name,
-                "quantity": quantity_dispensed,
-                "unit_price": float(prescription_item.medication.unit_price),
-                "total_price": float(prescription_item.medication.unit_price) * quantity_dispensed
-            })
+        except DispenseError as exc:
+            return Response({"detail": exc.detail}, status=exc.status_code)
         
-        # Update prescription status
-        if all_items_dispensed:
-            prescription.status = 'DISPENSED_FULL'
-        else:
-            prescription.status = 'DISPENSED_PARTIAL'
-        prescription.save()
-        
-        # Notify billing service
+        # Notify billing service once the stock changes are committed
         notify_billing_service(
             dispense_log_id=str(dispense_log.id),
             patient_id=prescription.patient_id,
@@ -201,6 +221,7 @@ class PharmacyStockListView(generics.ListAPIView):
     """List all pharmacy stock items"""
     queryset = PharmacyStock.objects.all()
     serializer_class = PharmacyStockSerializer
+    ordering = ('id',)
 
 
 class PharmacyStockUpdateView(views.APIView):
@@ -217,13 +238,14 @@ class PharmacyStockUpdateView(views.APIView):
         batch_number = serializer.validated_data['batch_number']
         expiry_date = serializer.validated_data['expiry_date']
         
-        # Add to overall stock quantity
-        stock.quantity_on_hand += quantity_to_add
-        stock.last_stocked_date = stock.last_stocked_date
-        stock.save()
+        # Add to overall stock quantity, in the database so concurrent updates are not lost
+        PharmacyStock.objects.filter(pk=stock.pk).update(
+            quantity_on_hand=F('quantity_on_hand') + quantity_to_add,
+            last_stocked_date=timezone.now()
+        )
         
         # Add batch information
-        batch = BatchExpiry.objects.create(
+        BatchExpiry.objects.create(
             pharmacy_stock=stock,
             batch_number=batch_number,
             quantity=quantity_to_add,
@@ -234,3 +256,53 @@ class PharmacyStockUpdateView(views.APIView):
             {"detail": "Stock updated successfully."},
             status=status.HTTP_200_OK
         )
+
+
+class StockReceiptView(views.APIView):
+    """
+    Receive a whole delivery in one call.
+
+    Each line names a medication by code with its batch number, quantity and
+    expiry date. Valid lines are received in chunks of
+    PHARMACY_RECEIPT_CHUNK_SIZE, one transaction per chunk, and invalid lines
+    are reported by line number without failing the others.
+    """
+    def post(self, request):
+        serializer = StockReceiptSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = serializer.validated_data['lines']
+        report = receive_lines(
+            enumerate(lines, start=1),
+            chunk_size=getattr(settings, 'PHARMACY_RECEIPT_CHUNK_SIZE', 500)
+        )
+
+        if not report['errors']:
+            response_status = status.HTTP_201_CREATED
+        elif report['received']:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({
+            "received": report['received'],
+            "failed": len(report['errors']),
+            "errors": report['errors']
+        }, status=response_status)
+
+
+class StockAlertsView(views.APIView):
+    """
+    Medications below their reorder level and batches about to expire.
+
+    Served from the StockAlert rows of the latest scheduled evaluation (see
+    evaluate_stock_alerts), so reading the alerts never scans the formulary.
+    """
+    def get(self, request):
+        return Response(get_alerts())
+
+
+class UserCacheStatsView(views.APIView):
+    """Hit/miss counters of this process's user details cache, for sizing it."""
+    def get(self, request):
+        return Response(user_cache.stats())
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Prescription
+
+# Statuses pharmacists pull work for: verification, then dispensing
+QUEUE_STATUSES = ['PENDING_VERIFICATION', 'VERIFIED']
+
+# Columns of the slim projection returned to the queue
+QUEUE_FIELDS = [
+    'id', 'patient_id', 'patient_name', 'doctor_id', 'doctor_name', 'date_prescribed',
+    'status', 'notes_for_pharmacist', 'claimed_by', 'claimed_until',
+]
+
+
+def _claimable(pharmacist_id, now):
+    """Prescriptions without a live lease, or whose lease the pharmacist already holds."""
+    return Q(claimed_until__isnull=True) | Q(claimed_until__lte=now) | Q(claimed_by=pharmacist_id)
+
+
+def claim_prescriptions(pharmacist_id, count, queue_status='PENDING_VERIFICATION', lease_seconds=None):
+    """
+    Claim the oldest prescriptions of a queue for a pharmacist.
+
+    Candidates are read in (status, date_prescribed) index order with
+    SELECT ... FOR UPDATE SKIP LOCKED, so pharmacists claiming at the same
+    time step over each other's rows instead of waiting, and only `count` rows
+    are read however long the backlog. Claims are leases: if the pharmacist
+    does not finish in time the prescriptions go back to the queue. Leases
+    the pharmacist already holds are renewed and returned again.
+
+    Args:
+        pharmacist_id: ID of the claiming pharmacist
+        count: Maximum number of prescriptions to claim
+        queue_status: One of QUEUE_STATUSES
+        lease_seconds: Length of the lease, defaults to PHARMACY_QUEUE_LEASE_SECONDS
+
+    Returns:
+        List of the claimed prescriptions, annotated with item_count
+    """
+    if lease_seconds is None:
+        lease_seconds = getattr(settings, 'PHARMACY_QUEUE_LEASE_SECONDS', 300)
+    now = timezone.now()
+    lease = now + timedelta(seconds=lease_seconds)
+
+    with transaction.atomic():
+        ids = list(
+            Prescription.objects.select_for_update(skip_locked=True).filter(
+                _claimable(pharmacist_id, now), status=queue_status
+            ).order_by('date_prescribed', 'id').values_list('id', flat=True)[:count]
+        )
+        if ids:
+            # Checked again, for databases without row locks
+            Prescription.objects.filter(
+                _claimable(pharmacist_id, now), pk__in=ids, status=queue_status
+            ).update(claimed_by=pharmacist_id, claimed_until=lease, updated_at=now)
+
+    return list(
+        Prescription.objects.filter(pk__in=ids, claimed_by=pharmacist_id, claimed_until=lease).only(
+            *QUEUE_FIELDS
+        ).annotate(item_count=Count('items')).order_by('date_prescribed', 'id')
+    )
+
+
+def release_prescriptions(pharmacist_id, prescription_ids=None):
+    """
+    Give a pharmacist's claims back to the queue.
+
+    Args:
+        pharmacist_id: ID of the pharmacist holding the claims
+        prescription_ids: Prescriptions to release, defaults to all of them
+
+    Returns:
+        Number of prescriptions released
+    """
+    queryset = Prescription.objects.filter(claimed_by=pharmacist_id)
+    if prescription_ids is not None:
+        queryset = queryset.filter(pk__in=prescription_ids)
+    return queryset.update(claimed_by=None, claimed_until=None, updated_at=timezone.now())
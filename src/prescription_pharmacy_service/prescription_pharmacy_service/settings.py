@@ -129,6 +129,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'pharmacy.pagination.KeysetPagination',
+    'PAGE_SIZE': 20
 }
 
 # JWT settings
@@ -144,3 +146,49 @@ SIMPLE_JWT = {
 USER_SERVICE_URL = os.environ.get('USER_SERVICE_URL', 'http://localhost:8000/api/v1')
 EHR_SERVICE_URL = os.environ.get('EHR_SERVICE_URL', 'http://localhost:8001/api/v1')
 BILLING_SERVICE_URL = os.environ.get('BILLING_SERVICE_URL', 'http://localhost:8003/api/v1')
+
+# Inter-service HTTP client: timeouts in seconds, retries apply to idempotent calls only
+SERVICE_HTTP_CONNECT_TIMEOUT = float(os.environ.get('SERVICE_HTTP_CONNECT_TIMEOUT', 1.0))
+SERVICE_HTTP_READ_TIMEOUT = float(os.environ.get('SERVICE_HTTP_READ_TIMEOUT', 5.0))
+SERVICE_HTTP_MAX_RETRIES = int(os.environ.get('SERVICE_HTTP_MAX_RETRIES', 2))
+SERVICE_HTTP_BACKOFF = float(os.environ.get('SERVICE_HTTP_BACKOFF', 0.1))
+SERVICE_HTTP_POOL_SIZE = int(os.environ.get('SERVICE_HTTP_POOL_SIZE', 20))
+SERVICE_HTTP_CIRCUIT_THRESHOLD = int(os.environ.get('SERVICE_HTTP_CIRCUIT_THRESHOLD', 5))
+SERVICE_HTTP_CIRCUIT_RESET = int(os.environ.get('SERVICE_HTTP_CIRCUIT_RESET', 30))
+
+# Cache shared by the services: Redis when REDIS_URL is set, e.g. redis://redis:6379/0
+# for the redis service of docker-compose.yml. Without it every process has its
+# own LocMemCache and never sees the User Service's invalidations, so cached user
+# details are only kept for a few seconds.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# User details cache: in-process LRU in front of the shared cache, TTLs in seconds
+USER_CACHE_MAXSIZE = int(os.environ.get('USER_CACHE_MAXSIZE', 2048))
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60 if REDIS_URL else 5))
+USER_CACHE_SHARED_TTL = int(os.environ.get('USER_CACHE_SHARED_TTL', 600 if REDIS_URL else 5))
+USER_CACHE_SYNC_INTERVAL = int(os.environ.get('USER_CACHE_SYNC_INTERVAL', 5))
+
+# Stock deliveries: lines per bulk receiving request and per transaction
+PHARMACY_RECEIPT_MAX_LINES = int(os.environ.get('PHARMACY_RECEIPT_MAX_LINES', 5000))
+PHARMACY_RECEIPT_CHUNK_SIZE = int(os.environ.get('PHARMACY_RECEIPT_CHUNK_SIZE', 500))
+
+# Stock alerts: expiry window in days, notifications per batch
+PHARMACY_ALERT_EXPIRY_DAYS = int(os.environ.get('PHARMACY_ALERT_EXPIRY_DAYS', 30))
+PHARMACY_ALERT_NOTIFY_BATCH_SIZE = int(os.environ.get('PHARMACY_ALERT_NOTIFY_BATCH_SIZE', 500))
+
+# Pharmacist work queue: seconds a claim is held and prescriptions claimed per call
+PHARMACY_QUEUE_LEASE_SECONDS = int(os.environ.get('PHARMACY_QUEUE_LEASE_SECONDS', 300))
+PHARMACY_QUEUE_MAX_CLAIM = int(os.environ.get('PHARMACY_QUEUE_MAX_CLAIM', 50))
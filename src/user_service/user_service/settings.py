@@ -138,6 +138,9 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Maximum number of users returned by one bulk lookup
+USER_BULK_LOOKUP_MAX = 500
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -146,3 +149,29 @@ SIMPLE_JWT = {
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
+
+# Cache shared by the services: Redis when REDIS_URL is set, e.g. redis://redis:6379/0
+# for the redis service of docker-compose.yml. Without it every process has its
+# own LocMemCache and the invalidations published here reach no other process.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# In-process cache of authenticated users, TTL in seconds, short without a shared cache
+USER_AUTH_CACHE_TTL = int(os.environ.get('USER_AUTH_CACHE_TTL', 30 if REDIS_URL else 5))
+USER_AUTH_CACHE_MAXSIZE = int(os.environ.get('USER_AUTH_CACHE_MAXSIZE', 10000))
+USER_AUTH_CACHE_SYNC_INTERVAL = int(os.environ.get('USER_AUTH_CACHE_SYNC_INTERVAL', 5))
+
+# Seconds between checks for a newer role to permission map in the shared cache
+ROLE_PERMISSION_SYNC_INTERVAL = int(os.environ.get('ROLE_PERMISSION_SYNC_INTERVAL', 5))
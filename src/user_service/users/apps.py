@@ -16,3 +16,6 @@ class UsersConfig(AppConfig):
             patch_user_model()
         except ImportError:
             pass
+
+        # Keep the user caches in sync with changes to users
+        import users.signals  # noqa
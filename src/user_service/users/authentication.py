@@ -65,8 +65,13 @@ class JWTAuthentication(BaseAuthentication):
 def get_tokens_for_user(user):
     """
     Generate JWT tokens for a user.
+
+    Role and active status are carried as signed claims, so other services can
+    authorize requests without asking the User Service.
     """
     refresh = RefreshToken.for_user(user)
+    refresh['role'] = user.role.name
+    refresh['is_active'] = user.is_active
     
     return {
         'refresh': str(refresh),
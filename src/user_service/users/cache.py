@@ -0,0 +1,192 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Keys of the user details cached by the other services, see their user_cache module
+PROFILE_KEY = 'user-profile:{}'
+SUMMARY_KEY = 'user-summary:{}'
+GENERATION_KEY = 'user-cache:generation'
+
+# Role to permission codenames map, stored per version
+ROLE_PERMISSIONS_VERSION_KEY = 'role-permissions:version'
+ROLE_PERMISSIONS_KEY = 'role-permissions:{}'
+ROLE_PERMISSIONS_TTL = 24 * 60 * 60
+
+_UNSYNCED = object()
+
+
+def publish_user_invalidation(*user_ids):
+    """
+    Tell the other services that cached details of these users are stale.
+
+    Deletes the shared cache entries and bumps the generation counter the
+    services poll to drop their in-process copies. Without user IDs only the
+    counter is bumped.
+    """
+    keys = []
+    for user_id in user_ids:
+        keys.append(PROFILE_KEY.format(user_id))
+        keys.append(SUMMARY_KEY.format(user_id))
+    if keys:
+        cache.delete_many(keys)
+
+    # incr is atomic on Redis; the key may have been evicted, so seed it first
+    cache.add(GENERATION_KEY, 0, timeout=None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+
+
+class AuthUserCache:
+    """
+    Short-lived in-process cache of authenticated User objects.
+
+    Keyed by the user ID as a string, the form it takes in token claims.
+
+    Lets token authentication skip the per-request user query. Entries expire
+    after USER_AUTH_CACHE_TTL seconds and are evicted locally as soon as a user
+    is saved or deleted. Other processes drop theirs when they see the
+    generation counter move, which they check at most every
+    USER_AUTH_CACHE_SYNC_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._lock = threading.Lock()
+        self._generation = _UNSYNCED
+        self._synced_at = 0.0
+
+    def get(self, user_id):
+        self._sync()
+        entry = self._users.get(str(user_id))
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return copy.copy(entry[1])
+
+    def set(self, user):
+        now = time.monotonic()
+        expires_at = now + getattr(settings, 'USER_AUTH_CACHE_TTL', 30)
+        with self._lock:
+            if len(self._users) >= getattr(settings, 'USER_AUTH_CACHE_MAXSIZE', 10000):
+                self._users = {
+                    user_id: entry for user_id, entry in self._users.items()
+                    if entry[0] > now
+                }
+                if len(self._users) >= getattr(settings, 'USER_AUTH_CACHE_MAXSIZE', 10000):
+                    self._users.clear()
+            self._users[str(user.pk)] = (expires_at, copy.copy(user))
+
+    def evict(self, user_id):
+        with self._lock:
+            self._users.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._synced_at < getattr(settings, 'USER_AUTH_CACHE_SYNC_INTERVAL', 5):
+            return
+        self._synced_at = now
+        try:
+            generation = cache.get(GENERATION_KEY)
+        except Exception:
+            # Shared cache unreachable, rely on the TTL alone
+            return
+        if generation != self._generation:
+            if self._generation is not _UNSYNCED:
+                self.clear()
+            self._generation = generation
+
+
+auth_user_cache = AuthUserCache()
+
+
+class RolePermissionMap:
+    """
+    Precomputed map of role ID to the frozenset of its permission codenames.
+
+    The map is built with a single query and shared across workers through the
+    Django cache under a versioned key. Writes to permissions bump the version,
+    and each process checks it at most every ROLE_PERMISSION_SYNC_INTERVAL
+    seconds, so permission checks are set membership tests in memory.
+    """
+
+    def __init__(self):
+        self._roles = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._synced_at = 0.0
+
+    def codenames(self, role_id):
+        """Return the frozenset of permission codenames granted to a role."""
+        return self._get().get(role_id, frozenset())
+
+    def refresh(self):
+        """Publish a new version of the map and drop the local copy."""
+        try:
+            cache.add(ROLE_PERMISSIONS_VERSION_KEY, 0, timeout=None)
+            cache.incr(ROLE_PERMISSIONS_VERSION_KEY)
+        except ValueError:
+            cache.set(ROLE_PERMISSIONS_VERSION_KEY, 1, timeout=None)
+        except Exception:
+            # Shared cache unreachable, processes rebuild the map from the database while it is
+            pass
+        with self._lock:
+            self._roles = None
+            self._synced_at = 0.0
+
+    def _get(self):
+        now = time.monotonic()
+        roles = self._roles
+        if roles is not None and now - self._synced_at < getattr(settings, 'ROLE_PERMISSION_SYNC_INTERVAL', 5):
+            return roles
+
+        with self._lock:
+            try:
+                version = cache.get_or_set(ROLE_PERMISSIONS_VERSION_KEY, 1, timeout=None)
+            except Exception:
+                # Shared cache unreachable, rebuild from the database every sync interval
+                version = None
+            if self._roles is None or version is None or version != self._version:
+                shared = self._shared_map(version)
+                self._roles = {
+                    role_id: frozenset(codenames) for role_id, codenames in shared.items()
+                }
+                self._version = version
+            self._synced_at = now
+            return self._roles
+
+    def _shared_map(self, version):
+        """Return the map published under a version, building and publishing it when missing."""
+        if version is None:
+            return self._build()
+        key = ROLE_PERMISSIONS_KEY.format(version)
+        try:
+            shared = cache.get(key)
+        except Exception:
+            shared = None
+        if shared is None:
+            shared = self._build()
+            try:
+                cache.set(key, shared, timeout=ROLE_PERMISSIONS_TTL)
+            except Exception:
+                pass
+        return shared
+
+    @staticmethod
+    def _build():
+        from .models import RolePermission
+
+        roles = {}
+        for role_id, codename in RolePermission.objects.values_list('role_id', 'permission__codename'):
+            roles.setdefault(role_id, []).append(codename)
+        return roles
+
+
+role_permission_map = RolePermissionMap()
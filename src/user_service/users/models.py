@@ -141,12 +141,21 @@ class User(models.Model):
 
     def has_permission(self, permission_codename):
         """Check if user has a specific permission through their role."""
-        try:
-            return self.role.role_permissions.filter(
-                permission__codename=permission_codename
-            ).exists()
-        except RolePermission.DoesNotExist:
-            return False
+        from .cache import role_permission_map
+
+        return permission_codename in role_permission_map.codenames(self.role_id)
+
+    def has_permissions(self, permission_codenames):
+        """
+        Check several permissions at once.
+
+        Returns:
+            Dict mapping each permission codename to whether the user has it
+        """
+        from .cache import role_permission_map
+
+        granted = role_permission_map.codenames(self.role_id)
+        return {codename: codename in granted for codename in permission_codenames}
 
     @property
     def is_authenticated(self):
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -53,6 +54,15 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'date_joined']
 
 
+class UserBulkLookupSerializer(serializers.Serializer):
+    """Serializer for looking up many users at once."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.USER_BULK_LOOKUP_MAX
+    )
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating a new user."""
     password = serializers.CharField(
@@ -85,7 +95,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password2')
         password = validated_data.pop('password')
-        user = User.objects.create(**validated_data)
+        user = User(**validated_data)
         user.set_password(password)
         user.save()
         return user
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import auth_user_cache, publish_user_invalidation, role_permission_map
+from .models import Permission, Role, RolePermission, User
+
+
+@receiver(post_save, sender=User)
+def user_post_save(sender, instance, created, **kwargs):
+    """Drop cached copies of a user once changes to it are committed."""
+    if not created:
+        _invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_post_delete(sender, instance, **kwargs):
+    """Drop cached copies of a deleted user."""
+    _invalidate_user(instance.pk)
+
+
+def _invalidate_user(user_id):
+    auth_user_cache.evict(user_id)
+
+    def publish():
+        auth_user_cache.evict(user_id)
+        publish_user_invalidation(user_id)
+
+    transaction.on_commit(publish)
+
+
+@receiver(post_save, sender=Role)
+def role_post_save(sender, instance, created, **kwargs):
+    """
+    Cached users embed their role, drop every in-process copy when a role changes.
+
+    Only the generation counter is bumped: a role may have any number of users,
+    so their shared entries are left to expire instead of being deleted one by one.
+    """
+    if created:
+        return
+    auth_user_cache.clear()
+
+    def publish():
+        auth_user_cache.clear()
+        publish_user_invalidation()
+
+    transaction.on_commit(publish)
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_save, sender=RolePermission)
+@receiver(post_delete, sender=RolePermission)
+def permission_changed(sender, instance, **kwargs):
+    """Publish a new role to permission map once permission changes are committed."""
+    transaction.on_commit(role_permission_map.refresh)
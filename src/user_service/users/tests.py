@@ -1,3 +1,282 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import get_tokens_for_user
+from .cache import (
+    GENERATION_KEY, PROFILE_KEY, ROLE_PERMISSIONS_VERSION_KEY, SUMMARY_KEY, AuthUserCache, RolePermissionMap,
+    auth_user_cache, role_permission_map
+)
+from .models import Permission, Role, RolePermission, User
+
+
+class UserTestMixin:
+    """Helpers creating users in the patient role."""
+
+    def create_user(self, username, **kwargs):
+        role, _ = Role.objects.get_or_create(name=Role.PATIENT)
+        user = User(username=username, email=f'{username}@example.com', role=role, **kwargs)
+        user.set_password('Sup3r-secret!')
+        user.save()
+        return user
+
+
+class UserBulkLookupTests(UserTestMixin, APITestCase):
+    """Tests for the bulk user lookup endpoint."""
+
+    def setUp(self):
+        self.user = self.create_user('alice')
+        self.other = self.create_user('bob')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('user-bulk')
+
+    def test_lookup_by_post(self):
+        response = self.client.post(self.url, {'ids': [self.user.pk, self.other.pk, 999]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(user['username'] for user in response.data), ['alice', 'bob'])
+        self.assertEqual(response.data[0]['role'], Role.PATIENT)
+
+    def test_lookup_by_get(self):
+        response = self.client.get(self.url, {'ids': f'{self.other.pk},'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([user['username'] for user in response.data], ['bob'])
+
+    def test_list_body_is_rejected(self):
+        response = self.client.post(self.url, [self.user.pk], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_ids_are_rejected(self):
+        for ids in [[], ['abc'], [0], None]:
+            with self.subTest(ids=ids):
+                response = self.client.post(self.url, {'ids': ids}, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(USER_AUTH_CACHE_SYNC_INTERVAL=0)
+class UserInvalidationTests(UserTestMixin, APITestCase):
+    """Tests that user changes reach the caches of the other processes."""
+
+    def setUp(self):
+        cache.clear()
+        auth_user_cache.clear()
+        self.user = self.create_user('alice')
+        self.client.force_authenticate(user=self.user)
+        # Cache of another process, synced before the change
+        self.other_process = AuthUserCache()
+        self.other_process.set(self.user)
+        self.assertIsNotNone(self.other_process.get(self.user.pk))
+        cache.set_many({PROFILE_KEY.format(self.user.pk): {}, SUMMARY_KEY.format(self.user.pk): {}})
+
+    def assertInvalidated(self, generation):
+        self.assertEqual(cache.get(GENERATION_KEY), generation + 1)
+        self.assertIsNone(cache.get(PROFILE_KEY.format(self.user.pk)))
+        self.assertIsNone(cache.get(SUMMARY_KEY.format(self.user.pk)))
+        self.assertIsNone(self.other_process.get(self.user.pk))
+
+    def test_update_publishes_invalidation(self):
+        generation = cache.get(GENERATION_KEY, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('user-detail', args=[self.user.pk]), {'first_name': 'Alicia'}, format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertInvalidated(generation)
+
+    def test_change_password_publishes_invalidation(self):
+        generation = cache.get(GENERATION_KEY, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('user-change-password'), {
+                'old_password': 'Sup3r-secret!',
+                'new_password': 'An0ther-secret!',
+                'new_password2': 'An0ther-secret!',
+            }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertInvalidated(generation)
+
+    def test_nothing_is_published_before_commit(self):
+        generation = cache.get(GENERATION_KEY, 0)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.user.first_name = 'Alicia'
+            self.user.save()
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(cache.get(GENERATION_KEY, 0), generation)
+        self.assertIsNotNone(self.other_process.get(self.user.pk))
+
+
+    def test_role_change_only_bumps_the_generation(self):
+        generation = cache.get(GENERATION_KEY, 0)
+        role = self.user.role
+        role.description = 'Registered patients'
+
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            role.save()
+
+        self.assertEqual(cache.get(GENERATION_KEY), generation + 1)
+        self.assertIsNone(self.other_process.get(self.user.pk))
+        self.assertIsNotNone(cache.get(PROFILE_KEY.format(self.user.pk)))
+
+
+class TokenAuthenticationTests(UserTestMixin, APITestCase):
+    """Tests for authenticating user service tokens against the user cache."""
+
+    def setUp(self):
+        cache.clear()
+        auth_user_cache.clear()
+        self.user = self.create_user('alice')
+        self.url = reverse('user-me')
+
+    def authenticate(self, **claims):
+        token = AccessToken.for_user(self.user)
+        token['role'] = self.user.role.name
+        token['is_active'] = self.user.is_active
+        for claim, value in claims.items():
+            token[claim] = value
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_cached_user_costs_no_query(self):
+        self.authenticate()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['username'], 'alice')
+        self.assertEqual(response.data['role']['name'], Role.PATIENT)
+
+    def test_login_tokens_are_accepted(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.user)['access']}")
+
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_inactive_claim_is_rejected(self):
+        self.authenticate(is_active=False)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stale_role_claim_is_rejected(self):
+        self.authenticate(role=Role.DOCTOR)
+
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_evicts_the_cached_user_after_commit(self):
+        self.authenticate()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(auth_user_cache.get(self.user.pk))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            user = User.objects.get(pk=self.user.pk)
+            user.is_active = False
+            user.save()
+            # Evicted locally straight away, published to the others once committed
+            self.assertIsNone(auth_user_cache.get(self.user.pk))
+            self.assertIsNone(cache.get(GENERATION_KEY))
+            # A request racing the transaction caches the row it still sees as active
+            auth_user_cache.set(self.user)
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(cache.get(GENERATION_KEY), 1)
+        self.assertIsNone(auth_user_cache.get(self.user.pk))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(ROLE_PERMISSION_SYNC_INTERVAL=0)
+class RolePermissionMapTests(UserTestMixin, APITestCase):
+    """Tests for the precomputed role to permission map."""
+
+    def setUp(self):
+        cache.clear()
+        role_permission_map.refresh()
+        self.user = self.create_user('alice')
+        self.view = Permission.objects.create(codename='view_record', name='View record')
+        self.edit = Permission.objects.create(codename='edit_record', name='Edit record')
+        self.grant(self.view)
+        # Map of another process, built before the changes below
+        self.other_process = RolePermissionMap()
+        self.other_process.codenames(self.user.role_id)
+
+    def grant(self, permission):
+        with self.captureOnCommitCallbacks(execute=True):
+            return RolePermission.objects.create(role=self.user.role, permission=permission)
+
+    def test_has_permission(self):
+        self.assertTrue(self.user.has_permission('view_record'))
+        self.assertFalse(self.user.has_permission('edit_record'))
+        self.assertFalse(self.user.has_permission('unknown'))
+
+    def test_has_permissions(self):
+        with self.assertNumQueries(0):
+            granted = self.user.has_permissions(['view_record', 'edit_record', 'unknown'])
+
+        self.assertEqual(granted, {'view_record': True, 'edit_record': False, 'unknown': False})
+        self.assertEqual(self.user.has_permissions([]), {})
+
+    def test_granting_a_permission_bumps_the_version(self):
+        version = cache.get(ROLE_PERMISSIONS_VERSION_KEY)
+
+        self.grant(self.edit)
+
+        self.assertEqual(cache.get(ROLE_PERMISSIONS_VERSION_KEY), version + 1)
+        self.assertTrue(self.user.has_permission('edit_record'))
+        self.assertIn('edit_record', self.other_process.codenames(self.user.role_id))
+
+    def test_revoking_a_permission_bumps_the_version(self):
+        version = cache.get(ROLE_PERMISSIONS_VERSION_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RolePermission.objects.filter(permission=self.view).get().delete()
+
+        self.assertEqual(cache.get(ROLE_PERMISSIONS_VERSION_KEY), version + 1)
+        self.assertFalse(self.user.has_permission('view_record'))
+        self.assertNotIn('view_record', self.other_process.codenames(self.user.role_id))
+
+    def test_renaming_a_permission_bumps_the_version(self):
+        version = cache.get(ROLE_PERMISSIONS_VERSION_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.view.codename = 'read_record'
+            self.view.save()
+
+        self.assertEqual(cache.get(ROLE_PERMISSIONS_VERSION_KEY), version + 1)
+        self.assertEqual(
+            self.user.has_permissions(['view_record', 'read_record']),
+            {'view_record': False, 'read_record': True}
+        )
+        self.assertEqual(self.other_process.codenames(self.user.role_id), frozenset({'read_record'}))
+
+    def test_nothing_is_published_before_commit(self):
+        version = cache.get(ROLE_PERMISSIONS_VERSION_KEY)
+
+        with self.captureOnCommitCallbacks(execute=False):
+            RolePermission.objects.create(role=self.user.role, permission=self.edit)
+
+        self.assertEqual(cache.get(ROLE_PERMISSIONS_VERSION_KEY), version)
+        self.assertNotIn('edit_record', self.other_process.codenames(self.user.role_id))
+
+    def test_shared_cache_errors_fall_back_to_the_database(self):
+        with mock.patch('users.cache.cache.get_or_set', side_effect=ConnectionError), \
+                mock.patch('users.cache.cache.add', side_effect=ConnectionError):
+            self.assertTrue(self.user.has_permission('view_record'))
+            self.grant(self.edit)
+            self.assertEqual(
+                self.other_process.codenames(self.user.role_id), frozenset({'view_record', 'edit_record'})
+            )
+
+        with mock.patch('users.cache.cache.get', side_effect=ConnectionError), \
+                mock.patch('users.cache.cache.set', side_effect=ConnectionError):
+            role_permission_map.refresh()
+            self.assertTrue(self.user.has_permission('edit_record'))
@@ -2,6 +2,7 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
 from django.utils.translation import gettext_lazy as _
 
+from .cache import auth_user_cache
 from .models import User
 
 
@@ -22,14 +23,26 @@ class CustomJWTAuthentication(JWTAuthentication):
         except KeyError:
             raise InvalidToken(_('Token contained no recognizable user identification'))
 
-        try:
-            user = User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            raise InvalidToken(_('User not found'), code='user_not_found')
+        if validated_token.get('is_active') is False:
+            raise InvalidToken(_('User is inactive'), code='user_inactive')
+
+        # Served from the short-lived user cache, so the hot path costs no query
+        user = auth_user_cache.get(user_id)
+        if user is None:
+            try:
+                user = User.objects.select_related('role').get(pk=user_id)
+            except User.DoesNotExist:
+                raise InvalidToken(_('User not found'), code='user_not_found')
+            auth_user_cache.set(user)
 
         if not user.is_active:
             raise InvalidToken(_('User is inactive'), code='user_inactive')
 
+        # Tokens issued before a role change must not keep the old role's claim
+        role = validated_token.get('role')
+        if role is not None and role != user.role.name:
+            raise InvalidToken(_('User role has changed'), code='user_role_changed')
+
         return user
         
     def authenticate(self, request):
@@ -13,6 +13,7 @@ from .serializers import (
     RolePermissionSerializer,
     RoleSerializer,
     TokenRefreshSerializer,
+    UserBulkLookupSerializer,
     UserCreateSerializer,
     UserSerializer,
     UserUpdateSerializer,
@@ -90,6 +91,38 @@ class UserViewSet(viewsets.ModelViewSet):
             serializer.save()
             return Response(serializer.data)
 
+    @action(detail=False, methods=['get', 'post'])
+    def bulk(self, request):
+        """
+        Look up many users in a single query.
+
+        IDs are passed as a JSON list (`{"ids": [1, 2, 3]}`) on POST or as
+        `?ids=1,2,3` on GET. Returns a compact projection of the users found.
+        """
+        if request.method == 'GET':
+            data = {'ids': [
+                value for value in request.query_params.get('ids', '').split(',')
+                if value.strip()
+            ]}
+        else:
+            data = request.data
+
+        serializer = UserBulkLookupSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+
+        users = User.objects.filter(
+            pk__in=set(serializer.validated_data['ids'])
+        ).values(
+            'id', 'username', 'email', 'first_name', 'last_name',
+            'is_active', 'role__name'
+        )
+
+        results = []
+        for user in users:
+            user['role'] = user.pop('role__name')
+            results.append(user)
+        return Response(results)
+
     @action(detail=False, methods=['post'])
     def change_password(self, request):
         """Change user password."""